@@ -0,0 +1,48 @@
+"""
+Benchmarks of the batch-processing of synthetic images with cell labels and
+nuclei masks, see synthetic.
+"""
+import shutil
+import tempfile
+from napari_bigfish.bigfishcore import BigfishCore
+from .synthetic import SCALE, getShape, getSpotDensities, getNumbersOfCells
+from .synthetic import getNumberOfImages, writeBatch
+
+
+class BatchSuite:
+    """Time the batch-processing with background subtraction, automatic
+    threshold and counting, in one process and with two worker processes.
+    Each run writes new reports, so the batch is run once per setup.
+    Versions without worker processes only run in one process.
+    """
+
+    params = [[1, 2]]
+    param_names = ["workers"]
+    number = 1
+    repeat = 3
+    timeout = 1800
+
+    def setup(self, nrOfWorkers):
+        if nrOfWorkers > 1 and not hasattr(BigfishCore, "setNumberOfWorkers"):
+            raise NotImplementedError("no worker processes")
+        self.folder = tempfile.mkdtemp()
+        self.images = writeBatch(self.folder, getNumberOfImages(),
+                                 getShape(), getSpotDensities()[0],
+                                 getNumbersOfCells()[0])
+
+    def teardown(self, nrOfWorkers):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def runBatch(self, nrOfWorkers):
+        inputImages, cellLabels, nucleiMasks = self.images
+        core = BigfishCore()
+        if nrOfWorkers > 1:
+            core.setNumberOfWorkers(nrOfWorkers)
+        core.runBatch(SCALE, inputImages, cellLabels, nucleiMasks,
+                      subtractBackground=True)
+
+    def time_runBatch(self, nrOfWorkers):
+        self.runBatch(nrOfWorkers)
+
+    def peakmem_runBatch(self, nrOfWorkers):
+        self.runBatch(nrOfWorkers)
@@ -0,0 +1,70 @@
+"""
+Benchmarks of the counting of the spots per cell and environment and of the
+writing of the spots, see synthetic.
+"""
+import os
+import shutil
+import tempfile
+from napari_bigfish.bigfishcore import BigfishCore
+from .synthetic import getShape, getSpotDensities, getNumbersOfCells
+from .synthetic import createSpots, createLabels
+try:
+    from napari_bigfish.bigfishcore import OUTPUT_FORMATS
+except ImportError:
+    OUTPUT_FORMATS = ("csv", "npz")
+
+
+class SpotCountingSuite:
+    """Time the lookup of the labels of the spots and the counting per cell
+    for each number of cells and spot density.
+    """
+
+    params = [getNumbersOfCells(), getSpotDensities()]
+    param_names = ["cells", "spots per million voxels"]
+
+    def setup(self, nrOfCells, spotDensity):
+        shape = getShape()
+        self.core = BigfishCore()
+        self.core.spots = createSpots(shape, spotDensity)
+        self.cellLabels, self.nucleiMask = createLabels(shape, nrOfCells)
+        self.core.countSpotsPerCellAndEnvironment(self.cellLabels,
+                                                  self.nucleiMask)
+
+    def time_countSpotsPerCellAndEnvironment(self, nrOfCells, spotDensity):
+        self.core.countSpotsPerCellAndEnvironment(self.cellLabels,
+                                                  self.nucleiMask)
+
+    def peakmem_countSpotsPerCellAndEnvironment(self, nrOfCells, spotDensity):
+        self.core.countSpotsPerCellAndEnvironment(self.cellLabels,
+                                                  self.nucleiMask)
+
+    def time_getSpotCountPerCellAndEnvironment(self, nrOfCells, spotDensity):
+        self.core.getSpotCountPerCellAndEnvironment()
+
+
+class SpotReportSuite:
+    """Time the writing of the spots of an image in each output format.
+    Versions without an output format only write csv-files.
+    """
+
+    params = [list(OUTPUT_FORMATS), getSpotDensities()]
+    param_names = ["output format", "spots per million voxels"]
+
+    def setup(self, outputFormat, spotDensity):
+        shape = getShape()
+        self.folder = tempfile.mkdtemp()
+        self.inputPath = os.path.join(self.folder, "image.tif")
+        self.core = BigfishCore()
+        if hasattr(self.core, "setOutputFormat"):
+            self.core.setOutputFormat(outputFormat)
+        elif outputFormat != "csv":
+            raise NotImplementedError("no output format")
+        self.core.spots = createSpots(shape, spotDensity)
+        cellLabels, nucleiMask = createLabels(shape, getNumbersOfCells()[0])
+        self.core.countSpotsPerCellAndEnvironment(cellLabels, nucleiMask)
+
+    def teardown(self, outputFormat, spotDensity):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def time_reportSpots(self, outputFormat, spotDensity):
+        self.core.reportSpots(self.inputPath)
@@ -0,0 +1,69 @@
+"""
+Benchmarks of the background subtraction, the spot detection and the
+decomposition of dense regions on synthetic volumes, see synthetic.
+"""
+from napari_bigfish.bigfishcore import BigfishCore
+from .synthetic import SCALE, getShape, getSpotDensities, createSpotImage
+try:
+    from napari_bigfish.bigfishcore import WORKING_PRECISIONS
+except ImportError:
+    WORKING_PRECISIONS = ("float64", "float32")
+
+
+class SpotDetectionSuite:
+    """Time the filters and the spot detection with the automatic threshold
+    for each spot density and working precision, and track the number of
+    spots found, so that a change of the results is seen as well. Versions
+    without a working precision only run in float64.
+    """
+
+    params = [getSpotDensities(), list(WORKING_PRECISIONS)]
+    param_names = ["spots per million voxels", "working precision"]
+    timeout = 600
+
+    def setup(self, spotDensity, workingPrecision):
+        self.core = BigfishCore()
+        if hasattr(self.core, "setWorkingPrecision"):
+            self.core.setWorkingPrecision(workingPrecision)
+        elif workingPrecision != "float64":
+            raise NotImplementedError("no working precision")
+        self.core.setData(createSpotImage(getShape(), spotDensity))
+
+    def time_subtractBackground(self, spotDensity, workingPrecision):
+        self.core.subtractBackground()
+
+    def peakmem_subtractBackground(self, spotDensity, workingPrecision):
+        self.core.subtractBackground()
+
+    def time_detectSpots(self, spotDensity, workingPrecision):
+        self.core.detectSpots(SCALE)
+
+    def peakmem_detectSpots(self, spotDensity, workingPrecision):
+        self.core.detectSpots(SCALE)
+
+    def track_numberOfSpots(self, spotDensity, workingPrecision):
+        self.core.detectSpots(SCALE)
+        return len(self.core.getSpots())
+
+
+class DenseRegionDecompositionSuite:
+    """Time the decomposition of the dense regions of the spots detected
+    in the setup. The decomposition replaces the spots of the core, so it is
+    run once per setup.
+    """
+
+    params = [getSpotDensities()]
+    param_names = ["spots per million voxels"]
+    number = 1
+    timeout = 600
+
+    def setup(self, spotDensity):
+        self.core = BigfishCore()
+        self.core.setData(createSpotImage(getShape(), spotDensity))
+        self.core.detectSpots(SCALE)
+
+    def time_decomposeDenseRegions(self, spotDensity):
+        self.core.decomposeDenseRegions(SCALE)
+
+    def peakmem_decomposeDenseRegions(self, spotDensity):
+        self.core.decomposeDenseRegions(SCALE)
@@ -0,0 +1,178 @@
+"""
+Synthetic smFISH volumes, cell labels and nuclei masks for the benchmarks.
+
+The size of the volumes, the spot densities, the numbers of cells and the
+number of images of a batch can be set with the environment variables
+SHAPE_VARIABLE, DENSITIES_VARIABLE, CELLS_VARIABLE and IMAGES_VARIABLE, for
+example to run the benchmarks on volumes of the size of a production
+workload::
+
+    NAPARI_BIGFISH_BENCHMARK_SHAPE=64,1024,1024 asv run
+
+Results are only comparable between runs with the same settings.
+"""
+import os
+import numpy as np
+import tifffile
+from scipy import ndimage
+
+
+SHAPE_VARIABLE = "NAPARI_BIGFISH_BENCHMARK_SHAPE"
+DENSITIES_VARIABLE = "NAPARI_BIGFISH_BENCHMARK_DENSITIES"
+CELLS_VARIABLE = "NAPARI_BIGFISH_BENCHMARK_CELLS"
+IMAGES_VARIABLE = "NAPARI_BIGFISH_BENCHMARK_IMAGES"
+DEFAULT_SHAPE = (16, 256, 256)
+DEFAULT_DENSITIES = (200, 1000)
+DEFAULT_CELLS = (10, 100)
+DEFAULT_IMAGES = 4
+SCALE = (600, 100, 100)
+SPOT_SIGMA = (1.2, 1, 1)
+SPOT_INTENSITY = 2000
+BACKGROUND = 100
+BACKGROUND_RAMP = 50
+NOISE = 10
+NUCLEUS_RADIUS = 0.5
+
+
+def getShape():
+    """Answer the shape (z, y, x) of the synthetic volumes.
+
+    :rtype: tuple of int
+    """
+    return tuple(int(value) for value in getValues(SHAPE_VARIABLE,
+                                                   DEFAULT_SHAPE))
+
+
+def getSpotDensities():
+    """Answer the spot densities of the benchmarks in spots per million
+    voxels.
+
+    :rtype: list of float
+    """
+    return [float(value) for value in getValues(DENSITIES_VARIABLE,
+                                                DEFAULT_DENSITIES)]
+
+
+def getNumbersOfCells():
+    """Answer the numbers of cells of the label images of the benchmarks.
+
+    :rtype: list of int
+    """
+    return [int(value) for value in getValues(CELLS_VARIABLE, DEFAULT_CELLS)]
+
+
+def getNumberOfImages():
+    """Answer the number of images of the batch benchmarks.
+
+    :rtype: int
+    """
+    return int(getValues(IMAGES_VARIABLE, (DEFAULT_IMAGES,))[0])
+
+
+def getValues(variable, default):
+    """Answer the comma separated values of the environment variable or the
+    default values, if the variable is not set.
+
+    :rtype: list of str
+    """
+    text = os.environ.get(variable, "")
+    if not text.strip():
+        return [str(value) for value in default]
+    return [value.strip() for value in text.split(",") if value.strip()]
+
+
+def getNumberOfSpots(shape, spotDensity):
+    """Answer the number of spots of a volume with the given shape and spot
+    density in spots per million voxels.
+
+    :rtype: int
+    """
+    return int(round(np.prod(shape) * spotDensity / 1e6))
+
+
+def createSpots(shape, spotDensity, seed=0):
+    """Answer the coordinates of randomly placed spots.
+
+    :param shape: The shape of the volume
+    :param spotDensity: The number of spots per million voxels
+    :param seed: The seed of the random generator
+    :rtype: numpy.ndarray of shape (nrOfSpots, ndim)
+    """
+    rng = np.random.default_rng(seed)
+    nrOfSpots = getNumberOfSpots(shape, spotDensity)
+    return np.column_stack([rng.integers(0, size, nrOfSpots)
+                            for size in shape]).astype(np.int64)
+
+
+def createSpotImage(shape, spotDensity, seed=0):
+    """Answer a 16-bit volume with gaussian spots on a noisy background,
+    that gets brighter along the x-axis. The spots are placed as single
+    voxels and blurred together, so that big volumes are created quickly.
+
+    :param shape: The shape of the volume
+    :param spotDensity: The number of spots per million voxels
+    :param seed: The seed of the random generator
+    :rtype: numpy.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    spots = createSpots(shape, spotDensity, seed)
+    image = np.zeros(shape, dtype=np.float32)
+    np.add.at(image, tuple(spots.T), 1)
+    sigma = SPOT_SIGMA[-len(shape):]
+    image = ndimage.gaussian_filter(image, sigma)
+    peak = 1 / np.prod([np.sqrt(2 * np.pi) * s for s in sigma])
+    image *= SPOT_INTENSITY / peak
+    image += rng.normal(BACKGROUND, NOISE, size=shape).astype(np.float32)
+    image += np.linspace(0, BACKGROUND_RAMP, shape[-1], dtype=np.float32)
+    return np.clip(image, 0, 65535).astype(np.uint16)
+
+
+def createLabels(shape, nrOfCells, seed=0):
+    """Answer cell labels and a nuclei mask. Each voxel belongs to the cell
+    with the nearest center in the xy-plane, the cells span all planes. The
+    nucleus of a cell is the disk of NUCLEUS_RADIUS times the mean radius of
+    the cells around its center.
+
+    :param shape: The shape of the volume
+    :param nrOfCells: The number of cells
+    :param seed: The seed of the random generator
+    :return: The cell labels, from one to nrOfCells, and the nuclei mask
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    rng = np.random.default_rng(seed)
+    plane = shape[-2:]
+    centers = np.zeros(plane, dtype=np.int32)
+    nrOfCenters = min(nrOfCells, int(np.prod(plane)))
+    positions = rng.choice(int(np.prod(plane)), nrOfCenters, replace=False)
+    centers.flat[positions] = np.arange(1, nrOfCenters + 1)
+    distance, indices = ndimage.distance_transform_edt(centers == 0,
+                                                       return_indices=True)
+    labels = centers[tuple(indices)]
+    meanRadius = np.sqrt(np.prod(plane) / (np.pi * nrOfCenters))
+    nuclei = (distance < NUCLEUS_RADIUS * meanRadius).astype(np.uint8)
+    if len(shape) > 2:
+        labels = np.ascontiguousarray(np.broadcast_to(labels, shape))
+        nuclei = np.ascontiguousarray(np.broadcast_to(nuclei, shape))
+    return labels, nuclei
+
+
+def writeBatch(folder, nrOfImages, shape, spotDensity, nrOfCells):
+    """Write the input images, cell labels and nuclei masks of a batch into
+    the folder.
+
+    :return: The paths of the input images, of the cell labels and of the
+             nuclei masks
+    :rtype: (list of str, list of str, list of str)
+    """
+    inputImages, cellLabels, nucleiMasks = [], [], []
+    for index in range(nrOfImages):
+        labels, nuclei = createLabels(shape, nrOfCells, index)
+        for paths, name, image in (
+                (inputImages, "image", createSpotImage(shape, spotDensity,
+                                                       index)),
+                (cellLabels, "cells", labels.astype(np.uint16)),
+                (nucleiMasks, "nuclei", nuclei)):
+            path = os.path.join(folder, "{}{}.tif".format(name, index))
+            tifffile.imwrite(path, image)
+            paths.append(path)
+    return inputImages, cellLabels, nucleiMasks
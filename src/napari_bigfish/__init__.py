@@ -1,13 +1,26 @@
-
 try:
     from ._version import version as __version__
 except ImportError:
     __version__ = "unknown"
-from ._sample_data import make_sample_data
-from ._widget import DetectFISHSpotsWidget, DetectFISHSpotsBatchWidget
 
 __all__ = (
     "make_sample_data",
     "DetectFISHSpotsWidget",
-    "DetectFISHSpotsBatchWidget"
+    "DetectFISHSpotsBatchWidget",
+    "ParameterSweepWidget"
 )
+
+
+def __getattr__(name):
+    """Import the napari-dependent parts of the package only when they are
+    used, so that the headless batch-processing does not load napari and Qt.
+    """
+    if name == "make_sample_data":
+        from ._sample_data import make_sample_data
+        return make_sample_data
+    if name in ("DetectFISHSpotsWidget", "DetectFISHSpotsBatchWidget",
+                "ParameterSweepWidget"):
+        from . import _widget
+        return getattr(_widget, name)
+    raise AttributeError("module {} has no attribute {}".format(__name__,
+                                                                name))
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+
+def createSpotImage(shape, nrOfSpots, seed):
+    """Answer a 16-bit image with gaussian spots at random positions on a
+    noisy background.
+
+    :param shape: The shape of the image
+    :param nrOfSpots: The number of spots
+    :param seed: The seed of the random generator
+    :rtype: numpy.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.normal(100, 10, size=shape)
+    grid = np.indices(shape)
+    for spot in range(nrOfSpots):
+        center = [rng.uniform(0, size) for size in shape]
+        distance = sum((axis - c)**2 for axis, c in zip(grid, center))
+        image = image + 2000 * np.exp(-distance / 4)
+    return np.clip(image, 0, 65535).astype(np.uint16)
+
+
+def createVaryingSpotImage(shape, nrOfSpots, seed):
+    """Answer a 16-bit image with gaussian spots of random brightness at
+    random positions on a noisy background.
+
+    :param shape: The shape of the image
+    :param nrOfSpots: The number of spots
+    :param seed: The seed of the random generator
+    :rtype: numpy.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.normal(300, 30, size=shape)
+    grid = np.indices(shape)
+    for spot in range(nrOfSpots):
+        center = [rng.uniform(0, size) for size in shape]
+        distance = sum((axis - c)**2 for axis, c in zip(grid, center))
+        image = image + rng.uniform(500, 3000) * np.exp(-distance / 3)
+    return np.clip(image, 0, 65535).astype(np.uint16)
+
+
+def createPlateauSpotImage(shape, nrOfSpots, seed):
+    """Answer a 16-bit image with spots of two pixels per dimension and of
+    constant value on a poisson background, so that the local maxima of a
+    spot are connected.
+
+    :param shape: The shape of the image
+    :param nrOfSpots: The number of spots
+    :param seed: The seed of the random generator
+    :rtype: numpy.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.poisson(100, size=shape).astype(np.uint16)
+    for spot in range(nrOfSpots):
+        start = [rng.integers(0, size - 3) for size in shape]
+        block = tuple(slice(s, s + 2) for s in start)
+        image[block] = rng.integers(150, 3000)
+    return image
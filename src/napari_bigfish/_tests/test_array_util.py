@@ -1,3 +1,4 @@
+import tracemalloc
 import numpy as np
 from napari_bigfish.array_util import ArrayUtil
 
@@ -8,4 +9,57 @@ def testArrayUtil():
     assert(colIndices[0] == 0)
     assert(colIndices[1] == 2)
     assert(rowIndices[0] == 0)
-    assert(rowIndices[1] == 2)
\ No newline at end of file
+    assert(rowIndices[1] == 2)
+
+def testGetTiles():
+    data = np.arange(7 * 10).reshape((7, 10))
+    tiles = ArrayUtil.getTiles(data.shape, (3, 4), (1, 2))
+    assert(len(tiles) == 3 * 3)
+    result = np.zeros_like(data)
+    for source, inner, target in tiles:
+        result[target] = data[source][inner]
+    assert(np.array_equal(result, data))
+    source, inner, target = tiles[4]
+    assert(source == (slice(2, 7), slice(2, 10)))
+    assert(target == (slice(3, 6), slice(4, 8)))
+
+def testGetMaximumAndUniqueValues():
+    data = np.array([[[0, 3], [3, 0]], [[7, 0], [0, 1]], [[0, 0], [0, 0]]])
+    assert(ArrayUtil.getMaximum(data) == 7)
+    assert(ArrayUtil.getMaximum(data[0]) == 3)
+    assert(np.array_equal(ArrayUtil.getUniqueValues(data), [0, 1, 3, 7]))
+    assert(np.array_equal(ArrayUtil.getUniqueValues(data[1]), [0, 1, 7]))
+
+
+def testGetRegionWithHalo():
+    source, inner, target = ArrayUtil.getRegionWithHalo(
+                                (10, 100, 80),
+                                (slice(4, 5), slice(0, 30), slice(50, None)),
+                                (2, 3, 3))
+    assert(source == (slice(2, 7), slice(0, 33), slice(47, 80)))
+    assert(inner == (slice(2, 3), slice(0, 30), slice(3, 33)))
+    assert(target == (slice(4, 5), slice(0, 30), slice(50, 80)))
+
+
+def testGetNormalized():
+    data = np.arange(2 * 30 * 40, dtype=np.uint16).reshape((2, 30, 40))
+    result = ArrayUtil.getNormalized(data)
+    assert(result.dtype == np.float32)
+    assert(np.allclose(result, data / data.max()))
+    assert(np.max(result) == 1)
+    result = ArrayUtil.getNormalized(data[0], maximum=100, dtype=np.float64)
+    assert(np.array_equal(result, data[0] / 100))
+    data = np.random.random((20, 20))
+    assert(ArrayUtil.getNormalized(data) is data)
+
+
+def testGetNormalizedMemory():
+    data = np.ones((40, 200, 200), dtype=np.uint16)
+    data[3, 4, 5] = 4000
+    tracemalloc.start()
+    result = ArrayUtil.getNormalized(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert(result.nbytes == 4 * data.size)
+    assert(peak < result.nbytes + 8 * data[0].size)
+    assert(result[3, 4, 5] == 1)
@@ -1,5 +1,7 @@
 import sys
 import numpy as np
+from pathlib import Path
+from skimage import io
 from napari_bigfish.bigfishapp import BigfishApp
 from unittest.mock import MagicMock
 from unittest.mock import patch
@@ -82,12 +84,17 @@ def testReportSpots(mockPathExists):
         app.spots = [(1,2,3), (4,5,6)]
         app.reportSpots("./a")
     handle = m()
-    handle.write.assert_any_call('index,axis-0,axis-1,axis-2')
-    handle.write.assert_any_call("\n")
-    handle.write.assert_any_call('1,1,2,3')
-    handle.write.assert_any_call("\n")
-    handle.write.assert_any_call('2,4,5,6')
-    handle.write.assert_any_call("\n")
+    handle.write.assert_called_once_with(
+                    'index,axis-0,axis-1,axis-2\n1,1,2,3\n2,4,5,6\n')
+
+
+def testGetSpotsAsCSV():
+    app = BigfishApp()
+    app.spots = np.zeros((0, 3), dtype=np.int64)
+    assert(app.getSpotsAsCSV() == 'index,axis-0,axis-1,axis-2\n')
+    app.spots = np.array([[1.5, 2], [3, 4.25]])
+    assert(app.getSpotsAsCSV() ==
+           'index,axis-0,axis-1,axis-2\n1,1.5,2.0\n2,3.0,4.25\n')
 
 
 def testGettersAndSetters():
@@ -162,4 +169,125 @@ def test_getDecomposeSpotRadius():
 
 def test_countSpotsPerCellAndEnvironment_noSpots():
     app = BigfishApp()
-    assert(not app.countSpotsPerCellAndEnvironment(None, None))
\ No newline at end of file
+    assert(not app.countSpotsPerCellAndEnvironment(None, None))
+
+def testRunBatchInParallel(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    rng = np.random.default_rng(42)
+    inputImages = []
+    cellLabels = []
+    for index in range(3):
+        image = rng.integers(0, 100, size=(64, 64), dtype=np.uint16)
+        image[10*index+5, 10*index+5] = 5000
+        imagePath = str(folder / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+        labels = np.zeros((64, 64), dtype=np.uint16)
+        labels[20:40, :] = 1
+        labels[40:, :] = 2
+        labelsPath = str(folder / "labels{}.tif".format(index))
+        io.imsave(labelsPath, labels, check_contrast=False)
+        cellLabels.append(labelsPath)
+    app = BigfishApp()
+    app.findThreshold = False
+    app.threshold = 500
+    app.setNumberOfWorkers(2)
+    progress = []
+    app.progressSignal.connect(lambda value, maxValue: progress.append(value))
+    app.runBatch((1, 100, 100), inputImages, cellLabels=cellLabels)
+    assert(progress == [0, 1, 2, 3])
+    for imagePath in inputImages:
+        assert((folder / "spots" / (Path(imagePath).stem + ".csv")).exists())
+    reports = list((folder / "results").iterdir())
+    assert(len(reports) == 1)
+    lines = reports[0].read_text().splitlines()
+    images = [line.split(",")[0] for line in lines[1:]]
+    assert(images == [path for path in inputImages for cell in range(3)])
+
+
+def testRunBatchInParallelSetsThreshold(tmp_path):
+    rng = np.random.default_rng(7)
+    inputImages = []
+    for index in range(2):
+        image = rng.integers(0, 100, size=(64, 64), dtype=np.uint16)
+        for spot in range(10):
+            image[rng.integers(5, 59), rng.integers(5, 59)] = 5000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+    serialThresholds = []
+    app = BigfishApp()
+    app.activateFindThreshold()
+    app.thresholdSignal.connect(serialThresholds.append)
+    app.runBatch((1, 100, 100), inputImages)
+    thresholds = []
+    app = BigfishApp()
+    app.activateFindThreshold()
+    app.setNumberOfWorkers(2)
+    app.thresholdSignal.connect(thresholds.append)
+    app.runBatch((1, 100, 100), inputImages)
+    assert(len(thresholds) == 2)
+    assert(thresholds == serialThresholds)
+    assert(app.getThreshold() == serialThresholds[-1])
+
+
+def testRunBatchWithTimingReport(tmp_path):
+    from napari_bigfish.instrumentation import Instrumentation
+    inputImages = []
+    for index in range(2):
+        image = np.zeros((30, 30), dtype=np.uint16)
+        image[5+5*index:8+5*index, 5:8] = 30000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+    for workers in (1, 2):
+        app = BigfishApp()
+        app.findThreshold = False
+        app.threshold = 100
+        app.setNumberOfWorkers(workers)
+        app.setInstrumentation(Instrumentation())
+        measurements = []
+        app.timingSignal.connect(measurements.append)
+        reportPath = str(tmp_path / "results{}_count.csv".format(workers))
+        with mock.patch.object(BigfishApp, 'createEmptySpotCountReport',
+                               return_value=reportPath):
+            app.runBatch((1, 100, 100), inputImages,
+                         subtractBackground=True)
+        stages = ["read", "subtract background", "detect spots",
+                  "count spots", "write spots", "write report"]
+        assert([(measurement["image"], measurement["stage"])
+                for measurement in measurements]
+               == [(path, stage) for path in inputImages for stage in stages])
+        lines = (tmp_path / "results{}_timing.csv".format(workers)) \
+                    .read_text().splitlines()
+        assert(len(lines) == 1 + len(measurements))
+
+
+def testRunBatchInParallelWithSpotStore(tmp_path):
+    from napari_bigfish.binary_report import BinaryReport
+    inputImages = []
+    for index in range(3):
+        image = np.zeros((30, 30), dtype=np.uint16)
+        image[5+5*index:8+5*index, 5:8] = 30000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+    stores = []
+    for workers in (1, 2):
+        app = BigfishApp()
+        app.findThreshold = False
+        app.threshold = 100
+        app.setNumberOfWorkers(workers)
+        with mock.patch.object(BigfishApp, 'createEmptySpotCountReport',
+                return_value=str(tmp_path / "results{}_count.csv".format(workers))):
+            app.runBatch((1, 100, 100), inputImages, spotStore=True)
+        stores.append(BinaryReport.readSpotStore(
+                            tmp_path / "results{}_spots.npy".format(workers)))
+    assert(not (tmp_path / "spots").exists())
+    assert(stores[0].tolist() == stores[1].tolist())
+    assert(stores[0]["image id"].tolist() == [0, 1, 2])
+    assert(stores[0]["axis-0"].tolist() == [6, 11, 16])
+    image1 = BinaryReport.readSpotStore(tmp_path / "results2_spots.npy",
+                                        inputImages[1])
+    assert(image1["axis-0"].tolist() == [11])
@@ -0,0 +1,641 @@
+import pytest
+import numpy as np
+import unittest.mock as mock
+from napari_bigfish.bigfishcore import BigfishCore
+from napari_bigfish.cancel import CancelToken, OperationCancelled
+from napari_bigfish._tests.images import createSpotImage
+
+
+
+def testSaveAndLoadParameters(tmp_path):
+    core = BigfishCore()
+    core.setSigmaXY(3.1)
+    core.setThreshold(27)
+    core.deactivateFindThreshold()
+    path = tmp_path / "parameters.json"
+    core.saveParameters(path)
+    otherCore = BigfishCore()
+    otherCore.loadParameters(path)
+    assert(otherCore.getParameters() == core.getParameters())
+    assert(otherCore.getSigmaXY() == 3.1)
+    assert(otherCore.getThreshold() == 27)
+    assert(not otherCore.shallFindThreshold())
+
+
+def testProgressCallbacks():
+    core = BigfishCore()
+    progress = []
+    core.addProgressCallback(lambda value, maxValue: progress.append((value, maxValue)))
+    core.setProgressMax(3)
+    core.setProgress(1)
+    assert(progress == [(0, 3), (1, 3)])
+
+
+
+def testCountSpotsPerCellAndEnvironment():
+    rng = np.random.default_rng(7)
+    cellLabels = rng.integers(0, 20, size=(10, 50, 50))
+    nucleiMask = rng.integers(0, 2, size=(10, 50, 50)) * 255
+    spots = np.column_stack([rng.integers(0, size, 1000) for size in cellLabels.shape])
+    core = BigfishCore()
+    core.spots = spots
+    assert(core.countSpotsPerCellAndEnvironment(cellLabels, nucleiMask))
+    expectedCells = [cellLabels[tuple(coords)] for coords in spots]
+    expectedInNucleus = [nucleiMask[tuple(coords)] > 0 for coords in spots]
+    assert(np.array_equal(core.cellLabelOfSpot, expectedCells))
+    assert(np.array_equal(core.nucleiLabelOfSpot, expectedInNucleus))
+
+
+def testCountSpotsPerCellAndEnvironmentFloatCoordinates():
+    cellLabels = np.zeros((10, 10), dtype=np.uint16)
+    cellLabels[5:, :] = 1
+    core = BigfishCore()
+    core.spots = np.array([[2.0, 3.0], [7.0, 1.0]])
+    core.countSpotsPerCellAndEnvironment(cellLabels, None)
+    assert(list(core.cellLabelOfSpot) == [0, 1])
+    assert(list(core.nucleiLabelOfSpot) == [False, False])
+
+
+def testCountSpotsPerCellAndEnvironmentNoSpotsFound():
+    core = BigfishCore()
+    core.spots = np.zeros((0, 2), dtype=np.int64)
+    assert(core.countSpotsPerCellAndEnvironment(np.zeros((5, 5)), None))
+    assert(len(core.cellLabelOfSpot) == 0)
+
+
+def testGetSpotCountPerCellAndEnvironment():
+    cellLabels = np.zeros((10, 10), dtype=np.uint16)
+    cellLabels[5:, :] = 2
+    nucleiMask = np.zeros((10, 10), dtype=np.uint8)
+    nucleiMask[8:, :] = 1
+    core = BigfishCore()
+    core.spots = np.array([[1, 1], [6, 1], [6, 2], [9, 9], [2, 2]])
+    core.countSpotsPerCellAndEnvironment(cellLabels, nucleiMask)
+    table = core.getSpotCountPerCellAndEnvironment()
+    assert(table.tolist() == [(0, 2, 0, 2), (1, 0, 0, 0), (2, 2, 1, 3)])
+    assert(table["spots in cell"].sum() == len(core.spots))
+
+
+def testGetSpotCountPerCellAndEnvironmentWithoutLabels():
+    core = BigfishCore()
+    core.spots = np.array([[1, 1], [6, 1]])
+    core.countSpotsPerCellAndEnvironment(None, None)
+    table = core.getSpotCountPerCellAndEnvironment()
+    assert(table.tolist() == [(0, 2, 0, 2)])
+
+
+def testReportSpotCounts(tmp_path):
+    core = BigfishCore()
+    core.spots = np.array([[1, 1], [6, 1]])
+    cellLabels = np.zeros((10, 10), dtype=np.uint16)
+    cellLabels[5:, :] = 1
+    core.countSpotsPerCellAndEnvironment(cellLabels, None)
+    path = tmp_path / "counts.csv"
+    core.reportSpotCounts("a.tif", str(path))
+    assert(path.read_text() == "a.tif,0,1,0,1\na.tif,1,1,0,1\n")
+
+
+def testGetSpotCountPerCellAndEnvironmentSparseLabels():
+    cellLabels = np.zeros((10, 10), dtype=np.uint32)
+    cellLabels[2:5, :] = 17
+    cellLabels[5:, :] = 40012
+    nucleiMask = np.zeros((10, 10), dtype=np.uint8)
+    nucleiMask[8:, :] = 1
+    core = BigfishCore()
+    core.activateSparseLabels()
+    core.spots = np.array([[1, 1], [3, 1], [6, 2], [9, 9]])
+    core.countSpotsPerCellAndEnvironment(cellLabels, nucleiMask)
+    table = core.getSpotCountPerCellAndEnvironment()
+    assert(len(table) == 3)
+    assert(table.tolist() == [(0, 1, 0, 1), (17, 1, 0, 1), (40012, 1, 1, 2)])
+
+
+def testSubtractBackgroundTiled(tmp_path):
+    rng = np.random.default_rng(11)
+    data = rng.integers(0, 4000, size=(12, 70, 90), dtype=np.uint16)
+    core = BigfishCore()
+    core.setData(data)
+    core.subtractBackground()
+    expected = core.getResult()
+    core.setTileSizeXY(32)
+    core.setTileSizeZ(5)
+    out = np.memmap(tmp_path / "result.raw", dtype=data.dtype, mode="w+",
+                    shape=data.shape)
+    core.subtractBackground(out=out)
+    assert(core.getResult() is out)
+    assert(np.array_equal(out, expected))
+
+
+def testSubtractBackgroundTiled2D():
+    rng = np.random.default_rng(12)
+    data = rng.random((64, 50))
+    core = BigfishCore()
+    core.setData(data)
+    core.subtractBackground()
+    expected = core.getResult()
+    core.setTileSizeXY(20)
+    core.subtractBackground()
+    assert(np.allclose(core.getResult(), expected))
+
+
+def testDetectSpotsTiled():
+    data = createSpotImage((10, 80, 90), 60, 5)
+    scale = (300, 100, 100)
+    core = BigfishCore()
+    core.deactivateFindThreshold()
+    core.setThreshold(50)
+    core.setData(data)
+    core.detectSpots(scale)
+    expected = core.getSpots()
+    core.setTileSizeXY(30)
+    core.setTileSizeZ(4)
+    core.setNumberOfThreads(3)
+    core.detectSpots(scale)
+    spots = core.getSpots()
+    assert(len(expected) > 20)
+    assert(np.array_equal(np.unique(spots, axis=0), np.unique(expected, axis=0)))
+    assert(len(spots) == len(expected))
+
+
+def testDetectSpotsTiledWithAutomaticThreshold():
+    data = createSpotImage((8, 80, 90), 60, 6)
+    scale = (300, 100, 100)
+    core = BigfishCore()
+    core.setData(data)
+    core.detectSpots(scale)
+    expectedThreshold = core.getThreshold()
+    expected = core.getSpots()
+    core.setTileSizeXY(32)
+    core.setThreshold(0)
+    core.detectSpots(scale)
+    assert(core.getThreshold() == expectedThreshold)
+    assert(np.array_equal(np.unique(core.getSpots(), axis=0),
+                          np.unique(expected, axis=0)))
+
+
+def testDetectSpotsTiledWithAutomaticThresholdFiltersOnce():
+    from napari_bigfish.array_util import ArrayUtil
+    data = createSpotImage((8, 80, 90), 60, 6)
+    scale = (300, 100, 100)
+    core = BigfishCore()
+    core.setData(data)
+    core.setTileSizeXY(32)
+    tiles = ArrayUtil.getTiles(data.shape, core.getTileShape(),
+                               core.getDetectionHalo(scale))
+    filterLoG = core.filterLoG
+    with mock.patch.object(core, 'filterLoG',
+                           side_effect=filterLoG) as countingFilterLoG:
+        with mock.patch('bigfish.detection.detect_spots') as detectSpots:
+            core.detectSpots(scale)
+            detectSpots.assert_not_called()
+    assert(countingFilterLoG.call_count == len(tiles))
+    assert(core.getThreshold() is not None)
+    assert(len(core.getSpots()) > 0)
+
+
+def testFindGlobalThreshold(tmp_path):
+    from skimage import io
+    from bigfish import detection
+    images = [createSpotImage((40, 50), 20, seed) for seed in (1, 2)]
+    paths = []
+    for index, image in enumerate(images):
+        path = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(path, image, check_contrast=False)
+        paths.append(path)
+    _, expected = detection.detect_spots(images, return_threshold=True,
+                                         voxel_size=(100, 100),
+                                         spot_radius=(170, 170))
+    core = BigfishCore()
+    threshold = core.findGlobalThreshold((300, 100, 100), paths)
+    assert(threshold == expected)
+    assert(core.getThreshold() == expected)
+    core.runBatch((300, 100, 100), paths, globalThreshold=True)
+    assert(core.shallFindThreshold())
+    assert(core.getThreshold() == expected)
+
+
+def testProcessImageWithCompressedLabels(tmp_path):
+    import tifffile
+    data = np.zeros((4, 20, 20), dtype=np.uint16)
+    data[:, 4:7, 4:7] = 30000
+    data[:, 14:17, 11:14] = 30000
+    labels = np.zeros(data.shape, dtype=np.uint16)
+    labels[:, 10:, :] = 4
+    nuclei = np.zeros(data.shape, dtype=np.uint8)
+    nuclei[:, 14:17, 10:14] = 255
+    imagePath = str(tmp_path / "image.tif")
+    labelsPath = str(tmp_path / "labels.tif")
+    nucleiPath = str(tmp_path / "nuclei.tif")
+    tifffile.imwrite(imagePath, data)
+    tifffile.imwrite(labelsPath, labels, compression='zlib',
+                     photometric='minisblack')
+    tifffile.imwrite(nucleiPath, nuclei, compression='zlib',
+                     photometric='minisblack')
+    core = BigfishCore()
+    core.deactivateFindThreshold()
+    core.setThreshold(100)
+    core.setTileSizeXY(10)
+    table = core.processImage((1000, 100, 100), imagePath, labelsPath,
+                              nucleiPath)
+    assert(len(table) == 5)
+    assert(table[0]["spots in cell"] == 1)
+    assert(table[4]["spots in nucleus"] == 1)
+    assert(table[4]["spots in cytoplasm"] == 0)
+
+
+def testRunBatchWithPrefetch(tmp_path):
+    from skimage import io
+    inputImages = []
+    cellLabels = []
+    for index in range(3):
+        image = np.zeros((30, 30), dtype=np.uint16)
+        image[5+5*index:8+5*index, 5:8] = 30000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+        labels = np.zeros((30, 30), dtype=np.uint16)
+        labels[10:, :] = index + 1
+        labelsPath = str(tmp_path / "labels{}.tif".format(index))
+        io.imsave(labelsPath, labels, check_contrast=False)
+        cellLabels.append(labelsPath)
+    reports = []
+    for depth in (0, 2):
+        core = BigfishCore()
+        core.deactivateFindThreshold()
+        core.setThreshold(100)
+        core.setPrefetchDepth(depth)
+        with mock.patch.object(BigfishCore, 'createEmptySpotCountReport',
+                return_value=str(tmp_path / "report{}.csv".format(depth))):
+            core.runBatch((1, 100, 100), inputImages, cellLabels=cellLabels)
+        reports.append((tmp_path / "report{}.csv".format(depth)).read_text())
+        assert(core.prefetchStatistics["read time"] > 0)
+    assert(reports[0] == reports[1])
+    assert(len(reports[0].splitlines()) == 2 + 3 + 4)
+
+
+def testRunBatchWithBinaryOutput(tmp_path):
+    from skimage import io
+    from napari_bigfish.binary_report import BinaryReport
+    image = np.zeros((30, 30), dtype=np.uint16)
+    image[5:8, 5:8] = 30000
+    image[20:23, 5:8] = 30000
+    imagePath = str(tmp_path / "image.tif")
+    io.imsave(imagePath, image, check_contrast=False)
+    labels = np.zeros((30, 30), dtype=np.uint16)
+    labels[15:, :] = 2
+    labelsPath = str(tmp_path / "labels.tif")
+    io.imsave(labelsPath, labels, check_contrast=False)
+    core = BigfishCore()
+    core.deactivateFindThreshold()
+    core.setThreshold(100)
+    core.setOutputFormat("npz")
+    core.runBatch((1, 100, 100), [imagePath], cellLabels=[labelsPath])
+    counts, spots = BinaryReport.readPlate(tmp_path)
+    assert(counts["image"].tolist() == [imagePath] * 3)
+    assert(counts["spots in cell"].tolist() == [1, 0, 1])
+    assert(spots["cell"].tolist() == [0, 2])
+    assert(spots["axis-0"].tolist() == [6, 21])
+
+
+def testDeactivateSparseLabelsKeepsTiling():
+    core = BigfishCore()
+    core.setTileSizeXY(256)
+    core.setTileSizeZ(8)
+    core.activateSparseLabels()
+    core.deactivateSparseLabels()
+    assert(not core.shallUseSparseLabels())
+    assert(core.getTileSizeXY() == 256)
+    assert(core.getTileSizeZ() == 8)
+
+
+def testSetOutputFormat():
+    core = BigfishCore()
+    core.setOutputFormat("npz")
+    assert(core.getOutputFormat() == "npz")
+    with pytest.raises(ValueError):
+        core.setOutputFormat("xls")
+    assert(core.getOutputFormat() == "npz")
+
+
+def testSetWorkingPrecision():
+    core = BigfishCore()
+    assert(core.getWorkingPrecision() == "float64")
+    core.setWorkingPrecision("float32")
+    assert(core.getWorkingDtype() == np.float32)
+    with pytest.raises(ValueError):
+        core.setWorkingPrecision("float16")
+    assert(core.getWorkingPrecision() == "float32")
+
+
+def testRunBatchResumable(tmp_path):
+    from skimage import io
+    inputImages = []
+    for index in range(4):
+        image = np.zeros((30, 30), dtype=np.uint16)
+        image[5+5*index:8+5*index, 5:8] = 30000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+    core = BigfishCore()
+    core.deactivateFindThreshold()
+    core.setThreshold(100)
+    processImageData = core.processImageData
+    processed = []
+    def processOrCrash(scale, inputImagePath, *args, **kwargs):
+        if inputImagePath == inputImages[2]:
+            raise RuntimeError("crash")
+        processed.append(inputImagePath)
+        return processImageData(scale, inputImagePath, *args, **kwargs)
+    with mock.patch.object(core, 'processImageData', processOrCrash):
+        with pytest.raises(RuntimeError):
+            core.runBatch((1, 100, 100), inputImages, resumable=True)
+    reports = list((tmp_path / "results").glob("*_count.csv"))
+    assert(len(reports) == 1)
+    with open(reports[0], "a") as f:
+        f.write("an incomplete row")
+    processed.clear()
+    with mock.patch.object(core, 'processImageData',
+                           side_effect=processImageData) as process:
+        core.runBatch((1, 100, 100), inputImages, resumable=True)
+    assert([call.args[1] for call in process.call_args_list] == inputImages[2:])
+    assert(list((tmp_path / "results").glob("*_count.csv")) == reports)
+    lines = reports[0].read_text().splitlines()
+    assert([line.split(",")[0] for line in lines[1:]] == inputImages)
+    core.setThreshold(200)
+    core.runBatch((1, 100, 100), inputImages, resumable=True)
+    assert(len(list((tmp_path / "results").glob("*_count.csv"))) == 2)
+
+
+def testRunBatchCancelled(tmp_path):
+    from skimage import io
+    inputImages = []
+    for index in range(4):
+        image = np.zeros((30, 30), dtype=np.uint16)
+        image[5+5*index:8+5*index, 5:8] = 30000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+    core = BigfishCore()
+    core.deactivateFindThreshold()
+    core.setThreshold(100)
+    token = CancelToken()
+    core.setCancelToken(token)
+    core.addProgressCallback(lambda progress, maxProgress:
+                             token.cancel() if progress == 2 else None)
+    with pytest.raises(OperationCancelled):
+        core.runBatch((1, 100, 100), inputImages, resumable=True)
+    assert(core.getData() is None)
+    reports = list((tmp_path / "results").glob("*_count.csv"))
+    lines = reports[0].read_text().splitlines()
+    assert([line.split(",")[0] for line in lines[1:]] == inputImages[:2])
+    core.setCancelToken(None)
+    with mock.patch.object(core, 'processImageData',
+                           side_effect=core.processImageData) as process:
+        core.runBatch((1, 100, 100), inputImages, resumable=True)
+    assert([call.args[1] for call in process.call_args_list] == inputImages[2:])
+
+
+@pytest.mark.parametrize("globalThreshold", [False, True])
+def testRunBatchResumableWithAutomaticThreshold(tmp_path, globalThreshold):
+    from skimage import io
+    inputImages = []
+    for index in range(3):
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, createSpotImage((40, 40), 10, index),
+                  check_contrast=False)
+        inputImages.append(imagePath)
+    core = BigfishCore()
+    core.activateFindThreshold()
+    token = CancelToken()
+    core.setCancelToken(token)
+    processImageData = core.processImageData
+    def processAndCancel(*args, **kwargs):
+        result = processImageData(*args, **kwargs)
+        token.cancel()
+        return result
+    with mock.patch.object(core, 'processImageData', processAndCancel):
+        with pytest.raises(OperationCancelled):
+            core.runBatch((1, 100, 100), inputImages,
+                          globalThreshold=globalThreshold, resumable=True)
+    reports = list((tmp_path / "results").glob("*_count.csv"))
+    assert(len(reports) == 1)
+    core.setCancelToken(None)
+    with mock.patch.object(core, 'processImageData',
+                           side_effect=core.processImageData) as process:
+        core.runBatch((1, 100, 100), inputImages,
+                      globalThreshold=globalThreshold, resumable=True)
+    assert([call.args[1] for call in process.call_args_list] == inputImages[1:])
+    assert(list((tmp_path / "results").glob("*_count.csv")) == reports)
+    lines = reports[0].read_text().splitlines()
+    assert([line.split(",")[0] for line in lines[1:]] == inputImages)
+
+
+def testRunBatchResumableWithChangedImage(tmp_path):
+    from skimage import io
+    inputImages = []
+    for index in range(3):
+        image = np.zeros((30, 30), dtype=np.uint16)
+        image[5+5*index:8+5*index, 5:8] = 30000
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, image, check_contrast=False)
+        inputImages.append(imagePath)
+    core = BigfishCore()
+    core.deactivateFindThreshold()
+    core.setThreshold(100)
+    core.runBatch((1, 100, 100), inputImages, resumable=True)
+    image = np.zeros((30, 30), dtype=np.uint16)
+    image[20:23, 20:23] = 30000
+    io.imsave(inputImages[1], image, check_contrast=False)
+    core.runBatch((1, 100, 100), inputImages, resumable=True)
+    reports = list((tmp_path / "results").glob("*_count.csv"))
+    assert(len(reports) == 2)
+    for report in reports:
+        lines = report.read_text().splitlines()
+        assert([line.split(",")[0] for line in lines[1:]] == inputImages)
+
+
+def testCancelTiledOperations():
+    data = createSpotImage((4, 40, 50), 10, 3)
+    core = BigfishCore()
+    core.setData(data)
+    core.setTileSizeXY(20)
+    token = CancelToken()
+    core.setCancelToken(token)
+    tiles = []
+    removeBackground = core.removeBackground
+    def removeBackgroundAndCancel(tile, sigma):
+        tiles.append(tile.shape)
+        token.cancel()
+        return removeBackground(tile, sigma)
+    with mock.patch.object(core, 'removeBackground', removeBackgroundAndCancel):
+        with pytest.raises(OperationCancelled):
+            core.subtractBackground()
+    assert(len(tiles) == 1)
+    with pytest.raises(OperationCancelled):
+        core.detectSpots((300, 100, 100))
+
+
+def testReportProgressOfTiledOperations():
+    data = createSpotImage((4, 40, 50), 10, 3)
+    core = BigfishCore()
+    core.setData(data)
+    core.setTileSizeXY(20)
+    values = []
+    core.getProgressReporter().addListener(values.append)
+    core.subtractBackground()
+    assert(len(values) > 2)
+    assert(values == sorted(values))
+    assert(values[-1] == 1)
+    values.clear()
+    core.getProgressReporter().reset()
+    core.detectSpots((300, 100, 100))
+    assert(len(values) > 2)
+    assert(values == sorted(values))
+    assert(values[-1] == 1)
+
+
+def testResultCache():
+    from napari_bigfish.cache import ResultCache
+    data = createSpotImage((40, 50), 20, 5)
+    core = BigfishCore()
+    core.setResultCache(ResultCache())
+    core.setData(data)
+    core.subtractBackground()
+    background = core.getResult()
+    core.detectSpots((100, 100))
+    spots = core.getSpots()
+    threshold = core.getThreshold()
+    assert(core.getResultCache().getStatistics()["misses"] == 2)
+    core.setData(data.copy())
+    core.setThreshold(0)
+    with mock.patch('bigfish.detection.detect_spots') as detectSpots:
+        core.detectSpots((100, 100))
+        detectSpots.assert_not_called()
+    core.subtractBackground()
+    assert(np.array_equal(core.getResult(), background))
+    assert(np.array_equal(core.getSpots(), spots))
+    with pytest.raises(ValueError):
+        core.getResult()[:] = 0
+    assert(core.getThreshold() == threshold)
+    assert(core.getResultCache().getStatistics()["hits"] == 2)
+    core.setSigmaXY(3)
+    core.subtractBackground()
+    core.deactivateFindThreshold()
+    core.detectSpots((100, 100))
+    assert(core.getResultCache().getStatistics()["misses"] == 4)
+
+
+def testResultCacheWithDataChangedInPlace():
+    from napari_bigfish.cache import ResultCache
+    data = createSpotImage((40, 50), 20, 5)
+    core = BigfishCore()
+    core.setResultCache(ResultCache())
+    core.setData(data)
+    core.detectSpots((100, 100))
+    assert(len(core.getSpots()) > 0)
+    data[:] = 0
+    core.setData(data)
+    core.detectSpots((100, 100))
+    assert(len(core.getSpots()) == 0)
+
+
+def testResultCacheWithoutAutomaticThreshold():
+    from napari_bigfish.cache import ResultCache
+    core = BigfishCore()
+    core.setResultCache(ResultCache())
+    core.setKeepCandidates(True)
+    core.setThreshold(50)
+    core.setData(np.zeros((40, 50), dtype=np.uint16))
+    core.detectSpots((100, 100))
+    assert(len(core.getSpots()) == 0)
+    assert(core.getThreshold() == 50)
+    assert(core.getResultCache().getStatistics()["entries"] == 0)
+
+
+def testFindGlobalThresholdWithoutResultCache(tmp_path):
+    from skimage import io
+    from napari_bigfish.cache import ResultCache
+    inputImages = []
+    for index in range(2):
+        imagePath = str(tmp_path / "image{}.tif".format(index))
+        io.imsave(imagePath, createSpotImage((40, 40), 10, index),
+                  check_contrast=False)
+        inputImages.append(imagePath)
+    core = BigfishCore()
+    core.setResultCache(ResultCache())
+    resultCache = core.getResultCache()
+    assert(core.findGlobalThreshold((1, 100, 100), inputImages,
+                                    subtractBackground=True) is not None)
+    assert(core.getResultCache() is resultCache)
+    assert(resultCache.getStatistics()["entries"] == 0)
+
+
+def testDetectSpotsFromCandidates():
+    data = createSpotImage((8, 40, 50), 30, 6)
+    scale = (300, 100, 100)
+    core = BigfishCore()
+    core.setData(data)
+    core.detectSpots(scale)
+    expected = core.getSpots()
+    threshold = core.getThreshold()
+    core.setKeepCandidates(True)
+    core.detectSpots(scale)
+    assert(core.getThreshold() == threshold)
+    assert(np.array_equal(core.getSpots(), expected))
+    core.deactivateFindThreshold()
+    core.setThreshold(200)
+    with mock.patch('bigfish.stack.log_filter') as logFilter:
+        core.detectSpots(scale)
+        logFilter.assert_not_called()
+    spots = core.getSpots()
+    core.setKeepCandidates(False)
+    core.detectSpots(scale)
+    assert(0 < len(spots) < len(expected))
+    assert(np.array_equal(spots, core.getSpots()))
+
+
+def testPreviewSpots():
+    data = createSpotImage((60, 70), 20, 7)
+    scale = (100, 100)
+    core = BigfishCore()
+    core.setData(data)
+    core.deactivateFindThreshold()
+    core.setThreshold(100)
+    core.detectSpots(scale)
+    expected = core.getSpots()
+    core.activateFindThreshold()
+    threshold = core.getThreshold()
+    spots = core.previewSpots(scale)
+    assert(np.array_equal(spots, expected))
+    assert(core.getThreshold() == threshold)
+    inner = (slice(10, 30), slice(0, 35))
+    spots = core.previewSpots(scale, inner)
+    assert(0 < len(spots) < len(expected))
+    assert(np.all(spots[:, 0] >= 10) and np.all(spots[:, 0] < 30))
+    assert(np.all(spots[:, 1] < 35))
+    core.setThreshold(-5)
+    assert(np.array_equal(core.previewSpots(scale),
+                          core.getSpotCandidates(scale).getSpots(0)))
+
+
+def testDetectSpotsFloat32():
+    data = createSpotImage((8, 40, 50), 30, 6)
+    scale = (300, 100, 100)
+    core = BigfishCore()
+    core.setData(data)
+    core.subtractBackground()
+    background = core.getResult()
+    core.detectSpots(scale)
+    expected = core.getSpots()
+    threshold = core.getThreshold()
+    core.setWorkingPrecision("float32")
+    core.subtractBackground()
+    assert(np.max(np.abs(core.getResult().astype(np.int64) - background)) <= 1)
+    with mock.patch('bigfish.stack.log_filter') as logFilter:
+        core.detectSpots(scale)
+        logFilter.assert_not_called()
+    spots = core.getSpots()
+    assert(abs(core.getThreshold() - threshold) <= 1)
+    common = set(map(tuple, spots)) & set(map(tuple, expected))
+    assert(len(common) >= 0.95 * len(expected))
+    assert(len(common) >= 0.95 * len(spots))
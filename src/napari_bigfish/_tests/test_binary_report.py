@@ -0,0 +1,94 @@
+import numpy as np
+from napari_bigfish.binary_report import BinaryReport
+
+
+
+def createCountTable(cells):
+    dtype = np.dtype([("cell", np.int64), ("spots in cell", np.int64)])
+    table = np.zeros(len(cells), dtype=dtype)
+    table["cell"] = cells
+    table["spots in cell"] = [3 * cell for cell in cells]
+    return table
+
+
+def testWriteAndReadSpots(tmp_path):
+    path = tmp_path / "image.npz"
+    spots = np.array([[1, 2, 3], [4, 5, 6]], dtype=np.int64)
+    BinaryReport.writeSpots(path, "/data/image.tif", spots, [7, 0],
+                            [True, False])
+    table = BinaryReport.readSpots(path)
+    assert(table.dtype["axis-0"] == np.int64)
+    assert(table.dtype["cell"] == np.int64)
+    assert(table.dtype["nucleus"] == bool)
+    assert(table["image"].tolist() == ["/data/image.tif"] * 2)
+    assert(table["axis-2"].tolist() == [3, 6])
+    assert(table["cell"].tolist() == [7, 0])
+    assert(table["nucleus"].tolist() == [True, False])
+
+
+def testWriteSpotsWithoutLabels(tmp_path):
+    path = tmp_path / "image.npz"
+    BinaryReport.writeSpots(path, "a.tif", np.array([[1, 2]]))
+    table = BinaryReport.readSpots(path)
+    assert(table["cell"].tolist() == [0])
+    assert(table["nucleus"].tolist() == [False])
+
+
+def testAppendAndReadCounts(tmp_path):
+    path = tmp_path / "count.npy"
+    path.touch()
+    assert(len(BinaryReport.readCounts(path)) == 0)
+    BinaryReport.appendCounts(path, "a.tif", createCountTable([0, 1]))
+    BinaryReport.appendCounts(path, "/long/path/b.tif", createCountTable([0]))
+    table = BinaryReport.readCounts(path)
+    assert(table["image"].tolist() == ["a.tif", "a.tif", "/long/path/b.tif"])
+    assert(table["cell"].tolist() == [0, 1, 0])
+    assert(table["spots in cell"].tolist() == [0, 3, 0])
+    assert(table.dtype["cell"] == np.int64)
+
+
+def testReadPlate(tmp_path):
+    (tmp_path / "results").mkdir()
+    (tmp_path / "spots").mkdir()
+    BinaryReport.appendCounts(tmp_path / "results" / "1_count.npy", "a.tif",
+                              createCountTable([0, 1]))
+    BinaryReport.appendCounts(tmp_path / "results" / "2_count.npy", "b.tif",
+                              createCountTable([0]))
+    BinaryReport.writeSpots(tmp_path / "spots" / "a.npz", "a.tif",
+                            np.array([[1, 2]]))
+    BinaryReport.writeSpots(tmp_path / "spots" / "b.npz", "b.tif",
+                            np.array([[3, 4], [5, 6]]))
+    counts, spots = BinaryReport.readPlate(tmp_path)
+    assert(counts["image"].tolist() == ["a.tif", "a.tif", "b.tif"])
+    assert(spots["image"].tolist() == ["a.tif", "b.tif", "b.tif"])
+    assert(spots["axis-1"].tolist() == [2, 4, 6])
+
+
+def testAppendAndReadSpotStore(tmp_path):
+    path = tmp_path / "batch_spots.npy"
+    path.touch()
+    BinaryReport.appendSpots(path, 0, "a.tif",
+        BinaryReport.createSpotTable(np.array([[1, 2], [3, 4]]), [5, 6]))
+    BinaryReport.appendSpots(path, 1, "bb.tif",
+        BinaryReport.createSpotTable(np.zeros((0, 2), dtype=np.int64)))
+    BinaryReport.appendSpots(path, 2, "c.tif",
+        BinaryReport.createSpotTable(np.array([[7, 8]]), None, [True]))
+    table = BinaryReport.readSpotStore(path)
+    assert(table["image id"].tolist() == [0, 0, 2])
+    assert(table["image"].tolist() == ["a.tif", "a.tif", "c.tif"])
+    assert(table["axis-1"].tolist() == [2, 4, 8])
+    assert(table["cell"].tolist() == [5, 6, 0])
+    assert(table["nucleus"].tolist() == [False, False, True])
+    assert(len(BinaryReport.readSpotStore(path, "c.tif")) == 1)
+
+
+def testReadPlateWithSpotStore(tmp_path):
+    (tmp_path / "results").mkdir()
+    BinaryReport.appendCounts(tmp_path / "results" / "1_count.npy", "a.tif",
+                              createCountTable([0]))
+    BinaryReport.appendSpots(tmp_path / "results" / "1_spots.npy", 0, "a.tif",
+        BinaryReport.createSpotTable(np.array([[1, 2], [3, 4]])))
+    counts, spots = BinaryReport.readPlate(tmp_path)
+    assert(counts["image"].tolist() == ["a.tif"])
+    assert(spots.dtype.names == ("image", "axis-0", "axis-1", "cell", "nucleus"))
+    assert(spots["axis-0"].tolist() == [1, 3])
@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+from napari_bigfish.cache import ResultCache
+
+
+
+def testGetArrayKey():
+    data = np.arange(12, dtype=np.uint16).reshape((3, 4))
+    key = ResultCache.getArrayKey(data)
+    assert(key == ResultCache.getArrayKey(data.copy()))
+    assert(key != ResultCache.getArrayKey(data.reshape((4, 3))))
+    assert(key != ResultCache.getArrayKey(data.astype(np.int32)))
+    assert(ResultCache.getArrayKey(data.T) ==
+           ResultCache.getArrayKey(np.ascontiguousarray(data.T)))
+    changed = data.copy()
+    changed[1, 1] = 100
+    assert(key != ResultCache.getArrayKey(changed))
+
+
+def testGetAndPut():
+    cache = ResultCache()
+    key = ResultCache.getKey("a", "operation", (1, 2.5))
+    assert(key != ResultCache.getKey("a", "operation", (1, 2.6)))
+    assert(cache.get(key) is None)
+    cache.put(key, (np.ones(3), np.float64(5)))
+    result = cache.get(key)
+    assert(np.array_equal(result[0], np.ones(3)))
+    assert(result[1] == 5)
+    statistics = cache.getStatistics()
+    assert(statistics["hits"] == 1)
+    assert(statistics["misses"] == 1)
+    assert(statistics["entries"] == 1)
+    assert(statistics["bytes"] == 3 * 8 + 8)
+
+
+def testResultsAreReadOnly(tmp_path):
+    cache = ResultCache(maxBytes=800, directory=tmp_path / "cache")
+    cache.put("a", (np.arange(100.0),))
+    result = cache.get("a")
+    assert(not result[0].flags.writeable)
+    with pytest.raises(ValueError):
+        result[0][:] = 0
+    cache.put("b", (np.zeros(100),))
+    result = cache.get("a")
+    assert(cache.getStatistics()["disk hits"] == 1)
+    assert(not result[0].flags.writeable)
+    assert(np.array_equal(result[0], np.arange(100.0)))
+
+
+def testLeastRecentlyUsedResultIsDropped():
+    cache = ResultCache(maxBytes=2 * 800)
+    cache.put("a", (np.zeros(100),))
+    cache.put("b", (np.zeros(100),))
+    cache.get("a")
+    cache.put("c", (np.zeros(100),))
+    assert(cache.get("b") is None)
+    assert(cache.get("a") is not None)
+    assert(cache.get("c") is not None)
+    assert(cache.getStatistics()["bytes"] == 1600)
+    cache.put("d", (np.zeros(1000),))
+    assert(cache.get("d") is None)
+    assert(cache.getStatistics()["entries"] == 2)
+
+
+def testDiskTier(tmp_path):
+    cache = ResultCache(maxBytes=800, directory=tmp_path / "cache")
+    cache.put("a", (np.arange(100.0), np.int64(3)))
+    cache.put("b", (np.zeros(100),))
+    result = cache.get("a")
+    assert(np.array_equal(result[0], np.arange(100.0)))
+    assert(result[1] == 3)
+    statistics = cache.getStatistics()
+    assert(statistics["disk hits"] == 1)
+    assert(statistics["hits"] == 1)
+    otherCache = ResultCache(directory=tmp_path / "cache")
+    assert(otherCache.get("b") is not None)
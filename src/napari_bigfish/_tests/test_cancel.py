@@ -0,0 +1,22 @@
+import pytest
+from napari_bigfish.cancel import CancelToken, OperationCancelled
+
+
+
+def testCancel():
+    token = CancelToken()
+    calls = []
+    callback = lambda: calls.append("a")
+    token.addCallback(callback)
+    token.addCallback(lambda: calls.append("b"))
+    token.removeCallback(callback)
+    token.check()
+    assert(not token.isCancelled())
+    token.cancel()
+    token.cancel()
+    assert(token.isCancelled())
+    assert(calls == ["b"])
+    with pytest.raises(OperationCancelled):
+        token.check()
+    token.addCallback(lambda: calls.append("c"))
+    assert(calls == ["b", "c"])
@@ -0,0 +1,86 @@
+import numpy as np
+from bigfish import stack, detection
+from napari_bigfish.candidates import SpotCandidates, CandidateCache
+from napari_bigfish._tests.images import createPlateauSpotImage
+
+
+
+def getCandidates(image, radius):
+    filtered = stack.log_filter(image, radius)
+    localMaxMask = detection.local_maximum_detection(filtered, radius)
+    candidates = SpotCandidates(image.ndim)
+    candidates.addChunk(filtered, localMaxMask)
+    return candidates, filtered, localMaxMask
+
+
+def testGetSpots():
+    for shape, radius in (((60, 70), (1.5, 1.5)),
+                          ((8, 40, 50), (1.1, 1.5, 1.5))):
+        image = createPlateauSpotImage(shape, 40, 3)
+        candidates, filtered, localMaxMask = getCandidates(image, radius)
+        for threshold in (0, 5, 20.5, 100, 10000):
+            for removeDuplicates in (True, False):
+                expected, _ = detection.spots_thresholding(filtered,
+                                                           localMaxMask,
+                                                           threshold,
+                                                           removeDuplicates)
+                spots = candidates.getSpots(threshold, removeDuplicates)
+                assert(spots.dtype == np.int64)
+                assert(np.array_equal(spots, expected.reshape(-1, len(shape))))
+
+
+def testGetSpotsWithoutThreshold():
+    image = createPlateauSpotImage((30, 30), 40, 1)
+    candidates, _, _ = getCandidates(image, (1.5, 1.5))
+    assert(candidates.getSpots(None).shape == (0, 2))
+    assert(candidates.canDetect(None))
+    assert(candidates.canDetect(0))
+    assert(not candidates.canDetect(-1))
+    assert(SpotCandidates(3).getSpots(10).shape == (0, 3))
+
+
+def testGetThreshold():
+    image = createPlateauSpotImage((60, 70), 40, 4)
+    candidates, _, _ = getCandidates(image, (1.5, 1.5))
+    _, expected = detection.detect_spots(image, return_threshold=True,
+                                         log_kernel_size=(1.5, 1.5),
+                                         minimum_distance=(1.5, 1.5))
+    assert(candidates.getThreshold() == expected)
+    assert(candidates.getNumberOfCandidates() > 0)
+
+
+def testAddChunks():
+    image = createPlateauSpotImage((60, 70), 40, 5)
+    radius = (1.5, 1.5)
+    expected, _, _ = getCandidates(image, radius)
+    candidates = SpotCandidates(2)
+    filtered = stack.log_filter(image[:, :45], radius)
+    localMaxMask = detection.local_maximum_detection(filtered, radius)
+    candidates.addChunk(filtered, localMaxMask, (slice(0, 60), slice(0, 35)))
+    filtered = stack.log_filter(image[:, 25:], radius)
+    localMaxMask = detection.local_maximum_detection(filtered, radius)
+    candidates.addChunk(filtered, localMaxMask, (slice(0, 60), slice(10, 45)),
+                        (0, 25))
+    spots = candidates.getSpots(20, False)
+    expectedSpots = expected.getSpots(20, False)
+    assert(np.array_equal(spots[np.lexsort(spots.T[::-1])], expectedSpots))
+    assert(candidates.getThreshold() == expected.getThreshold())
+
+
+def testCandidateCache():
+    cache = CandidateCache(maxEntries=2)
+    image = createPlateauSpotImage((60, 70), 40, 5)
+    candidates = SpotCandidates(2)
+    for rows in (slice(0, 30), slice(30, 60)):
+        filtered = stack.log_filter(image[rows], 1.5)
+        localMaxMask = detection.local_maximum_detection(filtered, 1.5)
+        candidates.addChunk(filtered, localMaxMask, offset=(rows.start, 0))
+    cache.put("a", candidates)
+    assert(len(candidates.values) == 1)
+    cache.put("b", SpotCandidates(2))
+    assert(cache.get("a") is candidates)
+    cache.put("c", SpotCandidates(2))
+    assert(cache.get("b") is None)
+    assert(cache.get("a") is candidates)
+    cache.clear()
+    assert(cache.get("a") is None)
@@ -0,0 +1,56 @@
+import sys
+import subprocess
+import numpy as np
+from skimage import io
+from napari_bigfish.cli import main, expandPatterns
+
+
+
+def testExpandPatterns(tmp_path):
+    for name in ["b.tif", "a.tif", "c.png"]:
+        (tmp_path / name).write_text("")
+    paths = expandPatterns([str(tmp_path / "*.tif"), "missing.tif"])
+    assert(paths == [str(tmp_path / "a.tif"), str(tmp_path / "b.tif"),
+                     "missing.tif"])
+
+
+def testMain(tmp_path, capsys):
+    rng = np.random.default_rng(3)
+    for index in range(2):
+        image = rng.integers(0, 100, size=(64, 64), dtype=np.uint16)
+        image[20, 20] = 5000
+        io.imsave(str(tmp_path / "image{}.tif".format(index)), image,
+                  check_contrast=False)
+    parameters = tmp_path / "parameters.json"
+    parameters.write_text('{"findThreshold": false, "threshold": 500}')
+    status = main([str(tmp_path / "image*.tif"), "--scale", "1", "100", "100",
+                   "--parameters", str(parameters), "--prefetch", "1"])
+    assert(status == 0)
+    assert((tmp_path / "spots" / "image0.csv").exists())
+    assert((tmp_path / "spots" / "image1.csv").exists())
+    assert(len(list((tmp_path / "results").iterdir())) == 1)
+    captured = capsys.readouterr()
+    assert("processed image 2 of 2" in captured.err)
+    assert("read images in" in captured.err)
+
+
+def testMainWithTiming(tmp_path, capsys):
+    image = np.zeros((64, 64), dtype=np.uint16)
+    image[20, 20] = 5000
+    io.imsave(str(tmp_path / "image.tif"), image, check_contrast=False)
+    parameters = tmp_path / "parameters.json"
+    parameters.write_text('{"findThreshold": false, "threshold": 500}')
+    status = main([str(tmp_path / "image.tif"), "--scale", "1", "100", "100",
+                   "--parameters", str(parameters), "--format", "npz",
+                   "--timing"])
+    assert(status == 0)
+    assert(len(list((tmp_path / "results").glob("*_timing.json"))) == 1)
+    captured = capsys.readouterr()
+    assert("detect spots: 1 times" in captured.err)
+
+
+def testCliDoesNotImportQt():
+    code = "import sys, napari_bigfish.cli; print('qtpy' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, check=True).stdout
+    assert(output.strip() == "False")
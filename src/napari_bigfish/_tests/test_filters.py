@@ -0,0 +1,34 @@
+import numpy as np
+from bigfish import stack
+from napari_bigfish.filters import Filters
+from napari_bigfish._tests.images import createVaryingSpotImage
+
+
+
+def testRemoveBackgroundGaussianLikeBigfish():
+    image = createVaryingSpotImage((6, 40, 50), 20, 1)
+    expected = stack.remove_background_gaussian(image, (1.5, 2.5, 2.5))
+    result = Filters.removeBackgroundGaussian(image, (1.5, 2.5, 2.5))
+    assert(result.dtype == np.uint16)
+    assert(np.array_equal(result, expected))
+    result = Filters.removeBackgroundGaussian(image, (1.5, 2.5, 2.5), np.float32)
+    assert(result.dtype == np.uint16)
+    assert(np.max(np.abs(result.astype(np.int64) - expected)) <= 1)
+
+
+def testLogFilterLikeBigfish():
+    image = createVaryingSpotImage((6, 40, 50), 20, 2)
+    expected = stack.log_filter(image, (1.2, 1.5, 1.5))
+    result = Filters.logFilter(image, (1.2, 1.5, 1.5))
+    assert(np.array_equal(result, expected))
+    result = Filters.logFilter(image, (1.2, 1.5, 1.5), np.float32)
+    assert(result.dtype == np.uint16)
+    assert(np.max(np.abs(result.astype(np.int64) - expected)) <= 1)
+
+
+def testLogFilterFloatImage():
+    image = (createVaryingSpotImage((40, 50), 20, 3) / 65535).astype(np.float32)
+    expected = stack.log_filter(image, 1.5)
+    result = Filters.logFilter(image, 1.5, np.float64)
+    assert(result.dtype == np.float32)
+    assert(np.allclose(result, expected))
@@ -0,0 +1,63 @@
+import numpy as np
+import tifffile
+import unittest.mock as mock
+from napari_bigfish.image_reader import ImageReader, LazyTiffImage
+
+
+
+def createStack():
+    return np.arange(5 * 6 * 7, dtype=np.uint16).reshape((5, 6, 7))
+
+
+def testOpenImageMemoryMapped(tmp_path):
+    data = createStack()
+    path = str(tmp_path / "image.tif")
+    tifffile.imwrite(path, data)
+    image = ImageReader.openImage(path)
+    assert(isinstance(image, np.memmap))
+    assert(np.array_equal(image, data))
+
+
+def testOpenImageLazy(tmp_path):
+    data = createStack()
+    path = str(tmp_path / "image.tif")
+    tifffile.imwrite(path, data, compression='zlib')
+    image = ImageReader.openImage(path)
+    assert(isinstance(image, LazyTiffImage))
+    assert(image.shape == data.shape)
+    assert(image.ndim == 3)
+    assert(image.dtype == data.dtype)
+    assert(np.array_equal(image[2], data[2]))
+    assert(np.array_equal(image[1:4, 2:, 3], data[1:4, 2:, 3]))
+    coordinates = (np.array([4, 0, 4, 2]), np.array([1, 2, 3, 5]),
+                   np.array([0, 6, 6, 1]))
+    assert(np.array_equal(image[coordinates], data[coordinates]))
+    assert(np.array_equal(np.asarray(image), data))
+
+
+def testOpenImageLazyReadsOnlyNeededPlanes(tmp_path):
+    data = createStack()
+    path = str(tmp_path / "image.tif")
+    tifffile.imwrite(path, data, compression='zlib')
+    image = LazyTiffImage(path)
+    with mock.patch.object(image, 'readPlanes',
+                           wraps=image.readPlanes) as readPlanes:
+        image[(np.array([3, 1, 3]), np.array([0, 0, 0]), np.array([0, 0, 0]))]
+    readPlanes.assert_called_once_with([1, 3])
+
+
+def testOpenImageCompressedPlane(tmp_path):
+    data = createStack()[0]
+    path = str(tmp_path / "image.tif")
+    tifffile.imwrite(path, data, compression='zlib')
+    image = ImageReader.openImage(path)
+    assert(isinstance(image, np.ndarray))
+    assert(np.array_equal(image, data))
+
+
+@mock.patch('skimage.io.imread')
+def testOpenImageOther(mockImRead):
+    mockImRead.return_value = np.zeros((3, 3))
+    image = ImageReader.openImage("a")
+    mockImRead.assert_called_once_with("a")
+    assert(image.shape == (3, 3))
@@ -0,0 +1,67 @@
+import json
+import pytest
+import numpy as np
+from napari_bigfish.instrumentation import Instrumentation, TIMING_COLUMNS
+
+
+
+def testMeasure():
+    instrumentation = Instrumentation()
+    measurements = []
+    instrumentation.addListener(measurements.append)
+    with instrumentation.measure("detect spots", "a.tif"):
+        np.ones(1000).sum()
+    with pytest.raises(ValueError):
+        with instrumentation.measure("count spots", "a.tif"):
+            raise ValueError()
+    instrumentation.removeListener(measurements.append)
+    with instrumentation.measure("write report"):
+        pass
+    assert(len(measurements) == 1)
+    assert(measurements[0]["image"] == "a.tif")
+    assert(measurements[0]["stage"] == "detect spots")
+    assert(measurements[0]["wall time"] >= 0)
+    assert(measurements[0]["peak allocations"] == 0)
+    assert([measurement["stage"] for measurement
+            in instrumentation.getMeasurements()] == ["detect spots",
+                                                      "write report"])
+    instrumentation.clear()
+    assert(instrumentation.getMeasurements() == [])
+
+
+def testTraceAllocations():
+    instrumentation = Instrumentation(traceAllocations=True)
+    with instrumentation.measure("allocate"):
+        data = np.ones(2**20)
+    measurement = instrumentation.getMeasurements()[0]
+    assert(measurement["peak allocations"] >= data.nbytes)
+
+
+def testGetSummary():
+    instrumentation = Instrumentation()
+    instrumentation.addMeasurements([
+        {"image": "a", "stage": "read", "wall time": 1, "cpu time": 0.5,
+         "peak rss": 10, "peak allocations": 0},
+        {"image": "a", "stage": "detect spots", "wall time": 2, "cpu time": 2,
+         "peak rss": 30, "peak allocations": 0},
+        {"image": "b", "stage": "read", "wall time": 3, "cpu time": 1,
+         "peak rss": 20, "peak allocations": 0}])
+    summary = instrumentation.getSummary()
+    assert(list(summary.keys()) == ["read", "detect spots"])
+    assert(summary["read"]["count"] == 2)
+    assert(summary["read"]["wall time"] == 4)
+    assert(summary["read"]["cpu time"] == 1.5)
+    assert(summary["read"]["peak rss"] == 20)
+
+
+def testWriteReport(tmp_path):
+    instrumentation = Instrumentation()
+    with instrumentation.measure("read", "a.tif"):
+        pass
+    instrumentation.writeReport(tmp_path / "timing.csv")
+    lines = (tmp_path / "timing.csv").read_text().splitlines()
+    assert(lines[0] == ",".join(TIMING_COLUMNS))
+    assert(lines[1].startswith("a.tif,read,"))
+    instrumentation.writeReport(tmp_path / "timing.json")
+    measurements = json.loads((tmp_path / "timing.json").read_text())
+    assert(measurements == instrumentation.getMeasurements())
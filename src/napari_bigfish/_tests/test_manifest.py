@@ -0,0 +1,79 @@
+import os
+from napari_bigfish.manifest import BatchManifest
+
+
+
+def createFiles(tmp_path):
+    image = tmp_path / "image.tif"
+    image.write_bytes(b"image data")
+    labels = tmp_path / "labels.tif"
+    labels.write_bytes(b"labels")
+    spots = tmp_path / "image.csv"
+    spots.write_text("index,axis-0,axis-1,axis-2\n")
+    report = tmp_path / "count.csv"
+    report.write_text("header\n")
+    return str(image), str(labels), str(spots), str(report)
+
+
+def testSaveAndLoad(tmp_path):
+    image, labels, spots, report = createFiles(tmp_path)
+    manifest = BatchManifest(tmp_path / "manifest.json")
+    manifest.start({"scale": (1, 2, 3)}, report)
+    manifest.addImage((image, labels, None), [spots], 7)
+    loaded = BatchManifest(tmp_path / "manifest.json")
+    assert(loaded.load())
+    assert(loaded.canResume({"scale": (1, 2, 3)}))
+    assert(not loaded.canResume({"scale": (1, 2, 4)}))
+    assert(not loaded.canResume({"scale": (1, 2, 3)}, spotStore=True))
+    assert(loaded.countReportSize == 7)
+    assert(loaded.isComplete((image, labels, None)))
+    assert(not loaded.isComplete((image, None, None)))
+    assert(not loaded.isComplete((str(tmp_path / "other.tif"), labels, None)))
+
+
+def testLoadMissing(tmp_path):
+    assert(not BatchManifest(tmp_path / "manifest.json").load())
+
+
+def testIsCompleteWithChangedInput(tmp_path):
+    image, labels, spots, report = createFiles(tmp_path)
+    manifest = BatchManifest(tmp_path / "manifest.json")
+    manifest.start({}, report)
+    manifest.addImage((image, labels, None), [spots], 7)
+    stat = os.stat(image)
+    os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert(manifest.isComplete((image, labels, None)))
+    with open(labels, "wb") as f:
+        f.write(b"LABELS")
+    assert(not manifest.isComplete((image, labels, None)))
+
+
+def testIsCompleteWithMissingOutput(tmp_path):
+    image, labels, spots, report = createFiles(tmp_path)
+    manifest = BatchManifest(tmp_path / "manifest.json")
+    manifest.start({}, report)
+    manifest.addImage((image, None, None), [spots], 7)
+    os.remove(spots)
+    assert(not manifest.isComplete((image, None, None)))
+
+
+def testTruncateReports(tmp_path):
+    image, labels, spots, report = createFiles(tmp_path)
+    manifest = BatchManifest(tmp_path / "manifest.json")
+    manifest.start({}, report)
+    with open(report, "a") as f:
+        f.write("partial row")
+    manifest.truncateReports()
+    assert(open(report).read() == "header\n")
+
+
+def testIsOutdated(tmp_path):
+    image, labels, spots, report = createFiles(tmp_path)
+    manifest = BatchManifest(tmp_path / "manifest.json")
+    manifest.start({}, report)
+    assert(not manifest.isOutdated((image, labels, None)))
+    manifest.addImage((image, labels, None), [spots], 7)
+    assert(not manifest.isOutdated((image, labels, None)))
+    with open(image, "wb") as f:
+        f.write(b"other data")
+    assert(manifest.isOutdated((image, labels, None)))
@@ -0,0 +1,99 @@
+import dataclasses
+import pytest
+from unittest import mock
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from napari_bigfish import pipeline
+from napari_bigfish.pipeline import Parameters
+from napari_bigfish.bigfishcore import BigfishCore
+from napari_bigfish.cache import ResultCache
+from napari_bigfish.candidates import CandidateCache
+from napari_bigfish._tests.images import createSpotImage
+
+
+
+def testParameters():
+    core = BigfishCore()
+    assert(Parameters().asDict() == core.getParameters())
+    core.setThreshold(30)
+    core.setNumberOfThreads(3)
+    parameters = Parameters.fromCore(core)
+    assert(parameters.threshold == 30)
+    assert(parameters.numberOfThreads == 3)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        parameters.threshold = 40
+    assert(parameters.replace(threshold=40).threshold == 40)
+    assert(parameters.threshold == 30)
+
+
+def testDetectSpotsLikeCore():
+    data = createSpotImage((8, 40, 50), 30, 6)
+    scale = (300, 100, 100)
+    core = BigfishCore()
+    core.setData(data)
+    core.subtractBackground()
+    background = core.getResult()
+    core.detectSpots(scale)
+    parameters = Parameters()
+    assert(np.array_equal(pipeline.subtractBackground(parameters, data),
+                          background))
+    spots, threshold = pipeline.detectSpots(parameters, scale, data)
+    assert(np.array_equal(spots, core.getSpots()))
+    assert(threshold == core.getThreshold())
+
+
+def testConcurrentOperations():
+    images = [createSpotImage((60, 70), 20, seed) for seed in range(4)]
+    scale = (100, 100)
+    parametersList = [Parameters(findThreshold=False, threshold=threshold)
+                      for threshold in (50, 100, 200, 400)]
+    expected = [pipeline.detectSpots(parameters, scale, image)[0]
+                for parameters, image in zip(parametersList, images)]
+    resultCache = ResultCache()
+    candidateCache = CandidateCache()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(pipeline.detectSpots, parameters, scale,
+                                   image, resultCache, candidateCache)
+                   for parameters, image in zip(parametersList, images)]
+        results = [future.result()[0] for future in futures]
+    for spots, expectedSpots in zip(results, expected):
+        assert(np.array_equal(spots, expectedSpots))
+    spots = pipeline.previewSpots(parametersList[0], scale, images[0],
+                                  candidateCache=candidateCache)
+    assert(np.array_equal(spots, expected[0]))
+
+
+def testPreviewSpotsWithDataKey():
+    image = createSpotImage((60, 70), 20, 1)
+    scale = (100, 100)
+    parameters = Parameters(findThreshold=False, threshold=100)
+    candidateCache = CandidateCache()
+    dataKey = pipeline.getDataKey(image)
+    expected = pipeline.previewSpots(parameters, scale, image,
+                                     candidateCache=candidateCache,
+                                     dataKey=dataKey)
+    with mock.patch.object(ResultCache, 'getArrayKey') as getArrayKey:
+        for threshold in (50, 100, 200):
+            spots = pipeline.previewSpots(parameters.replace(threshold=threshold),
+                                          scale, image,
+                                          candidateCache=candidateCache,
+                                          dataKey=dataKey)
+    assert(not getArrayKey.called)
+    assert(np.array_equal(spots, pipeline.previewSpots(
+                                    parameters.replace(threshold=200),
+                                    scale, image)))
+    assert(len(expected) > 0)
+
+
+def testCountSpots():
+    spots = np.array([[1, 1], [2, 5], [6, 6]])
+    labels = np.zeros((8, 8), dtype=np.int64)
+    labels[:4, :] = 1
+    labels[4:, :] = 3
+    mask = np.zeros((8, 8), dtype=bool)
+    mask[6, 6] = True
+    table = pipeline.countSpots(Parameters(sparseLabels=True), spots, labels,
+                                mask)
+    assert(table["cell"].tolist() == [1, 3])
+    assert(table["spots in cytoplasm"].tolist() == [2, 0])
+    assert(table["spots in nucleus"].tolist() == [0, 1])
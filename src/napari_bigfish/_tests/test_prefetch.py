@@ -0,0 +1,61 @@
+import time
+import threading
+import numpy as np
+from napari_bigfish.prefetch import Prefetcher
+
+
+
+def testPrefetcherKeepsOrder():
+    prefetcher = Prefetcher(lambda item: item * 2, range(10), depth=3)
+    assert(list(prefetcher) == [(item, item * 2) for item in range(10)])
+
+
+def testPrefetcherWithoutDepth():
+    prefetcher = Prefetcher(lambda item: item * 2, range(3), depth=0)
+    assert(list(prefetcher) == [(0, 0), (1, 2), (2, 4)])
+    assert(prefetcher.getStatistics()["hidden read time"] == 0)
+
+
+def testPrefetcherReadsAhead():
+    reading = []
+    lock = threading.Lock()
+    maxReading = [0]
+    def read(item):
+        with lock:
+            reading.append(item)
+            maxReading[0] = max(maxReading[0], len(reading))
+        time.sleep(0.02)
+        with lock:
+            reading.remove(item)
+        return item
+    prefetcher = Prefetcher(read, range(8), depth=2)
+    for item, result in prefetcher:
+        time.sleep(0.03)
+    assert(maxReading[0] == 2)
+    statistics = prefetcher.getStatistics()
+    assert(statistics["read time"] >= 8 * 0.02)
+    assert(statistics["wait time"] < statistics["read time"])
+    assert(statistics["hidden read time"] > 0)
+
+
+def testPrefetcherMemoryLimit():
+    started = []
+    def read(item):
+        started.append(item)
+        return np.zeros(1000, dtype=np.uint8)
+    prefetcher = Prefetcher(read, range(6), depth=4, maxBytes=1500)
+    for item, result in prefetcher:
+        time.sleep(0.01)
+        assert(len(started) <= item + 2)
+    assert(started == list(range(6)))
+
+
+def testPrefetcherCanReadAhead():
+    prefetcher = Prefetcher(None, [], depth=3, maxBytes=2500)
+    prefetcher.itemBytes = 1000
+    assert(prefetcher.canReadAhead(0))
+    assert(prefetcher.canReadAhead(1))
+    assert(not prefetcher.canReadAhead(2))
+    prefetcher.maxBytes = 0
+    assert(prefetcher.canReadAhead(2))
+    assert(not prefetcher.canReadAhead(3))
@@ -0,0 +1,39 @@
+from napari_bigfish.progress_reporter import ProgressReporter
+
+
+
+def testReportStages():
+    reporter = ProgressReporter()
+    values = []
+    reporter.addListener(values.append)
+    with reporter.stage(0, 0.5):
+        reporter.reportStep(1, 2)
+    with reporter.stage(0.5, 1):
+        with reporter.stage(0, 0.5):
+            reporter.report(1)
+        reporter.report(0.5)
+    assert(values == [0.25, 0.5, 0.75, 1])
+
+
+def testReportIsThrottledAndMonotonic():
+    reporter = ProgressReporter()
+    values = []
+    reporter.addListener(values.append)
+    for step in range(1, 1001):
+        reporter.reportStep(step, 1000)
+    reporter.report(0.5)
+    assert(len(values) <= 200)
+    assert(values == sorted(values))
+    assert(values[-1] == 1)
+    nrOfValues = len(values)
+    reporter.reset()
+    reporter.report(0.1)
+    assert(values[-1] == 0.1)
+    reporter.removeListener(values.append)
+    reporter.report(0.2)
+    assert(len(values) == nrOfValues + 1)
+
+
+def testGetStageRanges():
+    ranges = ProgressReporter.getStageRanges(4)
+    assert(ranges == [(0, 0.25), (0.25, 0.5), (0.5, 0.75), (0.75, 1)])
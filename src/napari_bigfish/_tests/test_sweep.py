@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import tifffile
+from napari_bigfish.bigfishcore import BigfishCore
+from napari_bigfish.sweep import ParameterSweep
+from napari_bigfish._tests.images import createSpotImage
+
+
+
+def countSpots(image, scale, threshold, radiusXY, sigma=None):
+    core = BigfishCore()
+    core.setData(image)
+    if sigma is not None:
+        core.setSigmaXY(sigma[0])
+        core.setSigmaZ(sigma[1])
+        core.subtractBackground()
+        core.setData(core.getResult())
+    core.setRadiusXY(radiusXY)
+    if threshold is None:
+        core.detectSpots(scale)
+        return core.getThreshold(), len(core.getSpots())
+    core.deactivateFindThreshold()
+    core.setThreshold(threshold)
+    core.detectSpots(scale)
+    return threshold, len(core.getSpots())
+
+
+def testGetGrid():
+    sweep = ParameterSweep(thresholds=[None, 10, 20], radiiXY=[150, 170],
+                           radiiZ=[1000], sigmasXY=[2], sigmasZ=[1, 2])
+    assert(sweep.getRadii() == [(150, 1000), (170, 1000)])
+    assert(sweep.getSigmas() == [(2, 1), (2, 2)])
+    assert(sweep.getNumberOfPoints() == 12)
+    assert(ParameterSweep(sigmasXY=[2]).getSigmas() == [None])
+
+
+def testParseValues():
+    assert(ParameterSweep.parseValues("1, 2.5,,3") == [1, 2.5, 3])
+    assert(ParameterSweep.parseValues("auto, 7", allowAutomatic=True) == [None, 7])
+    assert(ParameterSweep.parseValues("") == [])
+    with pytest.raises(ValueError):
+        ParameterSweep.parseValues("auto, 7")
+
+
+def testRun():
+    images = [createSpotImage((60, 70), 20, seed) for seed in (1, 2)]
+    scale = (300, 100, 100)
+    sweep = ParameterSweep(thresholds=[None, 20, 200], radiiXY=[150, 200],
+                           radiiZ=[1250], sigmasXY=[1.5], sigmasZ=[0.75])
+    core = BigfishCore()
+    progress = []
+    core.addProgressCallback(lambda value, maxValue: progress.append(value))
+    table = sweep.run(core, scale, images)
+    assert(len(table) == 2 * sweep.getNumberOfPoints())
+    assert(progress == [0, 1, 2])
+    assert(list(np.unique(table["image"])) == ["image 0", "image 1"])
+    assert(np.all(table["sigma xy"] == 1.5))
+    assert(list(table["automatic threshold"][:3]) == [True, False, False])
+    for row in table:
+        image = images[int(row["image"][-1])]
+        threshold = None if row["automatic threshold"] else row["threshold"]
+        expectedThreshold, expected = countSpots(image, scale, threshold,
+                                                 row["radius xy"], (1.5, 0.75))
+        assert(row["spots"] == expected)
+        assert(row["threshold"] == expectedThreshold)
+
+
+def testRunInParallel(tmp_path):
+    paths = []
+    for seed in (3, 4):
+        path = str(tmp_path / "image{}.tif".format(seed))
+        tifffile.imwrite(path, createSpotImage((60, 70), 20, seed))
+        paths.append(path)
+    scale = (300, 100, 100)
+    sweep = ParameterSweep(thresholds=[30, 60], radiiXY=[170], radiiZ=[1250])
+    core = BigfishCore()
+    expected = sweep.run(core, scale, paths)
+    core.setNumberOfWorkers(2)
+    table = sweep.run(core, scale, paths)
+    assert(np.array_equal(table["spots"], expected["spots"]))
+    assert(np.array_equal(table["threshold"], expected["threshold"]))
+    assert(list(table["image"]) == [paths[0]] * 2 + [paths[1]] * 2)
+    assert(np.all(np.isnan(table["sigma z"])))
@@ -0,0 +1,35 @@
+import numpy as np
+from bigfish import stack, detection
+from napari_bigfish.threshold import StreamingThreshold
+from napari_bigfish._tests.images import createVaryingSpotImage
+
+
+
+def testGetThresholdLikeBigfish():
+    images = [createVaryingSpotImage((60, 70), 40, 1),
+              createVaryingSpotImage((60, 70), 40, 2)]
+    _, expected = detection.detect_spots(images, return_threshold=True,
+                                         log_kernel_size=1.5,
+                                         minimum_distance=1.5)
+    streamingThreshold = StreamingThreshold()
+    for image in images:
+        filtered = stack.log_filter(image, 1.5)
+        localMaxMask = detection.local_maximum_detection(filtered, 1.5)
+        streamingThreshold.addChunk(filtered, localMaxMask)
+    assert(streamingThreshold.getThreshold() == expected)
+
+
+def testGetPercentileOfFloats():
+    rng = np.random.default_rng(3)
+    values = rng.random(10000)
+    values[:10] = values[:10] / 10
+    streamingThreshold = StreamingThreshold()
+    streamingThreshold.addChunk(values[:10], np.zeros(10, dtype=bool))
+    streamingThreshold.addChunk(values[10:], np.zeros(9990, dtype=bool))
+    binWidth = streamingThreshold.upperBound / 2**16
+    assert(abs(streamingThreshold.getPercentile(50) - np.percentile(values, 50)) <= binWidth)
+    assert(abs(streamingThreshold.getPercentile(99) - np.percentile(values, 99)) <= binWidth)
+
+
+def testGetThresholdWithoutData():
+    assert(StreamingThreshold().getThreshold() is None)
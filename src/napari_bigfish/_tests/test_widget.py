@@ -4,14 +4,20 @@ import logging
 from decimal import InvalidOperation
 from time import sleep
 
+import pytest
 import numpy as np
 from qtpy.QtCore import QItemSelectionModel
 from qtpy.QtWidgets import QFileDialog
 from napari_bigfish import DetectFISHSpotsWidget, DetectFISHSpotsBatchWidget
 from napari_bigfish._widget import SubtractBackgroundThread, DetectSpotsThread
+from napari_bigfish._widget import PreviewSpotsThread
 from napari_bigfish._widget import DecomposeDenseRegionsThread, CountSpotsThread
 from napari_bigfish._widget import BatchCountSpotsThread, Progress
-from napari_bigfish._widget import ImageListWidget
+from napari_bigfish._widget import OperationProgress, PROGRESS_STEPS
+from napari_bigfish._widget import ImageListWidget, ParameterSweepWidget
+from napari_bigfish.bigfishapp import BigfishApp
+from napari_bigfish.cache import ResultCache
+from napari_bigfish.candidates import CandidateCache
 from unittest.mock import MagicMock
 from unittest.mock import patch
 import unittest.mock as mock
@@ -148,6 +154,29 @@ def test_onFindThresholdChanged(make_napari_viewer, capsys):
 
 
 
+def test_onSparseLabelsChanged(make_napari_viewer, capsys):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    viewer.window.add_dock_widget(spotsWidget, area='right',
+                                       name="FISH-spot Detection",
+                                       tabify = False)
+    spotsWidget.onSparseLabelsChanged(2)
+    assert (spotsWidget.model.shallUseSparseLabels() == True)
+    spotsWidget.onSparseLabelsChanged(0)
+    assert (spotsWidget.model.shallUseSparseLabels() == False)
+    spotsWidget.model.activateSparseLabels()
+    assert(spotsWidget.sparseLabelsCheckbox.isChecked())
+
+
+def test_onPrecisionChanged(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    assert(spotsWidget.model.getWorkingPrecision() == "float64")
+    assert(spotsWidget.precisionCombo.currentText() == "float64")
+    spotsWidget.precisionCombo.setCurrentText("float32")
+    assert(spotsWidget.model.getWorkingPrecision() == "float32")
+
+
 def test_sigmaChanged(make_napari_viewer, capsys):
     viewer = make_napari_viewer()
     spotsWidget = DetectFISHSpotsWidget(viewer)
@@ -204,6 +233,26 @@ def test_findThresholdChanged(make_napari_viewer, capsys):
     assert(spotsWidget.findThresholdCheckbox.isChecked())
 
 
+def test_updateTileSize(make_napari_viewer, capsys):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    viewer.window.add_dock_widget(spotsWidget, area='right',
+                                       name="FISH-spot Detection",
+                                       tabify = False)
+    assert(spotsWidget.updateTileSizeXY("512"))
+    assert(spotsWidget.model.tileSizeXY == 512)
+    assert(not spotsWidget.updateTileSizeXY("a.b"))
+    assert(spotsWidget.model.tileSizeXY == 512)
+    assert(spotsWidget.updateTileSizeZ("32"))
+    assert(spotsWidget.model.tileSizeZ == 32)
+    assert(not spotsWidget.updateTileSizeZ("a.b"))
+    assert(spotsWidget.model.tileSizeZ == 32)
+    assert(spotsWidget.updateNumberOfThreads("4"))
+    assert(spotsWidget.model.getNumberOfThreads() == 4)
+    assert(not spotsWidget.updateNumberOfThreads("a.b"))
+    assert(spotsWidget.model.getNumberOfThreads() == 4)
+
+
 def test_updateSigmaXY(make_napari_viewer, capsys):
     viewer = make_napari_viewer()
     spotsWidget = DetectFISHSpotsWidget(viewer)
@@ -356,6 +405,149 @@ def test_threadDetectSpots(make_napari_viewer):
     assert(len(result)>0)
 
 
+
+def test_threadDetectSpotsNormalization():
+    model = MagicMock()
+    model.getParameters.return_value = {"workingPrecision": "float32"}
+    model.getNumberOfThreads.return_value = 1
+    image = np.ones((1, 5, 40, 50), dtype=np.uint16)
+    image[0, 2, 10, 10] = 1000
+    with patch("napari_bigfish.pipeline.detectSpots") as detectSpots:
+        detectSpots.return_value = (np.zeros((0, 3), dtype=np.int64), 15)
+        thread = DetectSpotsThread(model, image, MagicMock(), "spots", (1, 340, 340, 1090), 5)
+        result = thread.detectSpots()
+        data = detectSpots.call_args[0][2]
+        assert(data.shape == (5, 40, 50))
+        assert(data.dtype == np.float32)
+        assert(np.max(data) == 1)
+        assert(result.shape == (0, 4))
+        assert(thread.threshold == 15)
+        thread = DetectSpotsThread(model, image, MagicMock(), "spots", (1, 340, 340, 1090), 5,
+                                   normalize=False)
+        thread.detectSpots()
+        data = detectSpots.call_args[0][2]
+        assert(data.dtype == np.uint16)
+        assert(np.shares_memory(data, image))
+
+
+def test_threadsDoNotModifyModel():
+    model = MagicMock()
+    model.getParameters.return_value = {"findThreshold": False, "threshold": 0.5}
+    model.getNumberOfThreads.return_value = 1
+    model.getResultCache.return_value = None
+    model.getCandidateCache.return_value = None
+    image = np.zeros((40, 50), dtype=np.uint16)
+    image[10, 10] = 1000
+    image[30, 20] = 1000
+    thread = DetectSpotsThread(model, image, MagicMock(), "spots", (340, 340), 5)
+    model.getParameters.return_value = {"findThreshold": False, "threshold": 2}
+    spots = thread.detectSpots()
+    assert(spots.tolist() == [[10, 10], [30, 20]])
+    thread = CountSpotsThread(model, MagicMock(), spots, "spots",
+                              np.ones((40, 50), dtype=np.int64), None,
+                              ["image", "cell", "a", "b", "c"])
+    table = thread.countSpots()
+    assert(list(table["c"]) == [0, 2])
+    model.setData.assert_not_called()
+    model.setThreshold.assert_not_called()
+
+
+def test_cancelThread():
+    model = MagicMock()
+    model.getParameters.return_value = {}
+    model.getNumberOfThreads.return_value = 1
+    model.getResultCache.return_value = None
+    model.getCandidateCache.return_value = None
+    viewer = MagicMock()
+    image = np.zeros((40, 50), dtype=np.uint16)
+    thread = DetectSpotsThread(model, image, viewer, "spots", (340, 340), 5)
+    thread.cancel()
+    with patch("napari_bigfish._widget.notifications") as notifications:
+        thread.onWorkerReturned(thread.runCancellable(thread.detectSpots))
+        notifications.show_info.assert_called_once()
+    viewer.add_points.assert_not_called()
+    model.setThreshold.assert_not_called()
+
+
+def test_threadPreviewSpots(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    image = np.random.random((100, 100))
+    viewer.add_image(image)
+    spotsWidget.model.setThreshold(0.1)
+    thread = DetectSpotsThread(spotsWidget.model, image, viewer, "spots", (340, 340), 5)
+    expected = thread.detectSpots()
+    thread = PreviewSpotsThread(spotsWidget.model, image, viewer, "preview", (340, 340), 5)
+    result = thread.previewSpots()
+    assert(np.array_equal(result, expected))
+    thread = PreviewSpotsThread(spotsWidget.model, image, viewer, "preview", (340, 340), 5,
+                                (slice(20, 60), slice(0, 100)))
+    result = thread.previewSpots()
+    assert(np.array_equal(result, expected[(expected[:, 0] >= 20) & (expected[:, 0] < 60)]))
+    thread.updatePreviewLayer(result)
+    thread.updatePreviewLayer(expected)
+    assert(len(viewer.layers) == 2)
+    assert(len(viewer.layers["preview"].data) == len(expected))
+
+
+def test_previewSpotsHashesImageOnce():
+    model = MagicMock()
+    model.getParameters.return_value = {"findThreshold": False,
+                                        "threshold": 0.1}
+    model.getNumberOfThreads.return_value = 1
+    model.getCandidateCache.return_value = CandidateCache()
+    viewer = MagicMock()
+    image = np.random.random((100, 100))
+    previewCache = {}
+    getArrayKey = ResultCache.getArrayKey
+    with patch.object(ResultCache, "getArrayKey",
+                      side_effect=getArrayKey) as getKey:
+        for index in range(3):
+            thread = PreviewSpotsThread(model, image, viewer, "preview",
+                                        (340, 340), 5,
+                                        previewCache=previewCache)
+            thread.previewSpots()
+    assert(getKey.call_count == 1)
+    assert("dataKey" in previewCache)
+
+
+def test_onLayerDataChanged(make_napari_viewer):
+    viewer = make_napari_viewer()
+    layer = viewer.add_image(np.random.random((100, 100)))
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    previewCache = spotsWidget.previewCache
+    previewCache["dataKey"] = "key"
+    layer.data = np.zeros((100, 100))
+    assert(spotsWidget.previewCache is not previewCache)
+    assert(spotsWidget.previewCache == {})
+
+
+def test_schedulePreview(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    viewer.add_image(np.random.random((100, 100)))
+    spotsWidget.updateThreshold("0.2")
+    assert(not spotsWidget.previewTimer.isActive())
+    spotsWidget.previewCheckbox.setChecked(True)
+    spotsWidget.previewTimer.stop()
+    spotsWidget.updateThreshold("0.3")
+    assert(spotsWidget.previewTimer.isActive())
+    spotsWidget.previewThread = MagicMock()
+    spotsWidget.runPreview()
+    assert(spotsWidget.previewPending)
+
+
+def test_getVisibleRegion(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    layer = viewer.add_image(np.zeros((10, 100, 120)))
+    viewer.dims.set_current_step(0, 4)
+    region = spotsWidget.getVisibleRegion(layer)
+    assert(region[0] == slice(4, 5))
+    assert(region[1].start >= 0 and region[1].stop <= 100)
+    assert(region[2].start >= 0 and region[2].stop <= 120)
+
+
 '''
 def test_threadDecomposeDenseRegions(make_napari_viewer):
     viewer = make_napari_viewer()
@@ -409,8 +601,40 @@ def test_threadBatchCountSpots(mockMakedirs, mockImread, make_napari_viewer, cap
 def test_Progress():
     progress = Progress(None, 100, "Testing progress")
     progress.progressChanged(50, 100)
+    assert(progress.progress.n == 0)
+    assert(progress.progress.desc.startswith("Processing image 50 of 100"))
+    progress.fractionChanged(0.5)
     progress.progressChanged(100, 100)
+    progress.progressChanged(1, 10)
+    assert(progress.progress.n == 50)
+    progress.fractionChanged(1)
+    assert(progress.progress.n == 100)
+    progress.processFinished()
+
+
+def test_Progress_connectModel():
+    model = BigfishApp()
+    progress = Progress(None, 100, "Testing progress")
+    progress.connectModel(model)
+    model.progressFractionSignal.emit(0.25)
+    assert(progress.progress.n == 25)
     progress.processFinished()
+    model.progressFractionSignal.emit(0.75)
+    model.progressSignal.emit(3, 4)
+    assert(progress.progress.n == 25)
+    assert(progress.model is None)
+
+
+def test_OperationProgress():
+    progress = OperationProgress(None, "Testing progress")
+    assert(progress.progress.total == 0)
+    progress.fractionChanged(0.5)
+    progress.fractionChanged(0.25)
+    assert(progress.progress.total == PROGRESS_STEPS)
+    assert(progress.progress.n == PROGRESS_STEPS // 2)
+    progress.fractionChanged(1)
+    assert(progress.progress.n == PROGRESS_STEPS)
+    progress.stop()
 
 
 def test_detectFISHSpotsBatchWidget3D(make_napari_viewer):
@@ -463,6 +687,43 @@ def test_detectFISHSpotsBatchWidget_updateScaleZ(make_napari_viewer):
     assert(batchSpotsWidget.scaleZ == 990)
 
 
+def test_detectFISHSpotsBatchWidget_updateNumberOfWorkers(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    batchSpotsWidget = DetectFISHSpotsBatchWidget(viewer, spotsWidget.model)
+    viewer.window.add_dock_widget(batchSpotsWidget, area='right',
+                                       name="batch FISH-spot Detection",
+                                       tabify = False)
+    assert(batchSpotsWidget.updateNumberOfWorkers("4"))
+    assert(spotsWidget.model.getNumberOfWorkers() == 4)
+    assert(not batchSpotsWidget.updateNumberOfWorkers("abc"))
+    assert(spotsWidget.model.getNumberOfWorkers() == 4)
+
+
+def test_detectFISHSpotsBatchWidget_updatePrefetchDepth(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    batchSpotsWidget = DetectFISHSpotsBatchWidget(viewer, spotsWidget.model)
+    viewer.window.add_dock_widget(batchSpotsWidget, area='right',
+                                       name="batch FISH-spot Detection",
+                                       tabify = False)
+    assert(batchSpotsWidget.updatePrefetchDepth("2"))
+    assert(spotsWidget.model.getPrefetchDepth() == 2)
+    assert(not batchSpotsWidget.updatePrefetchDepth("abc"))
+    assert(spotsWidget.model.getPrefetchDepth() == 2)
+
+
+def test_detectFISHSpotsBatchWidget_onOutputFormatChanged(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    batchSpotsWidget = DetectFISHSpotsBatchWidget(viewer, spotsWidget.model)
+    viewer.window.add_dock_widget(batchSpotsWidget, area='right',
+                                       name="batch FISH-spot Detection",
+                                       tabify = False)
+    batchSpotsWidget.outputFormatCombo.setCurrentText("npz")
+    assert(spotsWidget.model.getOutputFormat() == "npz")
+
+
 def test_detectFISHSpotsBatchWidget_onSubtractBackgroundChanged(make_napari_viewer):
     viewer = make_napari_viewer()
     spotsWidget = DetectFISHSpotsWidget(viewer)
@@ -489,6 +750,45 @@ def test_detectFISHSpotsBatchWidget_onDecomposeChanged(make_napari_viewer):
     assert(batchSpotsWidget.decomposeDenseRegions)
 
 
+def test_detectFISHSpotsBatchWidget_onGlobalThresholdChanged(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    batchSpotsWidget = DetectFISHSpotsBatchWidget(viewer, spotsWidget.model)
+    viewer.window.add_dock_widget(batchSpotsWidget, area='right',
+                                       name="batch FISH-spot Detection",
+                                       tabify = False)
+    batchSpotsWidget.onGlobalThresholdChanged(2)
+    assert(batchSpotsWidget.globalThreshold)
+    batchSpotsWidget.onGlobalThresholdChanged(0)
+    assert(not batchSpotsWidget.globalThreshold)
+
+
+def test_detectFISHSpotsBatchWidget_onSpotStoreChanged(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    batchSpotsWidget = DetectFISHSpotsBatchWidget(viewer, spotsWidget.model)
+    viewer.window.add_dock_widget(batchSpotsWidget, area='right',
+                                       name="batch FISH-spot Detection",
+                                       tabify = False)
+    batchSpotsWidget.onSpotStoreChanged(2)
+    assert(batchSpotsWidget.spotStore)
+    batchSpotsWidget.onSpotStoreChanged(0)
+    assert(not batchSpotsWidget.spotStore)
+
+
+def test_detectFISHSpotsBatchWidget_onResumableChanged(make_napari_viewer):
+    viewer = make_napari_viewer()
+    spotsWidget = DetectFISHSpotsWidget(viewer)
+    batchSpotsWidget = DetectFISHSpotsBatchWidget(viewer, spotsWidget.model)
+    viewer.window.add_dock_widget(batchSpotsWidget, area='right',
+                                       name="batch FISH-spot Detection",
+                                       tabify = False)
+    batchSpotsWidget.onResumableChanged(2)
+    assert(batchSpotsWidget.resumable)
+    batchSpotsWidget.onResumableChanged(0)
+    assert(not batchSpotsWidget.resumable)
+
+
 def test_detectFISHSpotsBatchWidget_runBatch(make_napari_viewer):
     viewer = make_napari_viewer()
     spotsWidget = DetectFISHSpotsWidget(viewer)
@@ -518,3 +818,37 @@ def test_ImageListWidget(mock_filenames):
     imageList.onClickClearFiles()
     assert(len(imageList.getValues()) == 0)
 
+
+
+def test_ParameterSweepWidget_getSweep(qtbot):
+    viewer = MagicMock()
+    viewer.layers.selection.active = None
+    sweepWidget = ParameterSweepWidget(viewer, BigfishApp())
+    sweepWidget.thresholdsInput.setText("auto, 10, 20.5")
+    sweepWidget.radiiXYInput.setText("150, 200")
+    sweepWidget.radiiZInput.setText("1000")
+    sweepWidget.sigmasXYInput.setText("2")
+    sweepWidget.sigmasZInput.setText("")
+    sweep = sweepWidget.getSweep()
+    assert(sweep.thresholds == [None, 10, 20.5])
+    assert(sweep.getRadii() == [(150, 1000), (200, 1000)])
+    assert(sweep.getSigmas() == [None])
+    assert(sweep.getNumberOfPoints() == 6)
+
+
+def test_ParameterSweepWidget_runSweepWithInvalidGrid(qtbot):
+    viewer = MagicMock()
+    viewer.layers.selection.active = None
+    sweepWidget = ParameterSweepWidget(viewer, BigfishApp())
+    sweepWidget.thresholdsInput.setText("10, ten")
+    with pytest.raises(ValueError):
+        sweepWidget.getSweep()
+    with patch("napari_bigfish._widget.notifications") as notifications:
+        assert(not sweepWidget.runSweep())
+        notifications.show_error.assert_called_once_with(
+                                "The parameter grid must contain numbers!")
+    sweepWidget.thresholdsInput.setText(" , ")
+    with patch("napari_bigfish._widget.notifications") as notifications:
+        assert(not sweepWidget.runSweep())
+        notifications.show_error.assert_called_once_with(
+                                "The parameter grid is empty!")
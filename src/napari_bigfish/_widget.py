@@ -1,7 +1,6 @@
 """
 A Widget to run the bigfish FISH-spot detection
 """
-import time
 import numpy as np
 import napari
 from pathlib import Path
@@ -9,15 +8,23 @@ from magicgui import magic_factory
 from qtpy.QtWidgets import QVBoxLayout, QHBoxLayout, QFormLayout, QListView, QAbstractItemView
 from qtpy.QtWidgets import QPushButton, QWidget, QLabel, QCheckBox, QGroupBox
 from qtpy.QtWidgets import QFileDialog, QAction
-from qtpy.QtCore import Qt
+from qtpy.QtCore import Qt, QTimer
 from qtpy.QtGui import QStandardItemModel, QStandardItem, QKeySequence
-from qtpy.QtCore import Slot, QObject
+from qtpy.QtCore import Slot, QObject, Signal
 from napari.qt.threading import thread_worker
 from napari.qt.threading import create_worker
 from napari.utils import notifications
 from napari.utils import progress
+from napari.utils.progress import cancelable_progress
 from napari.utils.events import Event
 from napari_bigfish.bigfishapp import BigfishApp
+from napari_bigfish.bigfishcore import OUTPUT_FORMATS, WORKING_PRECISIONS
+from napari_bigfish.array_util import ArrayUtil
+from napari_bigfish import pipeline
+from napari_bigfish.pipeline import Parameters
+from napari_bigfish.cancel import CancelToken, OperationCancelled
+from napari_bigfish.instrumentation import Instrumentation
+from napari_bigfish.sweep import ParameterSweep, AUTOMATIC_THRESHOLD
 from napari_bigfish.qtutil import WidgetTool, TableView
 from napari_bigfish.napari_util import NapariUtil
 
@@ -31,6 +38,9 @@ MIN_LIST_HEIGHT = 100
 SPOT_DISPLAY_SIZE = 5
 SPACING = 20
 FILE_EXTENSIONS = ['*.tif', '*.tiff', '*.jpg']
+PREVIEW_DELAY = 300
+PREVIEW_MAX_SIZE = 2**24
+PROGRESS_STEPS = 100
 
 
 
@@ -55,7 +65,17 @@ class DetectFISHSpotsWidget(QWidget):
         self.fieldWidth = FIELD_WIDTH
         self.maxButtonWidth = MAX_BUTTON_WIDTH
         self.spotDisplaySize = SPOT_DISPLAY_SIZE
+        self.normalizeImage = True
+        self.previewTimer = QTimer(self)
+        self.previewTimer.setSingleShot(True)
+        self.previewTimer.setInterval(PREVIEW_DELAY)
+        self.previewTimer.timeout.connect(self.runPreview)
+        self.previewThread = None
+        self.previewPending = False
+        self.previewCache = {}
         self.setLayout(QVBoxLayout())
+        self.addTilingWidget()
+        self.layout().addSpacing(SPACING)
         self.addSubtractBackgroundWidget()
         self.layout().addSpacing(SPACING)
         self.addDetectSpotsWidget()
@@ -66,7 +86,43 @@ class DetectFISHSpotsWidget(QWidget):
         self.layout().addSpacing(SPACING)
         self.addBatchButton()
         self.viewer.layers.events.inserted.connect(self.onLayerAddedOrRemoved)
+        self.viewer.layers.events.inserted.connect(self.onLayerInserted)
         self.viewer.layers.events.removed.connect(self.onLayerAddedOrRemoved)
+        for layer in self.viewer.layers:
+            self.watchLayerData(layer)
+        self.viewer.dims.events.current_step.connect(self.onViewChanged)
+        self.viewer.camera.events.center.connect(self.onViewChanged)
+        self.viewer.camera.events.zoom.connect(self.onViewChanged)
+
+
+    def addTilingWidget(self):
+        """Adds the widget for the tiling to the layout. The widget has two
+        input fields for the size of the tiles in xy and z, an input field
+        for the number of threads processing the tiles and a combo-box for
+        the working precision of the filters. Large images are processed tile
+        by tile if the tile size in xy is bigger than zero.
+        """
+        groupBox = QGroupBox("Tiling")
+        formLayout = QFormLayout()
+        tileSizeXYLabel, self.tileSizeXYInput = \
+         WidgetTool.getLineInput(self, "tile size xy: ", self.model.getTileSizeXY(),
+                                 self.fieldWidth, self.updateTileSizeXY)
+        tileSizeZLabel, self.tileSizeZInput = \
+         WidgetTool.getLineInput(self, "tile size z: ", self.model.getTileSizeZ(),
+                                 self.fieldWidth, self.updateTileSizeZ)
+        threadsLabel, self.threadsInput = \
+         WidgetTool.getLineInput(self, "threads: ", self.model.getNumberOfThreads(),
+                                 self.fieldWidth, self.updateNumberOfThreads)
+        formLayout.addRow(tileSizeXYLabel, self.tileSizeXYInput)
+        formLayout.addRow(tileSizeZLabel, self.tileSizeZInput)
+        precisionLabel, self.precisionCombo = \
+         WidgetTool.getComboInput(self, "precision: ", WORKING_PRECISIONS)
+        self.precisionCombo.setCurrentText(self.model.getWorkingPrecision())
+        self.precisionCombo.currentTextChanged.connect(self.onPrecisionChanged)
+        formLayout.addRow(threadsLabel, self.threadsInput)
+        formLayout.addRow(precisionLabel, self.precisionCombo)
+        groupBox.setLayout(formLayout)
+        self.layout().addWidget(groupBox)
 
 
     def addSubtractBackgroundWidget(self):
@@ -99,6 +155,14 @@ class DetectFISHSpotsWidget(QWidget):
         an input field for the threshold, input fields for the spot radius,
         checkboxes for the ``remove duplicates``and ``find threshold`` options
         and an action button to run the operation.
+
+        With the ``normalize image`` option, the image is divided by its
+        maximum before the detection, otherwise the spots are detected on the
+        image with its own type and the threshold refers to its values.
+
+        With the ``preview`` option, the spots for the threshold in the input
+        field are shown in a preview points layer, that is updated whenever
+        the threshold, the radius or the ``remove duplicates`` option change.
         """
         groupBox = QGroupBox("Spot Detection")
         formLayout = QFormLayout()
@@ -117,6 +181,12 @@ class DetectFISHSpotsWidget(QWidget):
         self.findThresholdCheckbox = QCheckBox("find threshold")
         self.findThresholdCheckbox.setChecked(self.model.shallFindThreshold())
         self.findThresholdCheckbox.stateChanged.connect(self.onFindThresholdChanged)
+        self.normalizeCheckbox = QCheckBox("normalize image")
+        self.normalizeCheckbox.setChecked(self.normalizeImage)
+        self.normalizeCheckbox.stateChanged.connect(self.onNormalizeChanged)
+        self.previewCheckbox = QCheckBox("preview")
+        self.previewCheckbox.setChecked(False)
+        self.previewCheckbox.stateChanged.connect(self.onPreviewChanged)
         detectSpotsButton = QPushButton("Detect Spots")
         detectSpotsButton.setMaximumWidth(self.maxButtonWidth)
         detectSpotsButton.clicked.connect(self.onClickDetectSpots)
@@ -127,6 +197,8 @@ class DetectFISHSpotsWidget(QWidget):
         verticalLayout.addLayout(formLayout)
         verticalLayout.addWidget(self.removeDuplicatesCheckbox)
         verticalLayout.addWidget(self.findThresholdCheckbox)
+        verticalLayout.addWidget(self.normalizeCheckbox)
+        verticalLayout.addWidget(self.previewCheckbox)
         verticalLayout.addWidget(detectSpotsButton)
         groupBox.setLayout(verticalLayout)
         self.layout().addWidget(groupBox)
@@ -200,6 +272,9 @@ class DetectFISHSpotsWidget(QWidget):
                                             "nuclei labels or mask: ",
                                             labelLayers)
         self.nucleiCombo.setMaximumWidth(COMBO_BOX_MAX_WIDTH)
+        self.sparseLabelsCheckbox = QCheckBox("only present labels")
+        self.sparseLabelsCheckbox.setChecked(self.model.shallUseSparseLabels())
+        self.sparseLabelsCheckbox.stateChanged.connect(self.onSparseLabelsChanged)
         countSpotsButton = QPushButton("Count Spots")
         countSpotsButton.setMaximumWidth(self.maxButtonWidth)
         countSpotsButton.clicked.connect(self.onClickCountSpots)
@@ -211,6 +286,7 @@ class DetectFISHSpotsWidget(QWidget):
         formLayout.addWidget(self.nucleiCombo)
         verticalLayout = QVBoxLayout()
         verticalLayout.addLayout(formLayout)
+        verticalLayout.addWidget(self.sparseLabelsCheckbox)
         verticalLayout.addWidget(countSpotsButton)
         groupBox.setLayout(verticalLayout)
         self.layout().addWidget(groupBox)
@@ -225,7 +301,11 @@ class DetectFISHSpotsWidget(QWidget):
         batchButton = QPushButton("Run Batch")
         batchButton.setMaximumWidth(self.maxButtonWidth)
         batchButton.clicked.connect(self.onClickBatch)
+        sweepButton = QPushButton("Parameter Sweep")
+        sweepButton.setMaximumWidth(self.maxButtonWidth)
+        sweepButton.clicked.connect(self.onClickSweep)
         layout.addWidget(batchButton)
+        layout.addWidget(sweepButton)
         self.layout().addLayout(layout)
 
 
@@ -236,6 +316,7 @@ class DetectFISHSpotsWidget(QWidget):
         self.model.radiusSignal.connect(self.radiusChanged)
         self.model.removeDuplicatesSignal.connect(self.removeDuplicatesChanged)
         self.model.findThresholdSignal.connect(self.findThresholdChanged)
+        self.model.sparseLabelsSignal.connect(self.sparseLabelsChanged)
 
 
     def onClickBatch(self):
@@ -247,6 +328,14 @@ class DetectFISHSpotsWidget(QWidget):
                                     tabify = False)
 
 
+    def onClickSweep(self):
+        sweepWidget = ParameterSweepWidget(self.viewer, self.model)
+        self.viewer.window.add_dock_widget(
+                                    sweepWidget, area='right',
+                                    name="Bigfish Parameter Sweep",
+                                    tabify = False)
+
+
     def onClickCountSpots(self):
         headings = ["image", "cell", "spots in cytoplasm", "spots in nucleus",
                     "spots in cell"]
@@ -257,15 +346,15 @@ class DetectFISHSpotsWidget(QWidget):
             cytoLabels = self.napariUtil.getDataOfLayerWithName(cytoLabelsName)
             nucleiMask = self.napariUtil.getDataOfLayerWithName(nucleiMaskName)
             spots = self.napariUtil.getDataOfLayerWithName(spotsName)
-            self.model.spots = spots
             self.spotsName = spotsName
             countSpotsThread = CountSpotsThread(self.model, self, spots, spotsName,
                                                 cytoLabels, nucleiMask,
                                                 headings)
-            progressThread = IndeterminedProgressThread("counting spots")
-            countSpotsThread.connectFinished(progressThread.stop)
+            operationProgress = OperationProgress(self, "counting spots",
+                                                  countSpotsThread.cancel)
+            countSpotsThread.setProgressCallback(operationProgress.report)
+            countSpotsThread.connectFinished(operationProgress.stop)
             countSpotsThread.start()
-            progressThread.start()
 
 
     def onClickDecomposeDenseRegions(self):
@@ -286,14 +375,15 @@ class DetectFISHSpotsWidget(QWidget):
         scale = activeLayer.scale
         spotsName = self.decomposeSpotsCombo.currentText()
         spots = self.napariUtil.getDataOfLayerWithName(spotsName)
-        self.model.spots = spots
         self.spotsName = spotsName
         decomposeSpotsThread = DecomposeDenseRegionsThread(self.model, data, self.viewer,
-                                              spotsName, scale, self.spotDisplaySize)
-        progressThread = IndeterminedProgressThread("decomposing dense regions")
-        decomposeSpotsThread.connectFinished(progressThread.stop)
+                                              spotsName, scale, self.spotDisplaySize,
+                                              spots)
+        operationProgress = OperationProgress(self, "decomposing dense regions",
+                                              decomposeSpotsThread.cancel)
+        decomposeSpotsThread.setProgressCallback(operationProgress.report)
+        decomposeSpotsThread.connectFinished(operationProgress.stop)
         decomposeSpotsThread.start()
-        progressThread.start()
 
 
     def onClickDetectSpots(self):
@@ -314,11 +404,13 @@ class DetectFISHSpotsWidget(QWidget):
         scale = activeLayer.scale
         name = "spots in {image}".format(image=activeLayer.name)
         detectSpotsThread = DetectSpotsThread(self.model, data, self.viewer,
-                                              name, scale, self.spotDisplaySize)
-        progressThread = IndeterminedProgressThread("detecting spots")
-        detectSpotsThread.connectFinished(progressThread.stop)
+                                              name, scale, self.spotDisplaySize,
+                                              self.normalizeImage)
+        operationProgress = OperationProgress(self, "detecting spots",
+                                              detectSpotsThread.cancel)
+        detectSpotsThread.setProgressCallback(operationProgress.report)
+        detectSpotsThread.connectFinished(operationProgress.stop)
         detectSpotsThread.start()
-        progressThread.start()
 
 
     def onClickSubtractBackground(self):
@@ -335,17 +427,17 @@ class DetectFISHSpotsWidget(QWidget):
             activeLayer.name))
         data = activeLayer.data
         scale = activeLayer.scale
-        self.model.setData(data)
         subtractBackgroundTread = SubtractBackgroundThread(self.model, data,
                                                            self.viewer,
                                                            activeLayer.name,
                                                            scale,
                                                            activeLayer.colormap,
                                                            activeLayer.blending)
-        progressThread = IndeterminedProgressThread("subtracting background")
-        subtractBackgroundTread.connectFinished(progressThread.stop)
+        operationProgress = OperationProgress(self, "subtracting background",
+                                              subtractBackgroundTread.cancel)
+        subtractBackgroundTread.setProgressCallback(operationProgress.report)
+        subtractBackgroundTread.connectFinished(operationProgress.stop)
         subtractBackgroundTread.start()
-        progressThread.start()
 
 
 
@@ -353,9 +445,124 @@ class DetectFISHSpotsWidget(QWidget):
         self.updateLayerSelectionComboBoxes()
 
 
+    def onLayerInserted(self, event: Event):
+        self.watchLayerData(event.value)
+
+
+    def watchLayerData(self, layer):
+        """Drop the preview cache when the data of the image layer changes.
+        """
+        if isinstance(layer, napari.layers.Image):
+            layer.events.data.connect(self.onLayerDataChanged)
+
+
+    def onLayerDataChanged(self, event: Event):
+        """Replace the preview cache, that keeps the maximum, the normalized
+        image and its content hash for the data of a layer, by an empty one,
+        so that a running preview keeps the cache it uses.
+        """
+        self.previewCache = {}
+        self.schedulePreview()
+
+
+    def onViewChanged(self, event: Event):
+        """If the preview is restricted to the visible region of a big image,
+        update it when the displayed slice or the field of view change.
+        """
+        if not self.isPreviewActive():
+            return
+        activeLayer = self.viewer.layers.selection.active
+        if activeLayer and np.prod(activeLayer.data.shape) > PREVIEW_MAX_SIZE:
+            self.schedulePreview()
+
+
+    def isPreviewActive(self):
+        return self.previewCheckbox.isChecked()
+
+
+    def schedulePreview(self):
+        """Run the preview after PREVIEW_DELAY milliseconds. Scheduling the
+        preview again before the delay is over restarts the delay, so that
+        rapid changes result in one preview.
+        """
+        if self.isPreviewActive():
+            self.previewTimer.start()
+
+
+    def runPreview(self):
+        """Show the spots for the current threshold in the preview layer of
+        the active image. If a preview is still running, it is run again when
+        it has finished. For images with more than PREVIEW_MAX_SIZE pixels,
+        only the visible region is previewed.
+        """
+        if self.previewThread is not None:
+            self.previewPending = True
+            return
+        activeLayer = self.viewer.layers.selection.active
+        if not activeLayer or not isinstance(activeLayer, napari.layers.Image):
+            return
+        region = None
+        if np.prod(activeLayer.data.shape) > PREVIEW_MAX_SIZE:
+            region = self.getVisibleRegion(activeLayer)
+        name = "preview of spots in {image}".format(image=activeLayer.name)
+        self.previewThread = PreviewSpotsThread(self.model,
+                                                activeLayer.data,
+                                                self.viewer,
+                                                name,
+                                                activeLayer.scale,
+                                                self.spotDisplaySize,
+                                                region,
+                                                self.previewCache,
+                                                self.normalizeImage)
+        self.previewThread.connectFinished(self.onPreviewFinished)
+        self.previewThread.start()
+
+
+    def onPreviewFinished(self):
+        self.previewThread = None
+        if self.previewPending:
+            self.previewPending = False
+            self.runPreview()
+
+
+    def getVisibleRegion(self, layer):
+        """Answer the slices of the region of the layer's data that is
+        visible in the viewer, i.e. the field of view in the displayed
+        dimensions and the current slice in the other dimensions.
+
+        :rtype: tuple of slice
+        """
+        shape = layer.data.shape
+        point = layer.world_to_data(self.viewer.dims.point[-layer.ndim:])
+        corners = np.asarray(layer.corner_pixels)
+        worldOffset = self.viewer.dims.ndim - layer.ndim
+        region = []
+        for axis, size in enumerate(shape):
+            if axis + worldOffset in self.viewer.dims.displayed:
+                start, end = int(corners[0][axis]), int(corners[1][axis]) + 1
+            else:
+                start = int(np.clip(np.round(point[axis]), 0, size - 1))
+                end = start + 1
+            region.append(slice(max(0, start), min(size, end)))
+        return tuple(region)
+
+
+    @Slot(int)
+    def onNormalizeChanged(self, state):
+        self.normalizeImage = (state > 0)
+        self.schedulePreview()
+
+
+    @Slot(int)
+    def onPreviewChanged(self, state):
+        if state > 0:
+            self.schedulePreview()
+
+
     @Slot(int)
     def onRemoveDuplicatesChanged(self, state):
         self.model.removeDuplicates = (state > 0)
+        self.schedulePreview()
 
 
     @Slot(int)
@@ -363,6 +570,17 @@ class DetectFISHSpotsWidget(QWidget):
         self.model.findThreshold = (state > 0)
 
 
+    @Slot(int)
+    def onSparseLabelsChanged(self, state):
+        self.model.sparseLabels = (state > 0)
+
+
+    @Slot(str)
+    def onPrecisionChanged(self, text):
+        self.model.setWorkingPrecision(text)
+        self.schedulePreview()
+
+
     @Slot(float, float)
     def sigmaChanged(self, sigmaXY, sigmaZ):
         self.sigmaXYInput.setText(str(sigmaXY))
@@ -392,6 +610,44 @@ class DetectFISHSpotsWidget(QWidget):
         self.findThresholdCheckbox.setCheckState(states.index(state))
 
 
+    @Slot(bool)
+    def sparseLabelsChanged(self, state):
+        self.sparseLabelsCheckbox.setChecked(state)
+
+
+    @Slot(str)
+    def updateTileSizeXY(self, text):
+        try:
+            value = int(text)
+        except:
+            self.tileSizeXYInput.setText(str(self.model.getTileSizeXY()))
+            return False
+        self.model.tileSizeXY = value
+        return True
+
+
+    @Slot(str)
+    def updateTileSizeZ(self, text):
+        try:
+            value = int(text)
+        except:
+            self.tileSizeZInput.setText(str(self.model.getTileSizeZ()))
+            return False
+        self.model.tileSizeZ = value
+        return True
+
+
+    @Slot(str)
+    def updateNumberOfThreads(self, text):
+        try:
+            value = int(text)
+        except:
+            self.threadsInput.setText(str(self.model.getNumberOfThreads()))
+            return False
+        self.model.setNumberOfThreads(value)
+        return True
+
+
     @Slot(str)
     def updateSigmaXY(self, text):
         try:
@@ -422,6 +678,7 @@ class DetectFISHSpotsWidget(QWidget):
             self.thresholdInput.setText(str(self.model.getThreshold()))
             return False
         self.model.threshold = value
+        self.schedulePreview()
         return True
 
 
@@ -433,6 +690,7 @@ class DetectFISHSpotsWidget(QWidget):
             self.radiusXYInput.setText(str(self.model.getRadiusXY()))
             return False
         self.model.radiusXY = value
+        self.schedulePreview()
         return True
 
 
@@ -444,6 +702,7 @@ class DetectFISHSpotsWidget(QWidget):
             self.radiusZInput.setText(str(self.model.getRadiusZ()))
             return False
         self.model.radiusZ = value
+        self.schedulePreview()
         return True
 
 
@@ -525,8 +784,60 @@ class DetectFISHSpotsWidget(QWidget):
 class WorkerThread:
     """Superclass for the different classes of long running operations, that are
     meant to be executed in a parallel thread.
+
+    The operation can be cancelled with cancel. It then stops at its next
+    checkpoint, see CancelToken, and its result is dropped. Operations that
+    report their progress call the progress callback, see ProgressReporter.
     """
 
+
+    def createWorker(self, function, onReturned=None):
+        """Create the worker that runs the function and a new cancel token
+        for it.
+
+        :param function: The operation without arguments
+        :param onReturned: An optional function that is called with the
+                           result of the operation, if it has not been
+                           cancelled
+        """
+        self.cancelToken = CancelToken()
+        self.progressCallback = None
+        self.onReturned = onReturned
+        self.worker = create_worker(self.runCancellable, function)
+        self.worker.returned.connect(self.onWorkerReturned)
+
+
+    def runCancellable(self, function):
+        """Run the operation and answer its result or None if it has been
+        cancelled.
+        """
+        try:
+            return function()
+        except OperationCancelled:
+            return None
+
+
+    def onWorkerReturned(self, result):
+        if self.cancelToken.isCancelled():
+            notifications.show_info("The operation has been cancelled.")
+            return
+        if self.onReturned is not None:
+            self.onReturned(result)
+
+
+    def cancel(self):
+        """Ask the operation to stop at its next checkpoint.
+        """
+        self.cancelToken.cancel()
+
+
+    def setProgressCallback(self, callback):
+        """Set a function that is called, in the thread of the operation,
+        with the fraction of the operation that is done.
+        """
+        self.progressCallback = callback
+
+
     def start(self):
         """Start the operation in a different thread.
         """
@@ -546,19 +857,23 @@ class WorkerThread:
 class SubtractBackgroundThread(WorkerThread):
     """Run the subtract background operation in a separate thread. When the
     thread finished, add the result image to the viewer.
+
+    The parameters of the model are copied when the thread is created and the
+    operation does not modify the model, so that several operations can run
+    at the same time, see the pipeline module.
     """
 
 
     def __init__(self, model, data, viewer, name, scale, colormap, blending):
         self.model = model
+        self.parameters = Parameters.fromCore(model)
         self.data = data
         self.name = name
         self.scale = scale
         self.viewer = viewer
         self.colormap = colormap
         self.blending = blending
-        self.worker = create_worker(self.removeBackground)
-        self.worker.returned.connect(self.addImage)
+        self.createWorker(self.removeBackground, self.addImage)
 
 
     def addImage(self, data):
@@ -568,28 +883,35 @@ class SubtractBackgroundThread(WorkerThread):
 
 
     def removeBackground(self):
-        self.model.setData(self.data)
-        self.model.subtractBackground()
-        return self.model.getResult()
+        return pipeline.subtractBackground(self.parameters, self.data,
+                                           self.model.getResultCache(),
+                                           self.cancelToken,
+                                           self.progressCallback)
 
 
 
 class DetectSpotsThread(WorkerThread):
     """Run the spot detection in a separate thread. After the spot detection
     finished, add the detected spots in the form of a points layer to the
-    viewer.
+    viewer and set the automatic threshold in the model.
+
+    The parameters of the model are copied when the thread is created, see
+    SubtractBackgroundThread.
     """
 
 
-    def __init__(self, model, data, viewer, name, scale, spotDisplaySize):
+    def __init__(self, model, data, viewer, name, scale, spotDisplaySize,
+                 normalize=True):
         self.model = model
+        self.parameters = Parameters.fromCore(model)
+        self.threshold = None
         self.data = data
         self.name = name
         self.scale = scale
         self.viewer = viewer
         self.spotDisplaySize = spotDisplaySize
-        self.worker = create_worker(self.detectSpots)
-        self.worker.returned.connect(self.addDetectedSpots)
+        self.normalize = normalize
+        self.createWorker(self.detectSpots, self.addDetectedSpots)
 
 
     def addDetectedSpots(self, data):
@@ -601,6 +923,8 @@ class DetectSpotsThread(WorkerThread):
         (name, scale, ...), which might have been modified in the meantime, for
         example by selecting another input image.
         '''
+        if self.parameters.findThreshold:
+            self.model.setThreshold(self.threshold)
         self.viewer.add_points(data,
                                name=self.name,
                                size=self.spotDisplaySize,
@@ -612,34 +936,156 @@ class DetectSpotsThread(WorkerThread):
         originalNumberOfDims = len(data.shape)
         if originalNumberOfDims > 3:
             data = np.squeeze(data)
-        if np.amax(data) > 1:
-            data = data / np.amax(data)
+        if self.normalize:
+            data = ArrayUtil.getNormalized(
+                        data, dtype=np.dtype(self.parameters.workingPrecision))
         scale = self.scale
         if len(scale) > 3:
             scale = scale[1:len(scale)]
-        self.model.setData(data)
-        self.model.detectSpots(tuple(scale))
-        result = self.model.getSpots()
-        if len(result[0]) < originalNumberOfDims:
+        result, self.threshold = pipeline.detectSpots(
+                                    self.parameters, tuple(scale), data,
+                                    self.model.getResultCache(),
+                                    self.model.getCandidateCache(),
+                                    self.cancelToken, self.progressCallback)
+        if result.shape[1] < originalNumberOfDims:
             return np.hstack((np.zeros((len(result), 1), dtype=result.dtype), result))
         return result
 
 
+class PreviewSpotsThread(WorkerThread):
+    """Select the spots for the current threshold from the spot candidates in
+    a separate thread and show them in the preview points layer, which is
+    created the first time and updated in place afterwards.
+
+    The image is normalized like in DetectSpotsThread, so that the threshold
+    has the same meaning. The normalized image, its content hash and the
+    maximum of the image are kept in the preview cache, so that the spot
+    candidates of the model are used again. If a region is given, only the
+    region enlarged by the detection halo is read and filtered.
+    """
+
+
+    def __init__(self, model, data, viewer, name, scale, spotDisplaySize,
+                 region=None, previewCache=None, normalize=True):
+        self.model = model
+        self.parameters = Parameters.fromCore(model)
+        self.dtype = np.dtype(self.parameters.workingPrecision)
+        self.data = data
+        self.name = name
+        self.scale = scale
+        self.viewer = viewer
+        self.spotDisplaySize = spotDisplaySize
+        self.region = region
+        self.previewCache = {} if previewCache is None else previewCache
+        self.normalize = normalize
+        self.createWorker(self.previewSpots, self.updatePreviewLayer)
+
+
+    def updatePreviewLayer(self, data):
+        if self.name in self.viewer.layers:
+            self.viewer.layers[self.name].data = data
+            return
+        self.viewer.add_points(data,
+                               name=self.name,
+                               size=self.spotDisplaySize,
+                               scale=self.scale)
+
+
+    def previewSpots(self):
+        data = self.data
+        originalNumberOfDims = len(data.shape)
+        region = self.region
+        if originalNumberOfDims > 3:
+            data = np.squeeze(data)
+            region = None
+        scale = self.scale
+        if len(scale) > 3:
+            scale = scale[1:len(scale)]
+        scale = tuple(scale)
+        maximum = self.getMaximum()
+        candidateCache = self.model.getCandidateCache()
+        if region is None:
+            normalized = self.getNormalizedData(data, maximum)
+            result = pipeline.previewSpots(self.parameters, scale, normalized,
+                                           candidateCache=candidateCache,
+                                           dataKey=self.getDataKey(normalized))
+        else:
+            halo = pipeline.getDetectionHalo(self.parameters, scale, data)
+            source, inner, target = ArrayUtil.getRegionWithHalo(
+                                        data.shape, region, halo)
+            crop = np.asarray(data[source])
+            if self.normalize:
+                crop = ArrayUtil.getNormalized(crop, maximum, self.dtype)
+            result = pipeline.previewSpots(self.parameters, scale, crop, inner,
+                                           candidateCache)
+            result = result + np.array([s.start for s in source])
+        if result.shape[1] < originalNumberOfDims:
+            return np.hstack((np.zeros((len(result), 1), dtype=result.dtype), result))
+        return result
+
+
+    def getMaximum(self):
+        """Answer the maximum of the image, which is computed once per
+        image. If the image is not normalized, the maximum is not needed and
+        None is answered.
+        """
+        if (self.previewCache.get("image") is not self.data
+                or self.previewCache.get("normalize") != self.normalize
+                or self.previewCache.get("dtype") != self.dtype):
+            self.previewCache.clear()
+            self.previewCache["image"] = self.data
+            self.previewCache["normalize"] = self.normalize
+            self.previewCache["dtype"] = self.dtype
+            self.previewCache["maximum"] = None
+            if self.normalize:
+                self.previewCache["maximum"] = ArrayUtil.getMaximum(self.data)
+        return self.previewCache["maximum"]
+
+
+    def getNormalizedData(self, data, maximum):
+        """Answer the image divided by its maximum, which is computed once per
+        image, or the image itself if it is not normalized.
+        """
+        if "normalized" not in self.previewCache:
+            normalized = data
+            if self.normalize:
+                normalized = ArrayUtil.getNormalized(data, maximum, self.dtype)
+            self.previewCache["normalized"] = normalized
+        return self.previewCache["normalized"]
+
+
+    def getDataKey(self, normalized):
+        """Answer the content hash of the normalized image, which is computed
+        once per image, so that the spot candidates are found in the
+        candidate cache without hashing the image again.
+        """
+        if "dataKey" not in self.previewCache:
+            self.previewCache["dataKey"] = pipeline.getDataKey(normalized)
+        return self.previewCache["dataKey"]
+
+
+
 class DecomposeDenseRegionsThread(WorkerThread):
     """Run the Dense Region Decomposition in a separate thread. When finished,
     add the resulting spots in the form of a points-layer to the viewer.
+
+    The parameters of the model are copied when the thread is created, see
+    SubtractBackgroundThread. If no spots are given, the spots of the model
+    are decomposed.
     """
 
 
-    def __init__(self, model, data, viewer, name, scale, spotDisplaySize):
+    def __init__(self, model, data, viewer, name, scale, spotDisplaySize,
+                 spots=None):
         self.model = model
+        self.parameters = Parameters.fromCore(model)
+        self.spots = model.spots if spots is None else spots
         self.data = data
         self.name = name
         self.scale = scale
         self.viewer = viewer
         self.spotDisplaySize = spotDisplaySize
-        self.worker = create_worker(self.decompose)
-        self.worker.returned.connect(self.addSpots)
+        self.createWorker(self.decompose, self.addSpots)
 
 
     def addSpots(self, data):
@@ -650,39 +1096,38 @@ class DecomposeDenseRegionsThread(WorkerThread):
 
 
     def decompose(self):
-         self.model.setData(self.data)
-         self.model.decomposeDenseRegions(tuple(self.scale))
-         return self.model.spots
+         return pipeline.decomposeDenseRegions(self.parameters,
+                                               tuple(self.scale), self.data,
+                                               self.spots, self.cancelToken,
+                                               self.progressCallback)
 
 
 class CountSpotsThread(WorkerThread):
     """Run the spot counting in a separate thread. Once the operation
     finished, ``addSpotCountingTable`` of the parent widget is called.
+
+    The parameters of the model are copied when the thread is created, see
+    SubtractBackgroundThread.
     """
 
     def __init__(self, model, parent, spots, spotsName,
                        cytoLabels, nucleiMask, headings):
         self.model = model
+        self.parameters = Parameters.fromCore(model)
         self.spots = spots
         self.spotsName = spotsName
-        self.model.spots = self.spots
         self.cytoLabels = cytoLabels
         self.nucleiMask = nucleiMask
         self.headings = headings
-        self.worker = create_worker(self.countSpots)
-        self.worker.returned.connect(parent.addSpotCountingTable)
+        self.createWorker(self.countSpots, parent.addSpotCountingTable)
 
 
     def countSpots(self):
-        self.model.countSpotsPerCellAndEnvironment(self.cytoLabels,
-                                                   self.nucleiMask)
-        data = self.model.getSpotCountPerCellAndEnvironment()
-        for row in data:
-            row.insert(0, self.spotsName)
-        columns = list(zip(*data))
-        table = {}
-        for index, column in enumerate(columns):
-            table[self.headings[index]] = column
+        data = pipeline.countSpots(self.parameters, self.spots,
+                                   self.cytoLabels, self.nucleiMask)
+        table = {self.headings[0]: [self.spotsName] * len(data)}
+        for heading, column in zip(self.headings[1:], data.dtype.names):
+            table[heading] = data[column]
         return table
 
 
@@ -693,7 +1138,8 @@ class BatchCountSpotsThread(WorkerThread):
 
 
     def __init__(self, scale, model, inputImages, cellLabels, nucleiMasks,
-                 subtractBackground=False, decomposeDenseRegions=False):
+                 subtractBackground=False, decomposeDenseRegions=False,
+                 globalThreshold=False, spotStore=False, resumable=False):
         self.scale = scale
         self.model = model
         self.inputImages = inputImages
@@ -701,93 +1147,201 @@ class BatchCountSpotsThread(WorkerThread):
         self.nucleiMasks = nucleiMasks
         self.subtractBackground = subtractBackground
         self.decomposeDenseRegions = decomposeDenseRegions
-        self.worker = create_worker(self.batchCountSpots)
+        self.globalThreshold = globalThreshold
+        self.spotStore = spotStore
+        self.resumable = resumable
+        self.createWorker(self.batchCountSpots)
 
 
     def batchCountSpots(self):
+        self.model.setCancelToken(self.cancelToken)
+        try:
             self.model.runBatch(
                             self.scale,
                             self.inputImages,
                             self.cellLabels,
                             self.nucleiMasks,
                             subtractBackground = self.subtractBackground,
-                            decomposeDenseRegions= self.decomposeDenseRegions)
-            return self
+                            decomposeDenseRegions= self.decomposeDenseRegions,
+                            globalThreshold = self.globalThreshold,
+                            spotStore = self.spotStore,
+                            resumable = self.resumable)
+        finally:
+            self.model.setCancelToken(None)
+        return self
+
+
+
+class ParameterSweepThread(WorkerThread):
+    """Run a parameter sweep in a separate thread and show the table of the
+    spot counts when it finished.
+    """
+
+
+    def __init__(self, sweep, scale, model, inputImages, viewer):
+        self.sweep = sweep
+        self.scale = scale
+        self.model = model
+        self.inputImages = inputImages
+        self.viewer = viewer
+        self.createWorker(self.runSweep, self.addSweepTable)
+
+
+    def runSweep(self):
+        self.model.setCancelToken(self.cancelToken)
+        try:
+            return self.sweep.run(self.model, self.scale, self.inputImages)
+        finally:
+            self.model.setCancelToken(None)
+
+
+    def addSweepTable(self, table):
+        data = {name: table[name].tolist() for name in table.dtype.names}
+        tableView = TableView(data)
+        self.viewer.window.add_dock_widget(tableView, area='right',
+                                           name="Parameter Sweep",
+                                           tabify = False)
+
+
+
+class CancelableProgress(cancelable_progress):
+    """A napari progress bar with a cancel button, that calls the cancel
+    callback as soon as the button is pressed, so that an operation running
+    in another thread can be stopped.
+    """
+
+    def cancel(self):
+        super().cancel()
+        if self.cancel_callback is not None:
+            self.cancel_callback()
+
+
+
+def createProgress(total, cancelCallback=None):
+    """Answer a napari progress bar, with a cancel button if a cancel
+    callback is given.
+    """
+    if cancelCallback is None:
+        return progress(total=total)
+    return CancelableProgress(total=total, cancel_callback=cancelCallback)
 
 
 
 class Progress(QObject):
     """A progress indicator for operations running in a parallel thread. The
-    operation needs to connect a signal to the progressChanged method, with the
-    current progress and the maximum progress value.
+    progress bar moves with the fraction of the operation that is done, that
+    is given to the fractionChanged method. The progressChanged method, with
+    the current progress and the maximum progress value, only updates the
+    description, since the progress values of the stages of an operation, for
+    example of the search of a global threshold and of the batch, start again
+    from zero.
     """
 
-    def __init__(self, parent, maxProgress, description):
+    def __init__(self, parent, maxProgress, description, cancelCallback=None):
         """Create a new progress-indicator with the given parent-widget, maximum
-        progress value and description.
+        progress value and description. If a cancel callback is given, the
+        progress bar has a cancel button that calls it.
         """
         super().__init__(parent)
-        self.progress = progress(total=maxProgress)
+        self.value = 0
+        self.model = None
+        self.progress = createProgress(maxProgress, cancelCallback)
         self.progress.set_description(description)
 
 
+    def setValue(self, value):
+        """Move the progress bar forward to the given value. The bar does not
+        move back, if a smaller value is given.
+        """
+        value = int(value)
+        if value > self.value:
+            self.progress.update(value - self.value)
+            self.value = value
+
+
+    def connectModel(self, model):
+        """Show the progress of the model, until the process finished.
+
+        :param model: The model that sends the progressSignal and the
+                      progressFractionSignal
+        :type model: BigfishApp
+        """
+        self.model = model
+        model.progressSignal.connect(self.progressChanged)
+        model.progressFractionSignal.connect(self.fractionChanged)
+
+
     @Slot(int, int)
     def progressChanged(self, value, maxProgress):
-        """Update the progress value and the max. progress value.
+        """Show the progress value and the max. progress value in the
+        description.
         """
-        self.progress.update(value)
         self.progress.set_description("Processing image {} of {}".format(
                                                                 value,
                                                                 maxProgress))
         return True
 
 
+    @Slot(float)
+    def fractionChanged(self, fraction):
+        """Update the progress value from the fraction of the operation that
+        is done.
+        """
+        self.setValue(fraction * self.progress.total)
+
+
     def processFinished(self):
+        """Stop showing the progress of the model and close the progress bar.
+        """
+        if self.model is not None:
+            self.model.progressSignal.disconnect(self.progressChanged)
+            self.model.progressFractionSignal.disconnect(self.fractionChanged)
+            self.model = None
         self.progress.close()
 
 
 
-class IndeterminedProgressThread:
-    """An indetermined progress indicator that moves while an operation is
-    still working.
+class OperationProgress(Progress):
+    """The progress bar of an operation of the widget. It moves when the
+    operation reports its progress with report, which can be called from the
+    thread of the operation. Until the first report, the progress bar is
+    indetermined.
     """
 
-    def __init__(self, description):
-        """Create a new indetermined progress indicator with the given
-        description.
-        """
-        self.worker = create_worker(self.yieldUndeterminedProgress)
-        self.progress = progress(total=0)
-        self.progress.set_description(description)
+    changed = Signal(float)
+
+    def __init__(self, parent, description, cancelCallback=None):
+        super().__init__(parent, 0, description, cancelCallback)
+        self.changed.connect(self.fractionChanged)
 
 
-    def yieldUndeterminedProgress(self):
-        """The progress indicator has nothing to do by himself, so just
-        sleep and yield, while still running.
+    def report(self, fraction):
+        """Report the fraction of the operation that is done. The progress
+        bar is updated in the main thread.
         """
-        while True:
-            time.sleep(0.05)
-            yield
+        self.changed.emit(fraction)
 
 
-    def start(self):
-        """Start the operation in a parallel thread"""
-        self.worker.start()
+    @Slot(float)
+    def fractionChanged(self, fraction):
+        if self.progress.total == 0:
+            self.progress.total = PROGRESS_STEPS
+        super().fractionChanged(fraction)
 
 
     def stop(self):
-        """Close the progress indicator and quite the parallel thread.
+        """Close the progress bar.
         """
         self.progress.close()
-        self.worker.quit()
 
 
 
 class DetectFISHSpotsBatchWidget(QWidget):
     """The widget that lets the user select images and start the
     batch-processing. The widget has input fields for the scale in xy and z,
-    checkboxes for the options ``subtract background`` and ``decompose dense
-    regions``, image-lists for the input images, the cell labels and the nuclei
+    checkboxes for the options ``subtract background``, ``decompose dense
+    regions``, ``global threshold``, ``single spot file`` and ``resume``,
+    image-lists for the input images, the cell labels and the nuclei
     masks and an action button to start the batch-processing.
     """
 
@@ -798,6 +1352,10 @@ class DetectFISHSpotsBatchWidget(QWidget):
         self.scaleZ = 900
         self.subtractBackground = False
         self.decomposeDenseRegions = False
+        self.globalThreshold = False
+        self.spotStore = False
+        self.resumable = False
+        self.timingReport = False
         self.setModel(model)
         self.viewer = napari_viewer
         activeLayer = self.viewer.layers.selection.active
@@ -844,6 +1402,20 @@ class DetectFISHSpotsBatchWidget(QWidget):
                                        self.scaleZ,
                                        self.fieldWidth,
                                        self.updateScaleZ)
+        workersLabel, self.workersInput = \
+         WidgetTool.getLineInput(self, "workers: ",
+                                       self.model.getNumberOfWorkers(),
+                                       self.fieldWidth,
+                                       self.updateNumberOfWorkers)
+        prefetchLabel, self.prefetchInput = \
+         WidgetTool.getLineInput(self, "prefetch: ",
+                                       self.model.getPrefetchDepth(),
+                                       self.fieldWidth,
+                                       self.updatePrefetchDepth)
+        formatLabel, self.outputFormatCombo = \
+         WidgetTool.getComboInput(self, "output format: ", OUTPUT_FORMATS)
+        self.outputFormatCombo.setCurrentText(self.model.getOutputFormat())
+        self.outputFormatCombo.currentTextChanged.connect(self.onOutputFormatChanged)
         self.subtractBackgroundCheckbox = QCheckBox("subtract background")
         self.subtractBackgroundCheckbox.setChecked(self.subtractBackground)
         self.subtractBackgroundCheckbox.stateChanged.connect(self.onSubtractBackgroundChanged)
@@ -852,12 +1424,35 @@ class DetectFISHSpotsBatchWidget(QWidget):
         self.decomposeDenseRegionsCheckbox.setChecked(self.decomposeDenseRegions)
         self.decomposeDenseRegionsCheckbox.stateChanged.connect(self.onDecomposeChanged)
 
+        self.globalThresholdCheckbox = QCheckBox("global threshold")
+        self.globalThresholdCheckbox.setChecked(self.globalThreshold)
+        self.globalThresholdCheckbox.stateChanged.connect(self.onGlobalThresholdChanged)
+
+        self.spotStoreCheckbox = QCheckBox("single spot file")
+        self.spotStoreCheckbox.setChecked(self.spotStore)
+        self.spotStoreCheckbox.stateChanged.connect(self.onSpotStoreChanged)
+
+        self.resumableCheckbox = QCheckBox("resume")
+        self.resumableCheckbox.setChecked(self.resumable)
+        self.resumableCheckbox.stateChanged.connect(self.onResumableChanged)
+
+        self.timingReportCheckbox = QCheckBox("timing report")
+        self.timingReportCheckbox.setChecked(self.timingReport)
+        self.timingReportCheckbox.stateChanged.connect(self.onTimingReportChanged)
+
         formLayout.addRow(scaleXYLabel, self.scaleXYInput)
         formLayout.addRow(scaleZLabel, self.scaleZInput)
+        formLayout.addRow(workersLabel, self.workersInput)
+        formLayout.addRow(prefetchLabel, self.prefetchInput)
+        formLayout.addRow(formatLabel, self.outputFormatCombo)
         verticalLayout = QVBoxLayout()
         verticalLayout.addLayout(formLayout)
         verticalLayout.addWidget(self.subtractBackgroundCheckbox)
         verticalLayout.addWidget(self.decomposeDenseRegionsCheckbox)
+        verticalLayout.addWidget(self.globalThresholdCheckbox)
+        verticalLayout.addWidget(self.spotStoreCheckbox)
+        verticalLayout.addWidget(self.resumableCheckbox)
+        verticalLayout.addWidget(self.timingReportCheckbox)
 
         groupBox.setLayout(verticalLayout)
         self.layout().addWidget(groupBox)
@@ -907,6 +1502,33 @@ class DetectFISHSpotsBatchWidget(QWidget):
         return True
 
 
+    @Slot(str)
+    def updateNumberOfWorkers(self, text):
+        try:
+            value = int(text)
+        except:
+            self.workersInput.setText(str(self.model.getNumberOfWorkers()))
+            return False
+        self.model.setNumberOfWorkers(value)
+        return True
+
+
+    @Slot(str)
+    def updatePrefetchDepth(self, text):
+        try:
+            value = int(text)
+        except:
+            self.prefetchInput.setText(str(self.model.getPrefetchDepth()))
+            return False
+        self.model.setPrefetchDepth(value)
+        return True
+
+
+    @Slot(str)
+    def onOutputFormatChanged(self, text):
+        self.model.setOutputFormat(text)
+
+
     @Slot(int)
     def onSubtractBackgroundChanged(self, state):
         self.subtractBackground = (state > 0)
@@ -917,6 +1539,26 @@ class DetectFISHSpotsBatchWidget(QWidget):
         self.decomposeDenseRegions = (state > 0)
 
 
+    @Slot(int)
+    def onGlobalThresholdChanged(self, state):
+        self.globalThreshold = (state > 0)
+
+
+    @Slot(int)
+    def onSpotStoreChanged(self, state):
+        self.spotStore = (state > 0)
+
+
+    @Slot(int)
+    def onResumableChanged(self, state):
+        self.resumable = (state > 0)
+
+
+    @Slot(int)
+    def onTimingReportChanged(self, state):
+        self.timingReport = (state > 0)
+
+
     def runBatch(self):
         scale = (self.scaleZ, self.scaleXY, self.scaleXY)
         inputImages = self.inputImageListWidget.getValues()
@@ -926,6 +1568,10 @@ class DetectFISHSpotsBatchWidget(QWidget):
             cellLabels = None
         if not nucleiMasks:
             nucleiMasks = None
+        instrumentation = None
+        if self.timingReport:
+            instrumentation = Instrumentation()
+        self.model.setInstrumentation(instrumentation)
         self.batchThread = BatchCountSpotsThread(
                             scale,
                             self.model,
@@ -933,14 +1579,135 @@ class DetectFISHSpotsBatchWidget(QWidget):
                             cellLabels = cellLabels,
                             nucleiMasks = nucleiMasks,
                             subtractBackground = self.subtractBackground,
-                            decomposeDenseRegions = self.decomposeDenseRegions)
-        progress = Progress(self, len(inputImages), "Big Fish Batch Processing Started")
-        self.model.progressSignal.connect(progress.progressChanged)
-        self.batchThread.worker.returned.connect(progress.processFinished)
+                            decomposeDenseRegions = self.decomposeDenseRegions,
+                            globalThreshold = self.globalThreshold,
+                            spotStore = self.spotStore,
+                            resumable = self.resumable)
+        progress = Progress(self, PROGRESS_STEPS, "Big Fish Batch Processing Started",
+                            self.batchThread.cancel)
+        progress.connectModel(self.model)
+        self.batchThread.connectFinished(progress.processFinished)
         self.batchThread.start()
 
 
 
+class ParameterSweepWidget(QWidget):
+    """The widget that lets the user enter a grid of thresholds, spot radii
+    and background sigmas and run the spot detection for each combination on
+    the selected images, see ParameterSweep. The values are entered as comma
+    separated lists, ``auto`` in the thresholds stands for the automatic
+    threshold. If no images are selected, the sweep runs on the active
+    image. The other parameters are taken from the model.
+    """
+
+    def __init__(self, napari_viewer, model):
+        super().__init__()
+        self.scaleXY = 300
+        self.scaleZ = 900
+        self.setModel(model)
+        self.viewer = napari_viewer
+        activeLayer = self.viewer.layers.selection.active
+        if activeLayer:
+            self.scaleXY = activeLayer.scale[-1]
+            if activeLayer.data.ndim > 2:
+                self.scaleZ = activeLayer.scale[-3]
+        self.fieldWidth = FIELD_WIDTH * 3
+        self.maxButtonWidth = MAX_BUTTON_WIDTH
+        self.setLayout(QVBoxLayout())
+        self.addGridWidget()
+        self.layout().addSpacing(SPACING)
+        self.inputImageListWidget = ImageListWidget("Input Images")
+        self.layout().addWidget(self.inputImageListWidget)
+        self.layout().addSpacing(SPACING)
+        self.addRunButton()
+
+
+    def setModel(self, aModel):
+        self.model = aModel
+
+
+    def addGridWidget(self):
+        groupBox = QGroupBox("Parameter Grid")
+        formLayout = QFormLayout()
+        self.thresholdsInput = self.addGridInput(formLayout, "thresholds: ",
+                                "{}, {}".format(AUTOMATIC_THRESHOLD,
+                                                self.model.getThreshold()))
+        self.radiiXYInput = self.addGridInput(formLayout, "spot radii xy: ",
+                                              self.model.getRadiusXY())
+        self.radiiZInput = self.addGridInput(formLayout, "spot radii z: ",
+                                             self.model.getRadiusZ())
+        self.sigmasXYInput = self.addGridInput(formLayout, "sigmas xy: ", "")
+        self.sigmasZInput = self.addGridInput(formLayout, "sigmas z: ", "")
+        self.scaleXYInput = self.addGridInput(formLayout, "scale xy [nm]: ",
+                                              self.scaleXY)
+        self.scaleZInput = self.addGridInput(formLayout, "scale z [nm]: ",
+                                             self.scaleZ)
+        groupBox.setLayout(formLayout)
+        self.layout().addWidget(groupBox)
+
+
+    def addGridInput(self, formLayout, labelText, defaultValue):
+        label, input = WidgetTool.getLineInput(self, labelText, defaultValue,
+                                               self.fieldWidth,
+                                               lambda text: None)
+        formLayout.addRow(label, input)
+        return input
+
+
+    def addRunButton(self):
+        runButton = QPushButton("Run")
+        runButton.setMaximumWidth(self.maxButtonWidth)
+        runButton.clicked.connect(self.runSweep)
+        horizontalLayout = QHBoxLayout()
+        horizontalLayout.addWidget(runButton)
+        self.layout().addLayout(horizontalLayout)
+
+
+    def getSweep(self):
+        """Answer the sweep over the values in the input fields.
+
+        :raises ValueError: If a field contains a value that is not a number
+        :rtype: ParameterSweep
+        """
+        return ParameterSweep(
+            thresholds=ParameterSweep.parseValues(self.thresholdsInput.text(),
+                                                  allowAutomatic=True),
+            radiiXY=ParameterSweep.parseValues(self.radiiXYInput.text()),
+            radiiZ=ParameterSweep.parseValues(self.radiiZInput.text()),
+            sigmasXY=ParameterSweep.parseValues(self.sigmasXYInput.text()),
+            sigmasZ=ParameterSweep.parseValues(self.sigmasZInput.text()))
+
+
+    def runSweep(self):
+        try:
+            sweep = self.getSweep()
+            scaleXY = float(self.scaleXYInput.text())
+            scaleZ = float(self.scaleZInput.text())
+        except ValueError:
+            notifications.show_error("The parameter grid must contain numbers!")
+            return False
+        if sweep.getNumberOfPoints() == 0:
+            notifications.show_error("The parameter grid is empty!")
+            return False
+        inputImages = self.inputImageListWidget.getValues()
+        if not inputImages:
+            activeLayer = self.viewer.layers.selection.active
+            if not activeLayer:
+                notifications.show_error("Parameter sweep needs an image!")
+                return False
+            inputImages = [np.squeeze(np.asarray(activeLayer.data))]
+        scale = (scaleZ, scaleXY, scaleXY)
+        self.sweepThread = ParameterSweepThread(sweep, scale, self.model,
+                                                inputImages, self.viewer)
+        progress = Progress(self, PROGRESS_STEPS, "Parameter Sweep Started",
+                            self.sweepThread.cancel)
+        progress.connectModel(self.model)
+        self.sweepThread.connectFinished(progress.processFinished)
+        self.sweepThread.start()
+        return True
+
+
+
 class ImageListWidget(QWidget):
     """An image-list widget that has a list of images, a button that opens
     a file-dialog to add images, a button to clear the list and a context-menu
@@ -1,3 +1,4 @@
+import itertools
 import numpy as np
 
 
@@ -35,4 +36,121 @@ class ArrayUtil:
         columnIndices = np.where(~np.all(stripped == zero, axis=1))[0]
         stripped = stripped[~np.all(stripped == zero, axis=1)]
         stripped = np.array(list(zip(*stripped)))
-        return stripped, columnIndices, rowIndices
\ No newline at end of file
+        return stripped, columnIndices, rowIndices
+
+
+    @staticmethod
+    def getTiles(shape, tileShape, halo):
+        """Answer the tiles that cover an array of the given shape. Each tile
+        is extended by the halo on each side, as far as the array reaches.
+
+        :param shape: The shape of the array
+        :param tileShape: The shape of the tiles, without the halo
+        :param halo: The number of elements by which the tiles are extended
+                     in each dimension
+        :return: A list of 3-tupels with
+
+            * the slices of the tile with its halo in the array
+            * the slices of the tile without the halo in the tile with halo
+            * the slices of the tile without the halo in the array
+
+        :rtype: list of (tuple of slice, tuple of slice, tuple of slice)
+        """
+        rangesPerDimension = []
+        for size, tileSize, haloSize in zip(shape, tileShape, halo):
+            tileSize = max(1, int(tileSize))
+            haloSize = int(haloSize)
+            ranges = []
+            for start in range(0, size, tileSize):
+                end = min(start + tileSize, size)
+                haloStart = max(0, start - haloSize)
+                haloEnd = min(size, end + haloSize)
+                ranges.append((slice(haloStart, haloEnd),
+                               slice(start - haloStart, end - haloStart),
+                               slice(start, end)))
+            rangesPerDimension.append(ranges)
+        tiles = []
+        for ranges in itertools.product(*rangesPerDimension):
+            tiles.append(tuple(zip(*ranges)))
+        return tiles
+
+
+    @staticmethod
+    def getRegionWithHalo(shape, region, halo):
+        """Answer the region of an array extended by the halo on each side, as
+        far as the array reaches, in the same form as the tiles answered by
+        getTiles.
+
+        :param shape: The shape of the array
+        :param region: The slices of the region in the array
+        :param halo: The number of elements by which the region is extended
+                     in each dimension
+        :rtype: (tuple of slice, tuple of slice, tuple of slice)
+        """
+        source, inner, target = [], [], []
+        for size, regionSlice, haloSize in zip(shape, region, halo):
+            start, end, _ = regionSlice.indices(size)
+            end = max(start, end)
+            haloStart = max(0, start - int(haloSize))
+            haloEnd = min(size, end + int(haloSize))
+            source.append(slice(haloStart, haloEnd))
+            inner.append(slice(start - haloStart, end - haloStart))
+            target.append(slice(start, end))
+        return tuple(source), tuple(inner), tuple(target)
+
+
+    @staticmethod
+    def getMaximum(data):
+        """Answer the maximum of an array, computed plane by plane along the
+        first dimension, so that a memory-mapped or lazily read image is
+        never loaded as a whole.
+
+        :param data: An array or an object that can be indexed like an array
+        """
+        if data.ndim < 3:
+            return np.max(np.asarray(data))
+        return max(np.max(np.asarray(data[index]))
+                   for index in range(data.shape[0]))
+
+
+    @staticmethod
+    def getNormalized(data, maximum=None, dtype=np.float32):
+        """Answer the array divided by its maximum, if the maximum is bigger
+        than one, otherwise the array itself. The division is done plane by
+        plane along the first dimension into a new array of the given type,
+        so that no temporary array of the size of the whole array is needed.
+
+        :param data: An array or an object that can be indexed like an array
+        :param maximum: The maximum of the array, if None it is computed with
+                        getMaximum
+        :param dtype: The floating point type of the result
+        :rtype: numpy.ndarray
+        """
+        if maximum is None:
+            maximum = ArrayUtil.getMaximum(data)
+        if maximum <= 1:
+            return data
+        result = np.empty(data.shape, dtype=dtype)
+        if data.ndim < 3:
+            np.divide(np.asarray(data), maximum, out=result, dtype=dtype)
+            return result
+        for index in range(data.shape[0]):
+            np.divide(np.asarray(data[index]), maximum, out=result[index],
+                      dtype=dtype)
+        return result
+
+
+    @staticmethod
+    def getUniqueValues(data):
+        """Answer the sorted unique values of an array, computed plane by
+        plane along the first dimension, so that a memory-mapped or lazily
+        read image is never loaded as a whole.
+
+        :param data: An array or an object that can be indexed like an array
+        :rtype: numpy.ndarray
+        """
+        if data.ndim < 3:
+            return np.unique(np.asarray(data))
+        values = [np.unique(np.asarray(data[index]))
+                  for index in range(data.shape[0])]
+        return np.unique(np.concatenate(values))
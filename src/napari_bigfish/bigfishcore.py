@@ -0,0 +1,1803 @@
+from pathlib import Path
+import os
+import json
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from bigfish import stack, detection
+import numpy as np
+from napari_bigfish.array_util import ArrayUtil
+from napari_bigfish.image_reader import ImageReader
+from napari_bigfish.prefetch import Prefetcher
+from napari_bigfish.manifest import BatchManifest
+from napari_bigfish.cache import ResultCache
+from napari_bigfish.candidates import SpotCandidates, CandidateCache
+from napari_bigfish.filters import Filters
+from napari_bigfish.binary_report import BinaryReport
+from napari_bigfish.binary_report import SPOTS_EXTENSION, COUNTS_EXTENSION
+from napari_bigfish.binary_report import COUNTS_SUFFIX, SPOT_STORE_SUFFIX
+from napari_bigfish.threshold import StreamingThreshold
+from napari_bigfish.cancel import OperationCancelled
+from napari_bigfish.progress_reporter import ProgressReporter
+from napari_bigfish.instrumentation import Instrumentation, NO_MEASUREMENT
+from napari_bigfish.instrumentation import TIMING_SUFFIX
+
+
+
+PARAMETER_NAMES = ("sigmaXY", "sigmaZ", "threshold", "radiusXY", "radiusZ",
+                   "decomposeRadiusXY", "decomposeRadiusZ", "alpha", "beta",
+                   "gamma", "removeDuplicates", "findThreshold",
+                   "sparseLabels", "tileSizeXY", "tileSizeZ", "outputFormat",
+                   "workingPrecision")
+
+OUTPUT_FORMATS = ("csv", "npz")
+
+WORKING_PRECISIONS = ("float64", "float32")
+
+GAUSSIAN_TRUNCATE = 4.0
+
+SPOT_COUNT_DTYPE = np.dtype([("cell", np.int64),
+                             ("spots in cytoplasm", np.int64),
+                             ("spots in nucleus", np.int64),
+                             ("spots in cell", np.int64)])
+
+
+
+class BigfishCore:
+    """
+    The processing core of the application, that runs the bigfish gaussian
+    background correction, spot detection, dense region decomposition and the
+    spot counting. The core does not depend on Qt, so that it can be used
+    in a headless environment. The progress of the batch-processing is
+    reported to the progress-callbacks. The fraction of an operation that is
+    done, by stage, tile and image, is reported to the listeners of the
+    progress reporter, see ProgressReporter.
+
+    If a cancel token is set, the operations check it between their stages,
+    tiles and images and raise OperationCancelled when it has been
+    cancelled, see CancelToken. If an instrumentation is set, the time and
+    memory of the stages of the batch-processing are measured, see
+    Instrumentation.
+    """
+
+    def __init__(self):
+        """The constructor creates a bigfish core with default parameters.
+        """
+        super().__init__()
+        self.sigmaXY = 2.3
+        self.sigmaZ = 0.75
+        self.threshold = 15
+        self.radiusXY = 170
+        self.radiusZ = 1250
+        self.decomposeRadiusXY = 170
+        self.decomposeRadiusZ = 1250
+        self.alpha = 0.5
+        self.beta = 1
+        self.gamma = 5
+        self.removeDuplicates = True
+        self.findThreshold = True
+        self.sparseLabels = False
+        self.tileSizeXY = 0
+        self.tileSizeZ = 0
+        self.outputFormat = "csv"
+        self.workingPrecision = "float64"
+        self.data = None
+        self.spots = None
+        self.result = None
+        self.cellLabelOfSpot = None
+        self.nucleiLabelOfSpot = None
+        self.nrOfCells = 0
+        self.cellLabels = None
+        self.progressMax = 0
+        self.progress = 0
+        self.numberOfWorkers = 1
+        self.numberOfThreads = 1
+        self.prefetchDepth = 0
+        self.prefetchMaxBytes = 0
+        self.prefetchStatistics = None
+        self.manifest = None
+        self.resultCache = None
+        self.dataKey = None
+        self.keepCandidates = False
+        self.candidateCache = None
+        self.cancelToken = None
+        self.progressReporter = ProgressReporter()
+        self.instrumentation = None
+        self.progressCallbacks = []
+
+
+    def getParameters(self):
+        """Answer the parameters of the processing as a dictionary. The
+        dictionary can be used to configure another core with the same
+        parameters.
+
+        :rtype: dict
+        """
+        parameters = {}
+        for name in PARAMETER_NAMES:
+            parameters[name] = getattr(self, name)
+        return parameters
+
+
+    def setParameters(self, parameters):
+        """Set the parameters of the processing from a dictionary, as
+        answered by getParameters. Unknown keys are ignored.
+
+        :param parameters: A dictionary with parameter names as keys
+        :type parameters: dict
+        """
+        for name in PARAMETER_NAMES:
+            if name in parameters:
+                setattr(self, name, parameters[name])
+
+
+    def loadParameters(self, path):
+        """Read the parameters of the processing from a json-file, as written
+        by saveParameters.
+
+        :param path: The path of the parameter file
+        """
+        with open(path) as f:
+            self.setParameters(json.load(f))
+
+
+    def saveParameters(self, path):
+        """Write the parameters of the processing to a json-file.
+
+        :param path: The path of the parameter file
+        """
+        with open(path, "w") as f:
+            json.dump(self.getParameters(), f, indent=4)
+
+
+    def addProgressCallback(self, callback):
+        """Add a function that is called with the current and the max.
+        progress each time the progress changes.
+
+        :param callback: A function with the parameters progress and
+                         maxProgress
+        """
+        self.progressCallbacks.append(callback)
+
+
+    def runBatch(self, scale, inputImages, cellLabels=None, nucleiMasks=None,
+                       subtractBackground=False, decomposeDenseRegions=False,
+                       globalThreshold=False, spotStore=False, resumable=False):
+        """Run the processing in batch-mode on the input images.
+
+        :param scale: A tupel with the scales (voxel-sizes) of the images in nm
+                      for the z, y and x dimensions
+        :type scale: 3-tupel of floats
+        :param inputImages: A list of paths to the input images
+        :param cellLabels: An optional list of paths to the cell label images
+        :param nucleiMasks: An optional list of paths to the nuclei mask images
+        :param subtractBackground: A boolean telling wether to subtract the background
+                             before the analysis
+        :param decomposeDenseRegion: A boolean telling wether to decompose dense
+                                     regions for the spot detection
+        :param globalThreshold: A boolean telling wether, if the threshold is
+                                searched automatically, one threshold is
+                                searched for all images instead of one per
+                                image
+        :param spotStore: A boolean telling wether the spots of all images are
+                          written to one spot store in the results folder
+                          instead of one file per image, see BinaryReport
+        :param resumable: A boolean telling wether the batch records its
+                          progress in a manifest and resumes a previous batch
+                          with the same settings, see BatchManifest
+
+        If numberOfWorkers is bigger than one, the images are processed in
+        parallel by a pool of worker processes. Otherwise, if prefetchDepth is
+        bigger than zero, the next images are read in the background while
+        the current image is processed, see Prefetcher. The statistics of the
+        reading are stored in the attribute prefetchStatistics. Each image
+        is processed only once, so neither the result cache nor the spot
+        candidates are used.
+
+        If the batch is cancelled, the images that have been finished are
+        reported and, if the batch is resumable, recorded in the manifest, so
+        that the reports stay consistent and the batch can be resumed. The
+        data of the unfinished image is released.
+
+        If an instrumentation is set, the measurements of the stages are
+        written to a timing report next to the count report when the batch
+        ends, see getTimingReportPath.
+        """
+        self.progressReporter.reset()
+        settings = self.getBatchSettings(scale, subtractBackground,
+                                         decomposeDenseRegions)
+        if globalThreshold and self.shallFindThreshold() and inputImages:
+            with self.progressReporter.stage(0, 0.5):
+                self.findGlobalThreshold(scale, inputImages, subtractBackground)
+            self.findThreshold = False
+            try:
+                with self.progressReporter.stage(0.5, 1):
+                    self.runBatchWithSettings(settings, scale, inputImages,
+                                              cellLabels, nucleiMasks,
+                                              subtractBackground,
+                                              decomposeDenseRegions,
+                                              spotStore, resumable)
+            finally:
+                self.findThreshold = True
+            return
+        self.runBatchWithSettings(settings, scale, inputImages, cellLabels,
+                                  nucleiMasks, subtractBackground,
+                                  decomposeDenseRegions, spotStore, resumable)
+
+
+    def getBatchSettings(self, scale, subtractBackground=False,
+                               decomposeDenseRegions=False):
+        """Answer the settings of a batch, that must match to resume it. If
+        the threshold is searched automatically, it is not part of the
+        settings, since it is only known once the images have been processed.
+
+        :rtype: dict
+        """
+        parameters = self.getParameters()
+        if self.shallFindThreshold():
+            del parameters["threshold"]
+        return {"parameters": parameters,
+                "scale": list(scale),
+                "subtractBackground": subtractBackground,
+                "decomposeDenseRegions": decomposeDenseRegions}
+
+
+    def runBatchWithSettings(self, settings, scale, inputImages,
+                                   cellLabels=None, nucleiMasks=None,
+                                   subtractBackground=False,
+                                   decomposeDenseRegions=False,
+                                   spotStore=False, resumable=False):
+        """Run the processing in batch-mode on the input images, see runBatch.
+
+        :param settings: The settings of the batch as answered by
+                         getBatchSettings when the batch started, that are
+                         recorded in the manifest of a resumable batch
+        """
+        self.setProgressMax(len(inputImages))
+        if len(inputImages)<1:
+            return
+        imagePaths = [(inputImagePath,
+                       self.getPathAt(cellLabels, index),
+                       self.getPathAt(nucleiMasks, index))
+                      for index, inputImagePath in enumerate(inputImages)]
+        self.manifest = None
+        if resumable:
+            outputImagePath, spotStorePath = self.openManifest(
+                                    inputImages[0], settings, spotStore,
+                                    imagePaths)
+            indices = [index for index, paths in enumerate(imagePaths)
+                       if not self.manifest.isComplete(paths)]
+        else:
+            outputImagePath = self.createEmptySpotCountReport(inputImages[0])
+            spotStorePath = None
+            if spotStore:
+                spotStorePath = self.createEmptySpotStore(outputImagePath)
+            indices = list(range(len(imagePaths)))
+        try:
+            self.runBatchImages(scale, imagePaths, indices, outputImagePath,
+                                subtractBackground, decomposeDenseRegions,
+                                spotStorePath)
+        finally:
+            self.writeTimingReport(outputImagePath)
+
+
+    def runBatchImages(self, scale, imagePaths, indices, outputImagePath,
+                             subtractBackground=False,
+                             decomposeDenseRegions=False, spotStorePath=None):
+        """Process the images of the batch with the given indices and report
+        their results, see runBatch.
+
+        :param scale: A tupel with the scales (voxel-sizes) of the images in nm
+                      for the z, y and x dimensions
+        :param imagePaths: A list of tupels with the paths of the input image,
+                           the cell labels and the nuclei mask, the latter two
+                           may be None
+        :param indices: The indices of the images to process
+        :param outputImagePath: The path of the spot-count report
+        :param subtractBackground: A boolean telling wether to subtract the
+                                   background before the analysis
+        :param decomposeDenseRegion: A boolean telling wether to decompose
+                                     dense regions for the spot detection
+        :param spotStorePath: The path of the spot store or None if the spots
+                              are written to one file per image
+        """
+        nrOfSkippedImages = len(imagePaths) - len(indices)
+        if nrOfSkippedImages > 0:
+            self.setProgress(nrOfSkippedImages)
+            self.progressReporter.reportStep(nrOfSkippedImages, len(imagePaths))
+        if self.getNumberOfWorkers() > 1 and len(indices) > 1:
+            self.runBatchInParallel(scale, imagePaths, indices, outputImagePath,
+                                    subtractBackground, decomposeDenseRegions,
+                                    spotStorePath)
+            return
+        prefetcher = Prefetcher(
+                        lambda index: self.readImages(
+                                *imagePaths[index],
+                                decomposeDenseRegions=decomposeDenseRegions,
+                                inMemory=self.getPrefetchDepth() > 0),
+                        indices,
+                        depth=self.getPrefetchDepth(),
+                        maxBytes=self.getPrefetchMaxBytes())
+        resultCache, candidateCache = self.resultCache, self.candidateCache
+        self.setResultCache(None)
+        self.setCandidateCache(None)
+        batch = iter(prefetcher)
+        try:
+            for finished, (index, images) in enumerate(batch, start=1):
+                self.checkCancelled()
+                done = nrOfSkippedImages + finished - 1
+                with self.progressReporter.stage(done / len(imagePaths),
+                                                 (done + 1) / len(imagePaths)):
+                    table = self.processImageData(scale, imagePaths[index][0], *images,
+                                                  subtractBackground=subtractBackground,
+                                                  decomposeDenseRegions=decomposeDenseRegions,
+                                                  writeSpotFile=spotStorePath is None)
+                    spotTable = None
+                    if spotStorePath is not None:
+                        spotTable = self.getSpotTable()
+                    self.reportBatchResult(index, imagePaths[index], outputImagePath,
+                                           table, spotStorePath, spotTable)
+                self.setProgress(nrOfSkippedImages + finished)
+        except OperationCancelled:
+            self.releaseData()
+            raise
+        finally:
+            batch.close()
+            self.setResultCache(resultCache)
+            self.setCandidateCache(candidateCache)
+        self.prefetchStatistics = prefetcher.getStatistics()
+
+
+    def openManifest(self, inputPath, settings, spotStore=False,
+                           imagePaths=()):
+        """Open the manifest of the batch in the results folder of the input
+        image. If it records a batch with the same settings and none of the
+        finished images is outdated, the batch is resumed: the reports of the
+        manifest are used and cut back to the last finished image. Otherwise
+        new reports are created and a new batch is recorded.
+
+        :param inputPath: The path to an input image
+        :param settings: The settings of the batch that must match to resume
+        :param spotStore: A boolean telling wether the batch writes a spot
+                          store
+        :param imagePaths: A list of tupels with the paths of the input image,
+                           the cell labels and the nuclei mask of the images
+                           of the batch
+        :return: The path of the count report and the path of the spot store
+                 or None
+        :rtype: (str, str or None)
+        """
+        self.manifest = BatchManifest(self.getManifestPath(inputPath))
+        if (self.manifest.load()
+                and self.manifest.canResume(settings, spotStore)
+                and not any(self.manifest.isOutdated(paths)
+                            for paths in imagePaths)):
+            self.manifest.truncateReports()
+            return self.manifest.countReport, self.manifest.spotStore
+        outputImagePath = self.createEmptySpotCountReport(inputPath)
+        spotStorePath = None
+        if spotStore:
+            spotStorePath = self.createEmptySpotStore(outputImagePath)
+        self.manifest.start(settings, outputImagePath, spotStorePath)
+        return outputImagePath, spotStorePath
+
+
+    def getManifestPath(self, inputPath):
+        """Answer the path of the manifest of a batch of images in the folder
+        of the input image. The manifest is in the subfolder ``results``.
+
+        :param inputPath: The path to an input image
+        """
+        inFolder = os.path.dirname(os.path.abspath(inputPath))
+        outFolder = os.path.join(inFolder, "results")
+        if not os.path.exists(outFolder):
+            os.makedirs(outFolder)
+        folder = os.path.basename(inFolder)
+        return os.path.join(outFolder, folder + "_manifest.json")
+
+
+    def findGlobalThreshold(self, scale, inputImages, subtractBackground=False):
+        """Search one threshold for all input images. The statistics of the
+        spot detection are accumulated image by image, and tile by tile if a
+        tile shape is set, so that only one image is in memory at a time. The
+        threshold is set to the result, if spots have been found. Each image
+        is read only once, so neither the result cache nor the spot
+        candidates are used.
+
+        :param scale: A tupel with the scales (voxel-sizes) of the images in nm
+                      for the z, y and x dimensions
+        :param inputImages: A list of paths to the input images
+        :param subtractBackground: A boolean telling wether to subtract the
+                                   background before the analysis
+        :return: The threshold or None if no spots have been found
+        """
+        streamingThreshold = StreamingThreshold()
+        self.setProgressMax(len(inputImages))
+        resultCache, candidateCache = self.resultCache, self.candidateCache
+        self.setResultCache(None)
+        self.setCandidateCache(None)
+        try:
+            for index, inputImagePath in enumerate(inputImages):
+                self.checkCancelled()
+                with self.progressReporter.stage(index / len(inputImages),
+                                                 (index + 1) / len(inputImages)):
+                    with self.measure("read", inputImagePath):
+                        self.data = self.readImage(inputImagePath)
+                    if subtractBackground:
+                        with self.progressReporter.stage(0, 0.5), \
+                             self.measure("subtract background", inputImagePath):
+                            self.subtractBackground()
+                        self.data = self.getResult()
+                    with self.progressReporter.stage(0.5 * subtractBackground, 1), \
+                         self.measure("threshold statistics", inputImagePath):
+                        self.accumulateThresholdStatistics(scale,
+                                                           streamingThreshold)
+                self.setProgress(index+1)
+        except OperationCancelled:
+            self.releaseData()
+            raise
+        finally:
+            self.setResultCache(resultCache)
+            self.setCandidateCache(candidateCache)
+        threshold = streamingThreshold.getThreshold()
+        self.setThreshold(threshold)
+        return threshold
+
+
+    def runBatchInParallel(self, scale, imagePaths, indices, outputImagePath,
+                                 subtractBackground=False,
+                                 decomposeDenseRegions=False,
+                                 spotStorePath=None):
+        """Run the batch-processing with a pool of numberOfWorkers processes.
+        Each image is processed by a copy of the core in a worker process. The
+        progress is updated each time an image is finished and the spot-counts
+        are written to the report in the order of the input images. If an
+        instrumentation is set, the workers measure the stages of their
+        images and the measurements are added to the instrumentation.
+
+        If the batch is cancelled, the images that have not been started are
+        cancelled and the batch stops after the running images, without
+        reporting them.
+
+        :param scale: A tupel with the scales (voxel-sizes) of the images in nm
+                      for the z, y and x dimensions
+        :param imagePaths: A list of tupels with the paths of the input image,
+                           the cell labels and the nuclei mask, the latter two
+                           may be None
+        :param indices: The indices of the images to process
+        :param outputImagePath: The path of the spot-count report
+        :param subtractBackground: A boolean telling wether to subtract the
+                                   background before the analysis
+        :param decomposeDenseRegion: A boolean telling wether to decompose
+                                     dense regions for the spot detection
+        :param spotStorePath: The path of the spot store or None if the spots
+                              are written to one file per image
+        """
+        parameters = self.getParameters()
+        traceAllocations = None
+        if self.instrumentation is not None:
+            traceAllocations = self.instrumentation.traceAllocations
+        nrOfWorkers = min(self.getNumberOfWorkers(), len(indices))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=nrOfWorkers,
+                                 mp_context=context) as executor:
+            futures = {}
+            for position, index in enumerate(indices):
+                future = executor.submit(processImageWithParameters,
+                                         parameters, scale, *imagePaths[index],
+                                         subtractBackground,
+                                         decomposeDenseRegions,
+                                         spotStorePath is None,
+                                         traceAllocations)
+                futures[future] = position
+            def cancelPending():
+                for future in futures:
+                    future.cancel()
+            if self.cancelToken is not None:
+                self.cancelToken.addCallback(cancelPending)
+            try:
+                self.reportParallelResults(futures, indices, imagePaths,
+                                           outputImagePath, spotStorePath)
+            finally:
+                if self.cancelToken is not None:
+                    self.cancelToken.removeCallback(cancelPending)
+
+
+    def reportParallelResults(self, futures, indices, imagePaths,
+                                    outputImagePath, spotStorePath=None):
+        """Report the results of the images processed by the worker processes
+        in the order of the input images, as they are finished. If the
+        threshold is searched automatically, the threshold of each reported
+        image is set, as in the serial batch-processing.
+
+        :param futures: The futures of the images with their position in
+                        indices
+        :param indices: The indices of the images that are processed
+        :param imagePaths: A list of tupels with the paths of the input image,
+                           the cell labels and the nuclei mask
+        :param outputImagePath: The path of the spot-count report
+        :param spotStorePath: The path of the spot store or None
+        """
+        tables = {}
+        nextToReport = 0
+        nrOfSkippedImages = len(imagePaths) - len(indices)
+        for finished, future in enumerate(as_completed(futures), start=1):
+            self.checkCancelled()
+            tables[futures[future]] = future.result()
+            while nextToReport in tables:
+                table, spotTable, measurements, threshold = \
+                                                    tables.pop(nextToReport)
+                if self.instrumentation is not None:
+                    self.instrumentation.addMeasurements(measurements)
+                if self.shallFindThreshold():
+                    self.setThreshold(threshold)
+                index = indices[nextToReport]
+                self.reportBatchResult(index, imagePaths[index],
+                                       outputImagePath, table,
+                                       spotStorePath, spotTable)
+                nextToReport = nextToReport + 1
+            self.setProgress(nrOfSkippedImages + finished)
+            self.progressReporter.reportStep(nrOfSkippedImages + finished,
+                                             len(imagePaths))
+
+
+    def processImage(self, scale, inputImagePath, cellLabelPath=None,
+                           nucleiMaskPath=None, subtractBackground=False,
+                           decomposeDenseRegions=False, writeSpotFile=True):
+        """Read the image, detect the spots, write them to a csv-file and
+        count them per cell and environment. The label images are opened
+        without reading them into memory where possible, see ImageReader.
+        The nuclei mask is only read at the spots. The cell labels are read
+        once more plane by plane to find the cells of the count table, see
+        countSpotsPerCellAndEnvironment.
+
+        :param scale: A tupel with the scales (voxel-sizes) of the image in nm
+                      for the z, y and x dimensions
+        :param inputImagePath: The path to the input image
+        :param cellLabelPath: An optional path to the cell label image
+        :param nucleiMaskPath: An optional path to the nuclei mask image
+        :param subtractBackground: A boolean telling wether to subtract the
+                                   background before the analysis
+        :param decomposeDenseRegion: A boolean telling wether to decompose
+                                     dense regions for the spot detection
+        :return: The spot-count per cell and environment
+        :rtype: numpy.ndarray with the dtype SPOT_COUNT_DTYPE
+        """
+        images = self.readImages(inputImagePath, cellLabelPath, nucleiMaskPath,
+                                 decomposeDenseRegions=decomposeDenseRegions)
+        return self.processImageData(scale, inputImagePath, *images,
+                                     subtractBackground=subtractBackground,
+                                     decomposeDenseRegions=decomposeDenseRegions,
+                                     writeSpotFile=writeSpotFile)
+
+
+    def processImageData(self, scale, inputImagePath, data, cellLabelData=None,
+                               nucleiMaskData=None, subtractBackground=False,
+                               decomposeDenseRegions=False, writeSpotFile=True):
+        """Detect the spots in the image data, write them to a csv-file next
+        to the input image and count them per cell and environment.
+
+        :param scale: A tupel with the scales (voxel-sizes) of the image in nm
+                      for the z, y and x dimensions
+        :param inputImagePath: The path to the input image
+        :param data: The input image
+        :param cellLabelData: The optional cell labels
+        :param nucleiMaskData: The optional nuclei mask
+        :param subtractBackground: A boolean telling wether to subtract the
+                                   background before the analysis
+        :param decomposeDenseRegion: A boolean telling wether to decompose
+                                     dense regions for the spot detection
+        :param writeSpotFile: A boolean telling wether to write the spots to
+                              a file next to the input image
+        :return: The spot-count per cell and environment
+        :rtype: numpy.ndarray with the dtype SPOT_COUNT_DTYPE
+        """
+        self.data = data
+        stages = ProgressReporter.getStageRanges(
+                            1 + int(subtractBackground) + int(decomposeDenseRegions))
+        if subtractBackground:
+            with self.progressReporter.stage(*stages.pop(0)), \
+                 self.measure("subtract background", inputImagePath):
+                self.subtractBackground()
+            self.data = self.getResult()
+        with self.progressReporter.stage(*stages.pop(0)), \
+             self.measure("detect spots", inputImagePath):
+            self.detectSpots(scale)
+        if decomposeDenseRegions:
+            with self.progressReporter.stage(*stages.pop(0)), \
+                 self.measure("decompose dense regions", inputImagePath):
+                self.decomposeDenseRegions(scale)
+        self.checkCancelled()
+        with self.measure("count spots", inputImagePath):
+            self.countSpotsPerCellAndEnvironment(cellLabelData, nucleiMaskData)
+            table = self.getSpotCountPerCellAndEnvironment()
+        if writeSpotFile:
+            with self.measure("write spots", inputImagePath):
+                self.reportSpots(inputImagePath)
+        return table
+
+
+    def readImages(self, inputImagePath, cellLabelPath=None,
+                         nucleiMaskPath=None, decomposeDenseRegions=False,
+                         inMemory=False):
+        """Open the input image and the optional label images. If inMemory
+        is True, the images are read into memory completely, otherwise
+        memory-mapped and lazily read images are kept as they are where
+        possible.
+
+        :return: The input image, the cell labels and the nuclei mask, the
+                 latter two are None if their path is None
+        :rtype: tuple
+        """
+        with self.measure("read", inputImagePath):
+            images = [self.readImage(inputImagePath, decomposeDenseRegions)]
+            for path in (cellLabelPath, nucleiMaskPath):
+                image = None
+                if path is not None:
+                    image = ImageReader.openImage(path)
+                images.append(image)
+            if inMemory:
+                images = [ImageReader.readIntoMemory(image) for image in images]
+        return tuple(images)
+
+
+    def readImage(self, path, needsArray=False):
+        """Open the image at path with the ImageReader. If the image is not
+        processed tile by tile or if needsArray is True, a lazily read image
+        is read into a numpy array, since bigfish needs the whole image.
+
+        :param path: The path to the image
+        :param needsArray: A boolean telling wether the image must be a
+                           numpy array even if a tile shape is set
+        :rtype: numpy.ndarray or LazyTiffImage
+        """
+        image = ImageReader.openImage(path)
+        if isinstance(image, np.ndarray):
+            return image
+        if needsArray or self.getTileSizeXY() <= 0:
+            image = np.asarray(image)
+        return image
+
+
+    @staticmethod
+    def getPathAt(paths, index):
+        """Answer the path at index in the optional list of paths or None if
+        there is no list.
+        """
+        if not paths:
+            return None
+        return paths[index]
+
+
+    def setProgressMax(self, max):
+        """Set the max. progress and call the progress-callbacks with the
+        current and the max. progress.
+        """
+        self.progressMax = max
+        self.progress = 0
+        self.notifyProgress()
+
+
+    def setProgress(self, progress):
+        """Set the current progress and call the progress-callbacks with the
+        current and the max. progress.
+        """
+        self.progress = progress
+        self.notifyProgress()
+
+
+    def notifyProgress(self):
+        """Call the progress-callbacks with the current and the max. progress.
+        """
+        for callback in self.progressCallbacks:
+            callback(self.progress, self.progressMax)
+
+
+    def reportSpots(self, inputPath):
+        """Write a csv-file with the coordinates of the detected spots. The
+        file can be opened by napari as a points-layer. If the output format
+        is npz, a npz-file with the coordinates, the cell labels and the
+        nucleus flags of the spots is written instead, see BinaryReport.
+
+        :param inputPath: The past to the input images; the file will be written
+               into a subdirectory "spots" of that directory.
+        """
+        outPath = self.getSpotsPath(inputPath)
+        outFolder = os.path.dirname(outPath)
+        if not os.path.exists(outFolder):
+            os.makedirs(outFolder)
+        if self.getOutputFormat() == "npz":
+            BinaryReport.writeSpots(outPath, inputPath, self.spots,
+                                    self.cellLabelOfSpot,
+                                    self.nucleiLabelOfSpot)
+            return
+        with open(outPath, 'w') as f:
+            f.write(self.getSpotsAsCSV())
+
+
+    def getSpotsPath(self, inputPath):
+        """Answer the path of the file into which reportSpots writes the spots
+        of the input image.
+
+        :param inputPath: The path to the input image
+        """
+        path = Path(inputPath)
+        inFolder, filename = os.path.split(path)
+        outname, _ = os.path.splitext(filename)
+        outname = outname + self.getSpotsExtension()
+        inFolder = path.parent
+        outFolder = os.path.join(inFolder, "spots")
+        return os.path.join(outFolder, outname)
+
+
+    def getSpotsAsCSV(self):
+        """Answer the text of the csv-file with the coordinates of the spots.
+        Each line has the index of the spot, starting at one, followed by its
+        coordinates. The lines are formatted in one operation.
+
+        :rtype: str
+        """
+        header = "index,axis-0,axis-1,axis-2\n"
+        spots = np.asarray(self.spots)
+        if spots.size == 0:
+            return header
+        nrOfSpots, ndim = spots.shape
+        table = np.empty((nrOfSpots, ndim + 1), dtype=object)
+        table[:, 0] = range(1, nrOfSpots + 1)
+        table[:, 1:] = spots.astype(object)
+        lineFormat = ",".join(["%s"] * (ndim + 1)) + "\n"
+        return header + (lineFormat * nrOfSpots) % tuple(table.ravel())
+
+
+    def reportBatchResult(self, index, imagePaths, outputPath, table,
+                                spotStorePath=None, spotTable=None):
+        """Report the spot counts of an image of the batch and append its
+        spots to the spot store, if there is one. If the batch has a manifest,
+        the image is recorded as finished.
+
+        :param index: The index of the image in the batch
+        :param imagePaths: The paths of the input image, the cell labels and
+                           the nuclei mask, the latter two may be None
+        :param outputPath: The path of the spot-count report
+        :param table: The spot counts of the image
+        :param spotStorePath: The path of the spot store or None
+        :param spotTable: The spots of the image, as answered by getSpotTable
+        """
+        inputPath = imagePaths[0]
+        with self.measure("write report", inputPath):
+            self.reportSpotCounts(inputPath, outputPath, table)
+            if spotStorePath is not None:
+                BinaryReport.appendSpots(spotStorePath, index, inputPath,
+                                         spotTable)
+        if self.manifest is None:
+            return
+        outputs = []
+        spotStoreSize = 0
+        if spotStorePath is None:
+            outputs.append(self.getSpotsPath(inputPath))
+        else:
+            spotStoreSize = os.path.getsize(spotStorePath)
+        self.manifest.addImage(imagePaths, outputs,
+                               os.path.getsize(outputPath), spotStoreSize)
+
+
+    def getSpotTable(self):
+        """Answer a table with the coordinates, the cell label and the
+        nucleus flag of each spot.
+
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        spots = np.asarray(self.spots)
+        if spots.size == 0:
+            spots = spots.reshape((0, self.data.ndim))
+        return BinaryReport.createSpotTable(spots, self.cellLabelOfSpot,
+                                            self.nucleiLabelOfSpot)
+
+
+    def createEmptySpotStore(self, outputPath):
+        """Create an empty spot store next to the spot-count report and
+        return its path. The name of the store is the name of the report with
+        the suffix ``_spots`` instead of ``_count``.
+
+        :param outputPath: The path of the spot-count report
+        """
+        base, _ = os.path.splitext(outputPath)
+        if base.endswith(COUNTS_SUFFIX):
+            base = base[:-len(COUNTS_SUFFIX)]
+        storePath = base + SPOT_STORE_SUFFIX + COUNTS_EXTENSION
+        open(storePath, "ab").close()
+        return storePath
+
+
+    def writeTimingReport(self, outputPath):
+        """Write the measurements of the instrumentation to the timing report
+        of the batch. Nothing is written if there is no instrumentation or no
+        measurement.
+
+        :param outputPath: The path of the spot-count report
+        """
+        if self.instrumentation is None:
+            return
+        if not self.instrumentation.getMeasurements():
+            return
+        self.instrumentation.writeReport(self.getTimingReportPath(outputPath))
+
+
+    def getTimingReportPath(self, outputPath):
+        """Answer the path of the timing report next to the spot-count
+        report. The name of the timing report is the name of the count
+        report with the suffix ``_timing`` instead of ``_count``. It is a
+        csv-file for the output format csv and a json-file otherwise.
+
+        :param outputPath: The path of the spot-count report
+        """
+        base, _ = os.path.splitext(outputPath)
+        if base.endswith(COUNTS_SUFFIX):
+            base = base[:-len(COUNTS_SUFFIX)]
+        extension = ".csv" if self.getOutputFormat() == "csv" else ".json"
+        return base + TIMING_SUFFIX + extension
+
+
+    def reportSpotCounts(self, inputPath, outputPath, table=None):
+        """Write a csv-file with the spot-counts. If the output format is
+        npz, the counts are appended as a record to the binary count report,
+        see BinaryReport.
+
+        :param inputPath: The path of the input image will be reported in the
+                          csv-file
+        :param outputPath: The directory into which the csv-file will be written
+        :param table: The spot-counts to report, if None the counts of the
+                      current spots are reported
+        """
+        if table is None:
+            table = self.getSpotCountPerCellAndEnvironment()
+        if self.getOutputFormat() == "npz":
+            BinaryReport.appendCounts(outputPath, inputPath, table)
+            return
+        with open(outputPath, "a") as f:
+            for line in table.tolist():
+                csvLine = inputPath + "," + ",".join(str(value) for value in line)
+                f.write(csvLine)
+                f.write('\n')
+
+
+    def createEmptySpotCountReport(self, inputPath):
+        """Create a csv-file, containing only the column headings,
+        for the spot-count-report and return the path to the file. The file
+        is written into a subfolder ``results`` of the input folder. If the
+        output format is npz, an empty binary count report is created.
+
+        :param inputPath: The path to an input image
+        """
+        path = Path(inputPath)
+        inFolder, filename = os.path.split(path)
+        parent, folder = os.path.split(inFolder)
+        ts = str(datetime.now())
+        outname = ts + "_" + folder + COUNTS_SUFFIX + self.getCountsExtension()
+        inFolder = path.parent
+        outFolder = os.path.join(inFolder, "results")
+        if not os.path.exists(outFolder):
+            os.makedirs(outFolder)
+        outPath = os.path.join(outFolder, outname)
+        if self.getOutputFormat() == "npz":
+            open(outPath, "ab").close()
+            return outPath
+        if not os.path.exists(outPath):
+            with open(outPath, "a") as f:
+                headings = "image,cell,spots in cytoplasm,spots in nucleus,spots in cell"
+                f.write(headings)
+                f.write('\n')
+        return outPath
+
+
+    def getSpotsExtension(self):
+        """Answer the extension of the spot files of the output format.
+        """
+        if self.getOutputFormat() == "npz":
+            return SPOTS_EXTENSION
+        return ".csv"
+
+
+    def getCountsExtension(self):
+        """Answer the extension of the count report of the output format.
+        """
+        if self.getOutputFormat() == "npz":
+            return COUNTS_EXTENSION
+        return ".csv"
+
+
+    def getSpotRadius(self):
+        """Return the spot radius in the z, y and x-dimension
+
+        :rtype: 2 or 3-tupel of float
+        """
+        spotRadius = (self.getRadiusXY(), self.getRadiusXY())
+        if self.data.ndim > 2:
+            spotRadius = (self.getRadiusZ(), self.getRadiusXY(),
+                          self.getRadiusXY())
+        return spotRadius
+
+
+    def getScale(self, scale):
+        """Answer the scale (voxel-size) in nm in the different dimensions
+
+        :rtype: 2 or 3-tupel of float
+        """
+        if self.data.ndim == 3 or len(scale) == self.data.ndim:
+            return scale
+        return (scale[1], scale[2])
+
+
+    def getDecomposeSpotRadius(self):
+        """Answer the spot radius for the decomposition of dense regions.
+
+           :rtype: 2 or 3-tupel of float
+        """
+        decomposeSpotRadius = (self.getDecomposeRadiusXY(),
+                               self.getDecomposeRadiusXY())
+        if self.data.ndim > 2:
+            decomposeSpotRadius = (self.getDecomposeRadiusZ(),
+                                   self.getDecomposeRadiusXY(),
+                                   self.getDecomposeRadiusXY())
+        return decomposeSpotRadius
+
+
+    def getTileShape(self):
+        """Answer the shape of the tiles in which the data is processed or
+        None if the data is processed as a whole. The data is tiled if
+        tileSizeXY is bigger than zero. If tileSizeZ is not bigger than zero,
+        the tiles span the whole z-dimension.
+
+        :rtype: 2 or 3-tupel of int or None
+        """
+        if self.getTileSizeXY() <= 0:
+            return None
+        tileShape = (self.getTileSizeXY(), self.getTileSizeXY())
+        if self.data.ndim > 2:
+            tileSizeZ = self.getTileSizeZ()
+            if tileSizeZ <= 0:
+                tileSizeZ = self.data.shape[0]
+            tileShape = (tileSizeZ, self.getTileSizeXY(), self.getTileSizeXY())
+        return tileShape
+
+
+    def getBackgroundSigma(self):
+        """Answer the sigma of the gaussian used to estimate the background
+        in the z, y and x-dimension.
+
+        :rtype: 2 or 3-tupel of float
+        """
+        sigma = (self.getSigmaXY(), self.getSigmaXY())
+        if self.data.ndim > 2:
+            sigma = (self.getSigmaZ(), self.getSigmaXY(), self.getSigmaXY())
+        return sigma
+
+
+    def subtractBackground(self, out=None):
+        """Apply the gaussian background removal to the data of the application.
+        The resulting image is stored in the result-attribute.
+
+        If a tile shape is set, the data is processed tile by tile. The tiles
+        overlap by the radius of the gaussian kernel, so that the result is
+        the same as when processing the whole image at once.
+
+        If a result cache is set and no out-array is given, the result is
+        looked up in the cache before it is computed.
+
+        :param out: An optional array with the shape and dtype of the data,
+                    for example a numpy.memmap, into which the result is
+                    written when the data is tiled.
+        """
+        sigma = self.getBackgroundSigma()
+        if self.resultCache is None or out is not None:
+            self.result = self.computeBackgroundSubtraction(sigma, out)
+            return
+        key = ResultCache.getKey(self.getDataKey(), "subtractBackground",
+                                 (tuple(float(s) for s in sigma),
+                                  self.getWorkingPrecision()))
+        cached = self.resultCache.get(key)
+        if cached is not None:
+            self.result = cached[0]
+            return
+        self.result = self.computeBackgroundSubtraction(sigma)
+        self.resultCache.put(key, (self.result,))
+
+
+    def computeBackgroundSubtraction(self, sigma, out=None):
+        """Answer the data with the background removed by a gaussian filter
+        with the given sigma, computed tile by tile if a tile shape is set.
+
+        :param sigma: The sigma of the gaussian filter in each dimension
+        :param out: An optional array into which the result is written when
+                    the data is tiled
+        :rtype: numpy.ndarray
+        """
+        self.checkCancelled()
+        tileShape = self.getTileShape()
+        if tileShape is None:
+            result = self.removeBackground(self.data, sigma)
+            self.progressReporter.report(1)
+            return result
+        if out is None:
+            out = np.empty(self.data.shape, dtype=self.data.dtype)
+        halo = [int(np.ceil(GAUSSIAN_TRUNCATE * s)) + 1 for s in sigma]
+        tiles = ArrayUtil.getTiles(self.data.shape, tileShape, halo)
+        for step, (source, inner, target) in enumerate(tiles, start=1):
+            self.checkCancelled()
+            tile = np.asarray(self.data[source])
+            tileResult = self.removeBackground(tile, sigma)
+            out[target] = tileResult[inner]
+            self.progressReporter.reportStep(step, len(tiles))
+        return out
+
+
+    def detectSpots(self, scale):
+        """Run the spot detection step with or without automatic threshold
+        detection.
+
+        If a tile shape is set, the spots are detected tile by tile, see
+        detectSpotsTiled. The automatic threshold is then computed from
+        statistics accumulated tile by tile.
+
+        If a result cache is set, the spots and the threshold are looked up in
+        the cache before they are computed. A result for which no automatic
+        threshold has been found is not cached.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :type scale: 2 or 3-tupel of float
+        """
+        if self.resultCache is None:
+            self.computeSpots(scale)
+            return
+        threshold = None
+        if not self.shallFindThreshold():
+            threshold = float(self.getThreshold())
+        parameters = (tuple(float(s) for s in self.getScale(scale)),
+                      tuple(float(r) for r in self.getSpotRadius()),
+                      self.shallRemoveDuplicates(), threshold,
+                      self.getWorkingPrecision())
+        key = ResultCache.getKey(self.getDataKey(), "detectSpots", parameters)
+        cached = self.resultCache.get(key)
+        if cached is not None:
+            self.spots = cached[0]
+            if self.shallFindThreshold():
+                self.setThreshold(float(cached[1]))
+            return
+        threshold = self.computeSpots(scale)
+        if threshold is None:
+            return
+        self.resultCache.put(key, (self.spots, np.float64(threshold)))
+
+
+    def computeSpots(self, scale):
+        """Detect the spots with or without automatic threshold detection, as
+        described in detectSpots, without using the result cache.
+
+        If keepCandidates is True, the spots are selected from the spot
+        candidates of the data, see getSpotCandidates, so that detecting the
+        spots again with another threshold does not filter the data again.
+        The spot candidates are also used if the working precision is not
+        float64, since they are computed with the LoG-filter of the working
+        precision, and if the threshold is searched tile by tile, so that the
+        threshold and the spots come from one pass of the LoG-filter and the
+        local maximum detection over the tiles.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :type scale: 2 or 3-tupel of float
+        :return: The threshold used, which is None if the threshold is
+                 searched automatically and has not been found
+        :rtype: float or None
+        """
+        self.checkCancelled()
+        if (self.shallKeepCandidates()
+                or self.getWorkingPrecision() != WORKING_PRECISIONS[0]
+                or (self.getTileShape() is not None and self.findThreshold)):
+            candidates = self.getSpotCandidates(scale)
+            threshold = self.getThreshold()
+            if self.findThreshold:
+                threshold = candidates.getThreshold()
+                self.setThreshold(threshold)
+            if candidates.canDetect(threshold):
+                self.spots = candidates.getSpots(threshold,
+                                                 self.shallRemoveDuplicates())
+                return threshold
+        if self.getTileShape() is not None:
+            threshold = self.getThreshold()
+            self.spots = self.detectSpotsTiled(scale, threshold)
+        elif self.findThreshold:
+            self.spots, threshold = detection.detect_spots(
+                self.data,
+                remove_duplicate = self.shallRemoveDuplicates(),
+                return_threshold = self.shallFindThreshold(),
+                voxel_size = self.getScale(scale),
+                spot_radius = self.getSpotRadius())
+            self.setThreshold(threshold)
+        else:
+            threshold = self.getThreshold()
+            self.spots = detection.detect_spots(
+                self.data,
+                threshold = threshold,
+                remove_duplicate = self.shallRemoveDuplicates(),
+                return_threshold = self.shallFindThreshold(),
+                voxel_size = self.getScale(scale),
+                spot_radius = self.getSpotRadius())
+        self.progressReporter.report(1)
+        return threshold
+
+
+    def getSpotRadiusInPixels(self, scale):
+        """Answer the spot radius in pixels, which bigfish uses as the sigma of
+        the LoG-filter and as the minimal distance of the local maxima.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :rtype: 2 or 3-tupel of float
+        """
+        return detection.get_object_radius_pixel(
+            voxel_size_nm=tuple(float(s) for s in self.getScale(scale)),
+            object_radius_nm=tuple(float(r) for r in self.getSpotRadius()),
+            ndim=self.data.ndim)
+
+
+    def getDetectionHalo(self, scale):
+        """Answer the number of pixels by which the tiles of the spot
+        detection must overlap in each dimension. The overlap covers the
+        support of the LoG-kernel and the neighbourhood of the local maximum
+        detection, which are both derived from the spot radius and the scale.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :rtype: list of int
+        """
+        return [int(np.ceil(GAUSSIAN_TRUNCATE * r)) + int(np.ceil(r)) + 1
+                for r in self.getSpotRadiusInPixels(scale)]
+
+
+    def accumulateThresholdStatistics(self, scale, streamingThreshold):
+        """Add the LoG-filtered values and the local maxima of the data to the
+        statistics of the automatic threshold. If a tile shape is set, the
+        data is filtered tile by tile.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :param streamingThreshold: The statistics of the threshold
+        :type streamingThreshold: StreamingThreshold
+        """
+        radius = self.getSpotRadiusInPixels(scale)
+        tileShape = self.getTileShape()
+        if tileShape is None:
+            tileShape = self.data.shape
+        tiles = ArrayUtil.getTiles(self.data.shape, tileShape,
+                                   self.getDetectionHalo(scale))
+        for step, (source, inner, target) in enumerate(tiles, start=1):
+            self.checkCancelled()
+            tile = np.asarray(self.data[source])
+            filtered = self.filterLoG(tile, radius)
+            localMaxMask = detection.local_maximum_detection(filtered, radius)
+            streamingThreshold.addChunk(filtered[inner], localMaxMask[inner])
+            self.progressReporter.reportStep(step, len(tiles))
+
+
+    def getSpotCandidates(self, scale):
+        """Answer the spot candidates of the data for the spot radius and the
+        scale. If a candidate cache is set, the candidates are kept in it and
+        only computed again for new data or a new radius in pixels. If a
+        tile shape is set, the data is filtered tile by tile.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :rtype: SpotCandidates
+        """
+        radius = self.getSpotRadiusInPixels(scale)
+        key = (self.getDataKey(), tuple(float(r) for r in radius),
+               self.getWorkingPrecision())
+        if self.candidateCache is not None:
+            candidates = self.candidateCache.get(key)
+            if candidates is not None:
+                return candidates
+        candidates = SpotCandidates(self.data.ndim)
+        tileShape = self.getTileShape()
+        if tileShape is None:
+            tileShape = self.data.shape
+        tiles = ArrayUtil.getTiles(self.data.shape, tileShape,
+                                   self.getDetectionHalo(scale))
+        for step, (source, inner, target) in enumerate(tiles, start=1):
+            self.checkCancelled()
+            tile = np.asarray(self.data[source])
+            filtered = self.filterLoG(tile, radius)
+            localMaxMask = detection.local_maximum_detection(filtered, radius)
+            candidates.addChunk(filtered, localMaxMask, inner,
+                                [s.start for s in source])
+            self.progressReporter.reportStep(step, len(tiles))
+        if self.candidateCache is not None:
+            self.candidateCache.put(key, candidates)
+        return candidates
+
+
+    def previewSpots(self, scale, inner=None):
+        """Answer the spots for the current threshold, selected from the spot
+        candidates of the data, without searching the threshold. A negative
+        threshold is treated as zero.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :param inner: If not None, only the spots within these slices of the
+                      data are answered
+        :rtype: numpy.ndarray
+        """
+        threshold = max(0, self.getThreshold())
+        spots = self.getSpotCandidates(scale).getSpots(
+                                            threshold,
+                                            self.shallRemoveDuplicates())
+        if inner is None:
+            return spots
+        starts = np.array([s.start for s in inner])
+        stops = np.array([s.stop for s in inner])
+        return spots[np.all((spots >= starts) & (spots < stops), axis=1)]
+
+
+    def removeBackground(self, image, sigma):
+        """Answer the image with the background removed by a gaussian filter,
+        computed with bigfish in float64 or with Filters in the working
+        precision.
+
+        :param image: The image or a tile of it
+        :param sigma: The sigma of the gaussian filter in each dimension
+        :rtype: numpy.ndarray
+        """
+        if self.getWorkingPrecision() == WORKING_PRECISIONS[0]:
+            return stack.remove_background_gaussian(image, sigma)
+        return Filters.removeBackgroundGaussian(image, sigma,
+                                                self.getWorkingDtype())
+
+
+    def filterLoG(self, image, sigma):
+        """Answer the image filtered by the LoG-filter of the spot detection,
+        computed with bigfish in float64 or with Filters in the working
+        precision.
+
+        :param image: The image or a tile of it
+        :param sigma: The sigma of the LoG-filter in each dimension
+        :rtype: numpy.ndarray
+        """
+        if self.getWorkingPrecision() == WORKING_PRECISIONS[0]:
+            return stack.log_filter(image, sigma)
+        return Filters.logFilter(image, sigma, self.getWorkingDtype())
+
+
+    def detectSpotsTiled(self, scale, threshold):
+        """Detect the spots with the given threshold tile by tile. The tiles
+        overlap by the detection halo and only the spots in the inner part of
+        each tile are kept, so that spots in the overlap are not reported
+        twice. The tiles are processed by numberOfThreads threads.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :type scale: 2 or 3-tupel of float
+        :param threshold: The threshold of the detection, if None no spots
+                          are detected
+        :return: The coordinates of the spots in the image
+        :rtype: numpy.ndarray
+        """
+        if threshold is None:
+            return np.zeros((0, self.data.ndim), dtype=np.int64)
+        tiles = ArrayUtil.getTiles(self.data.shape, self.getTileShape(),
+                                   self.getDetectionHalo(scale))
+        spotsPerTile = []
+        with ThreadPoolExecutor(max_workers=self.getNumberOfThreads()) as executor:
+            for spots in executor.map(
+                            lambda tile: self.detectSpotsInTile(scale, threshold, *tile),
+                            tiles):
+                spotsPerTile.append(spots)
+                self.progressReporter.reportStep(len(spotsPerTile), len(tiles))
+        return np.concatenate(spotsPerTile)
+
+
+    def detectSpotsInTile(self, scale, threshold, source, inner, target):
+        """Detect the spots in one tile and answer the spots of the inner part
+        of the tile in the coordinates of the image.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :param threshold: The threshold of the detection
+        :param source: The slices of the tile with its halo in the image
+        :param inner: The slices of the inner part in the tile with halo
+        :param target: The slices of the inner part in the image
+        :rtype: numpy.ndarray
+        """
+        self.checkCancelled()
+        tile = np.asarray(self.data[source])
+        spots = detection.detect_spots(
+            tile,
+            threshold = threshold,
+            remove_duplicate = self.shallRemoveDuplicates(),
+            voxel_size = self.getScale(scale),
+            spot_radius = self.getSpotRadius())
+        spots = np.asarray(spots, dtype=np.int64).reshape(-1, self.data.ndim)
+        starts = np.array([s.start for s in inner])
+        stops = np.array([s.stop for s in inner])
+        isInner = np.all((spots >= starts) & (spots < stops), axis=1)
+        offset = np.array([s.start for s in source])
+        return spots[isInner] + offset
+
+
+    def decomposeDenseRegions(self, scale):
+        """Run the decomposition of the dense regions.
+
+        :param scale: The scale (voxel size) of the image in the z, y and x
+                      dimensions in nm.
+        :type scale: 2 or 3-tupel of float
+        """
+        self.checkCancelled()
+        self.spots, denseRegions, referenceSpot = detection.decompose_dense(
+            self.data,
+            self.spots,
+            self.getScale(scale),
+            self.getDecomposeSpotRadius(),
+            alpha = self.alpha,
+            beta = self.beta,
+            gamma = self.gamma)
+        self.progressReporter.report(1)
+
+
+    def countSpotsPerCellAndEnvironment(self, cytoplasmLabels, nucleiLabels):
+        """Counts the number of cells in the image and stores it in the
+        attribute nrOfCells. Creates the cellLabelOfSpot array, that contains
+        the cell-label for each spot and the nucleiLabelOfSpot array, that
+        contains True for all spots that are within a nucleus. The labels of
+        all spots are looked up at once.
+
+        By default the cells are numbered from zero to the highest label in
+        the cell-labels. If sparseLabels is True, only the labels present in
+        the cell-labels are counted. They are stored in the attribute
+        cellLabels. Since the table contains the cells without spots as well,
+        the highest label or the labels present are found by reading the
+        whole cell-labels, plane by plane, see ArrayUtil.getMaximum and
+        ArrayUtil.getUniqueValues. Otherwise the label images are only read
+        at the spots.
+
+        :param cytoplasmLabels: The cell-labels
+        :type cytoplasmLabels: numpy.ndarray
+        :param nucleiLabels: The nuclei-mask or labels
+        :type nucleiLabels: numpy.ndarray
+        """
+        self.cellLabelOfSpot = np.zeros(0, dtype=np.int64)
+        self.nucleiLabelOfSpot = np.zeros(0, dtype=bool)
+        if self.spots is None:
+            return False
+        self.cellLabels = None
+        self.nrOfCells = 1
+        if self.shallUseSparseLabels():
+            self.cellLabels = np.zeros(1, dtype=np.int64)
+            if not cytoplasmLabels is None:
+                self.cellLabels = ArrayUtil.getUniqueValues(
+                                            cytoplasmLabels).astype(np.int64)
+            self.nrOfCells = len(self.cellLabels)
+        elif not cytoplasmLabels is None:
+            self.nrOfCells = int(ArrayUtil.getMaximum(cytoplasmLabels)) + 1
+        nrOfSpots = len(self.spots)
+        self.cellLabelOfSpot = np.zeros(nrOfSpots, dtype=np.int64)
+        self.nucleiLabelOfSpot = np.zeros(nrOfSpots, dtype=bool)
+        if nrOfSpots == 0:
+            return True
+        coordinates = self.getSpotIndices()
+        if not cytoplasmLabels is None:
+            self.cellLabelOfSpot = np.asarray(cytoplasmLabels[coordinates],
+                                              dtype=np.int64)
+        if not nucleiLabels is None:
+            self.nucleiLabelOfSpot = np.asarray(nucleiLabels[coordinates]) > 0
+        return True
+
+
+    def getSpotIndices(self):
+        """Answer the coordinates of the spots as a tuple of integer index
+        arrays, one per dimension, that can be used to look up the values of
+        all spots in an image at once.
+
+        :rtype: tuple of numpy.ndarray
+        """
+        spots = np.asarray(self.spots)
+        if not np.issubdtype(spots.dtype, np.integer):
+            spots = np.round(spots).astype(np.int64)
+        return tuple(spots.T)
+
+
+    def getSpotCountPerCellAndEnvironment(self):
+        """Returns a table containing the spot-count for each cell, with the
+        number of cells within the nucleus, outside of the nucleus and the total
+        number. The table has one row per cell and the columns ``cell``,
+        ``spots in cytoplasm``, ``spots in nucleus`` and ``spots in cell``.
+
+        :rtype: numpy.ndarray with the dtype SPOT_COUNT_DTYPE
+        """
+        table = np.zeros(self.nrOfCells, dtype=SPOT_COUNT_DTYPE)
+        if self.cellLabels is None:
+            table["cell"] = np.arange(self.nrOfCells)
+        else:
+            table["cell"] = self.cellLabels
+        if self.cellLabelOfSpot is None or len(self.cellLabelOfSpot) == 0:
+            return table
+        rowAndNucleusFlag = 2 * self.getCellRowOfSpots() \
+                            + np.asarray(self.nucleiLabelOfSpot, dtype=np.int64)
+        counts = np.bincount(rowAndNucleusFlag, minlength=2*self.nrOfCells)
+        counts = counts[:2*self.nrOfCells].reshape(self.nrOfCells, 2)
+        table["spots in cytoplasm"] = counts[:, 0]
+        table["spots in nucleus"] = counts[:, 1]
+        table["spots in cell"] = counts[:, 0] + counts[:, 1]
+        return table
+
+
+    def getCellRowOfSpots(self):
+        """Answer the row in the spot-count table of the cell of each spot. If
+        only the present labels are counted, the row is the index of the label
+        in the sorted cellLabels, otherwise it is the label itself.
+
+        :rtype: numpy.ndarray
+        """
+        cellLabelOfSpot = np.asarray(self.cellLabelOfSpot, dtype=np.int64)
+        if self.cellLabels is None:
+            return cellLabelOfSpot
+        return np.searchsorted(self.cellLabels, cellLabelOfSpot)
+
+
+    def getNumberOfWorkers(self):
+        return self.numberOfWorkers
+
+
+    def setNumberOfWorkers(self, numberOfWorkers):
+        self.numberOfWorkers = max(1, int(numberOfWorkers))
+
+
+    def getNumberOfThreads(self):
+        return self.numberOfThreads
+
+
+    def setNumberOfThreads(self, numberOfThreads):
+        self.numberOfThreads = max(1, int(numberOfThreads))
+
+
+    def getPrefetchDepth(self):
+        return self.prefetchDepth
+
+
+    def setPrefetchDepth(self, prefetchDepth):
+        self.prefetchDepth = max(0, int(prefetchDepth))
+
+
+    def getPrefetchMaxBytes(self):
+        return self.prefetchMaxBytes
+
+
+    def setPrefetchMaxBytes(self, prefetchMaxBytes):
+        self.prefetchMaxBytes = max(0, int(prefetchMaxBytes))
+
+
+    def getDataKey(self):
+        """Answer the content hash of the data, see ResultCache.getArrayKey.
+        The hash is computed once each time the data is set.
+
+        :rtype: str
+        """
+        if self.dataKey is None or self.dataKey[0] is not self.data:
+            self.dataKey = (self.data, ResultCache.getArrayKey(self.data))
+        return self.dataKey[1]
+
+
+    def setDataKey(self, dataKey):
+        """Set the content hash of the current data, if it is already known,
+        for example from an earlier operation on the same data, so that it is
+        not computed again.
+
+        :param dataKey: The key answered by ResultCache.getArrayKey for the
+                        data or None
+        """
+        self.dataKey = None
+        if dataKey is not None:
+            self.dataKey = (self.data, dataKey)
+
+
+    def shallKeepCandidates(self):
+        return self.keepCandidates
+
+
+    def setKeepCandidates(self, keepCandidates):
+        """Set wether the spot candidates are kept in a candidate cache. A new
+        cache is created if there is none yet.
+        """
+        self.keepCandidates = keepCandidates
+        if not keepCandidates:
+            self.candidateCache = None
+        elif self.candidateCache is None:
+            self.candidateCache = CandidateCache()
+
+
+    def getCandidateCache(self):
+        return self.candidateCache
+
+
+    def setCandidateCache(self, candidateCache):
+        self.candidateCache = candidateCache
+        self.keepCandidates = candidateCache is not None
+
+
+    def getProgressReporter(self):
+        return self.progressReporter
+
+
+    def getInstrumentation(self):
+        return self.instrumentation
+
+
+    def setInstrumentation(self, instrumentation):
+        self.instrumentation = instrumentation
+
+
+    def measure(self, stage, inputPath=None):
+        """Answer a context that measures a stage of the processing of the
+        input image with the instrumentation. Without an instrumentation
+        nothing is measured.
+
+        :param stage: The name of the stage
+        :param inputPath: The path of the input image or None
+        """
+        if self.instrumentation is None:
+            return NO_MEASUREMENT
+        return self.instrumentation.measure(stage, inputPath)
+
+
+    def getCancelToken(self):
+        return self.cancelToken
+
+
+    def setCancelToken(self, cancelToken):
+        self.cancelToken = cancelToken
+
+
+    def checkCancelled(self):
+        """Raise OperationCancelled if the cancel token of the core has been
+        cancelled.
+
+        :raises OperationCancelled: If the operation has been cancelled
+        """
+        if self.cancelToken is not None:
+            self.cancelToken.check()
+
+
+    def releaseData(self):
+        """Drop the references to the data and to the intermediate results,
+        for example after an operation has been cancelled, so that their
+        memory can be freed.
+        """
+        self.data = None
+        self.result = None
+        self.spots = None
+        self.dataKey = None
+
+
+    def getResultCache(self):
+        return self.resultCache
+
+
+    def setResultCache(self, resultCache):
+        self.resultCache = resultCache
+
+
+    def getOutputFormat(self):
+        return self.outputFormat
+
+
+    def setOutputFormat(self, outputFormat):
+        if outputFormat not in OUTPUT_FORMATS:
+            raise ValueError("unknown output format: {}".format(outputFormat))
+        self.outputFormat = outputFormat
+
+
+    def getWorkingPrecision(self):
+        return self.workingPrecision
+
+
+    def setWorkingPrecision(self, workingPrecision):
+        if workingPrecision not in WORKING_PRECISIONS:
+            raise ValueError("unknown working precision: {}".format(
+                                                        workingPrecision))
+        self.workingPrecision = workingPrecision
+
+
+    def getWorkingDtype(self):
+        """Answer the floating point type of the working precision.
+
+        :rtype: numpy.dtype
+        """
+        return np.dtype(self.workingPrecision)
+
+
+    def getTileSizeXY(self):
+        return self.tileSizeXY
+
+
+    def setTileSizeXY(self, tileSize):
+        self.tileSizeXY = tileSize
+
+
+    def getTileSizeZ(self):
+        return self.tileSizeZ
+
+
+    def setTileSizeZ(self, tileSize):
+        self.tileSizeZ = tileSize
+
+
+    def getSigmaXY(self):
+        return self.sigmaXY
+
+
+    def setSigmaXY(self, sigmaXY):
+        self.sigmaXY = sigmaXY
+
+
+    def getSigmaZ(self):
+        return self.sigmaZ
+
+
+    def setSigmaZ(self, sigmaZ):
+        self.sigmaZ = sigmaZ
+
+
+    def getRadiusXY(self):
+        return self.radiusXY
+
+
+    def setRadiusXY(self, radius):
+        self.radiusXY = radius
+
+
+    def getRadiusZ(self):
+        return self.radiusZ
+
+
+    def setRadiusZ(self, radius):
+        self.radiusZ = radius
+
+
+    def getDecomposeRadiusXY(self):
+        return self.decomposeRadiusXY
+
+
+    def setDecomposeRadiusXY(self, radius):
+        self.decomposeRadiusXY = radius
+
+
+    def getDecomposeRadiusZ(self):
+        return self.decomposeRadiusZ
+
+
+    def setDecomposeRadiusZ(self, radius):
+        self.decomposeRadiusZ = radius
+
+
+    def getAlpha(self):
+        return self.alpha
+
+
+    def setAlpha(self, alpha):
+        self.alpha = alpha
+
+
+    def getBeta(self):
+        return self.beta
+
+
+    def setBeta(self, beta):
+        self.beta = beta
+
+
+    def getGamma(self):
+        return self.gamma
+
+
+    def setGamma(self, gamma):
+        self.gamma = gamma
+
+
+    def setData(self, data):
+        """Set the input image. The content hash of the previous data is
+        dropped, even if the data is the same array, since its values might
+        have been changed in place.
+        """
+        self.data = data
+        self.dataKey = None
+
+
+    def getData(self):
+        return self.data
+
+
+    def getResult(self):
+        return self.result
+
+
+    def getSpots(self):
+        return self.spots
+
+
+    def getThreshold(self):
+        return self.threshold
+
+
+    def setThreshold(self, threshold):
+        if (not threshold is None):
+            self.threshold = threshold
+
+
+    def shallRemoveDuplicates(self):
+        return self.removeDuplicates
+
+
+    def activateRemoveDuplicates(self):
+        self.removeDuplicates = True
+
+
+    def deactivateRemoveDuplicates(self):
+        self.removeDuplicates = False
+
+
+    def shallFindThreshold(self):
+        return self.findThreshold
+
+
+    def activateFindThreshold(self):
+        self.findThreshold = True
+
+
+    def deactivateFindThreshold(self):
+        self.findThreshold = False
+
+
+    def shallUseSparseLabels(self):
+        return self.sparseLabels
+
+
+    def activateSparseLabels(self):
+        self.sparseLabels = True
+
+
+    def deactivateSparseLabels(self):
+        self.sparseLabels = False
+
+
+
+def processImageWithParameters(parameters, scale, inputImagePath,
+                               cellLabelPath=None, nucleiMaskPath=None,
+                               subtractBackground=False,
+                               decomposeDenseRegions=False,
+                               writeSpotFile=True, traceAllocations=None):
+    """Process one image of a batch with a new core configured with the given
+    parameters. The function is used as the task of the worker processes of
+    the parallel batch-processing.
+
+    :param traceAllocations: If None, the stages are not measured, otherwise
+                             a boolean telling wether their allocations are
+                             traced, see Instrumentation
+    :return: The spot-count per cell and environment, if writeSpotFile is
+             False the table of the spots, otherwise None, the measurements
+             of the stages and the threshold used for the image, which is
+             the automatic threshold if findThreshold is True
+    :rtype: (numpy.ndarray, numpy.ndarray or None, list of dict, float)
+    """
+    core = BigfishCore()
+    core.setParameters(parameters)
+    if traceAllocations is not None:
+        core.setInstrumentation(Instrumentation(traceAllocations))
+    table = core.processImage(scale, inputImagePath, cellLabelPath,
+                              nucleiMaskPath, subtractBackground,
+                              decomposeDenseRegions, writeSpotFile)
+    spotTable = None
+    if not writeSpotFile:
+        spotTable = core.getSpotTable()
+    measurements = []
+    if traceAllocations is not None:
+        measurements = core.getInstrumentation().getMeasurements()
+    return table, spotTable, measurements, core.getThreshold()
\ No newline at end of file
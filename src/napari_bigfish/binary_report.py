@@ -0,0 +1,231 @@
+import os
+import glob
+import numpy as np
+from numpy.lib.recfunctions import repack_fields
+
+
+
+SPOTS_EXTENSION = ".npz"
+COUNTS_EXTENSION = ".npy"
+COUNTS_SUFFIX = "_count"
+SPOT_STORE_SUFFIX = "_spots"
+
+
+
+class BinaryReport:
+    """Write and read the results of the spot detection and counting in a
+    binary format that keeps the types of the columns.
+
+    The spots of an image are written into a npz-file with the path of the
+    image, the coordinates of the spots, the cell label of each spot and a
+    flag telling wether the spot is in a nucleus.
+
+    The count report is a sequence of npy-records in one file. Each record is
+    a structured array with the column ``image`` and the columns of the spot
+    count table. Appending the counts of an image only appends a record to
+    the file.
+
+    The spots of all images of a batch can be written to one spot store
+    instead of one file per image. The spot store is a sequence of npy-records
+    like the count report, with the columns ``image id``, ``image`` and the
+    columns of the spots.
+    """
+
+
+    @staticmethod
+    def createSpotTable(spots, cellLabelOfSpot=None, nucleiLabelOfSpot=None):
+        """Answer a table with the columns ``axis-0``, ``axis-1``,
+        (``axis-2``), ``cell`` and ``nucleus`` for the spots. The coordinates
+        keep their type.
+
+        :param spots: The coordinates of the spots
+        :param cellLabelOfSpot: The cell label of each spot, if None the
+                                spots are in the background label 0
+        :param nucleiLabelOfSpot: For each spot True if it is in a nucleus,
+                                  if None no spot is in a nucleus
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        spots = np.asarray(spots)
+        if spots.ndim < 2:
+            spots = spots.reshape((len(spots), 0))
+        if cellLabelOfSpot is None or len(cellLabelOfSpot) != len(spots):
+            cellLabelOfSpot = np.zeros(len(spots), dtype=np.int64)
+        if nucleiLabelOfSpot is None or len(nucleiLabelOfSpot) != len(spots):
+            nucleiLabelOfSpot = np.zeros(len(spots), dtype=bool)
+        names = ["axis-{}".format(axis) for axis in range(spots.shape[1])]
+        dtype = [(name, spots.dtype) for name in names]
+        dtype = dtype + [("cell", np.int64), ("nucleus", bool)]
+        table = np.empty(len(spots), dtype=dtype)
+        for axis, name in enumerate(names):
+            table[name] = spots[:, axis]
+        table["cell"] = cellLabelOfSpot
+        table["nucleus"] = nucleiLabelOfSpot
+        return table
+
+
+    @staticmethod
+    def addColumns(table, columns):
+        """Answer a copy of the table with additional leading columns, that
+        have the same value in each row. String values get a unicode column
+        of their length, other values an int64 column.
+
+        :param table: A table with a structured dtype
+        :param columns: A list of tupels with the name and the value of a
+                        column
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        dtype = []
+        for name, value in columns:
+            if isinstance(value, str):
+                dtype.append((name, "U{}".format(max(1, len(value)))))
+            else:
+                dtype.append((name, np.int64))
+        result = np.empty(len(table), dtype=dtype + table.dtype.descr)
+        for name, value in columns:
+            result[name] = value
+        for name in table.dtype.names:
+            result[name] = table[name]
+        return result
+
+
+    @staticmethod
+    def writeSpots(path, inputPath, spots, cellLabelOfSpot=None,
+                   nucleiLabelOfSpot=None):
+        """Write the spots of an image to a npz-file.
+
+        :param path: The path of the npz-file
+        :param inputPath: The path of the image in which the spots were found
+        :param spots: The coordinates of the spots
+        :param cellLabelOfSpot: The cell label of each spot, if None the
+                                spots are in the background label 0
+        :param nucleiLabelOfSpot: For each spot True if it is in a nucleus,
+                                  if None no spot is in a nucleus
+        """
+        table = BinaryReport.createSpotTable(spots, cellLabelOfSpot,
+                                             nucleiLabelOfSpot)
+        with open(path, "wb") as f:
+            np.savez(f, image=np.asarray(str(inputPath)),
+                        coordinates=np.asarray(spots),
+                        cell=table["cell"],
+                        nucleus=table["nucleus"])
+
+
+    @staticmethod
+    def readSpots(path):
+        """Read the spots written by writeSpots as a table with the columns
+        ``image``, ``axis-0``, ``axis-1``, (``axis-2``), ``cell`` and
+        ``nucleus``.
+
+        :param path: The path of the npz-file
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        with np.load(path, allow_pickle=False) as spotsFile:
+            image = str(spotsFile["image"])
+            table = BinaryReport.createSpotTable(spotsFile["coordinates"],
+                                                 spotsFile["cell"],
+                                                 spotsFile["nucleus"])
+        return BinaryReport.addColumns(table, [("image", image)])
+
+
+    @staticmethod
+    def appendSpots(path, imageID, inputPath, table):
+        """Append the spots of an image to a spot store, a file containing the
+        spots of all images of a batch.
+
+        :param path: The path of the spot store
+        :param imageID: The index of the image in the batch
+        :param inputPath: The path of the image
+        :param table: The spots of the image, as answered by createSpotTable
+        """
+        record = BinaryReport.addColumns(table, [("image id", imageID),
+                                                 ("image", str(inputPath))])
+        with open(path, "ab") as f:
+            np.save(f, record, allow_pickle=False)
+
+
+    @staticmethod
+    def readSpotStore(path, inputPath=None):
+        """Read the spots of the spot store as one table, with the columns
+        ``image id`` and ``image`` followed by the columns of the spots.
+
+        :param path: The path of the spot store
+        :param inputPath: If not None, only the spots of the image with this
+                          path are answered
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        table = BinaryReport.readRecords(path)
+        if inputPath is not None and len(table) > 0:
+            table = table[table["image"] == str(inputPath)]
+        return table
+
+
+    @staticmethod
+    def appendCounts(path, inputPath, table):
+        """Append the spot counts of an image to the count report.
+
+        :param path: The path of the count report
+        :param inputPath: The path of the image
+        :param table: The spot counts of the image
+        :type table: numpy.ndarray with a structured dtype
+        """
+        record = BinaryReport.addColumns(table, [("image", str(inputPath))])
+        with open(path, "ab") as f:
+            np.save(f, record, allow_pickle=False)
+
+
+    @staticmethod
+    def readCounts(path):
+        """Read all records of the count report as one table.
+
+        :param path: The path of the count report
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        return BinaryReport.readRecords(path)
+
+
+    @staticmethod
+    def readRecords(path):
+        """Read all npy-records of a file and concatenate them.
+
+        :param path: The path of the file
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        records = []
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            while f.tell() < size:
+                records.append(np.load(f, allow_pickle=False))
+        if not records:
+            return np.zeros(0, dtype=[("image", "U1")])
+        return np.concatenate(records)
+
+
+    @staticmethod
+    def readPlate(folder):
+        """Read the binary results of all images in a folder, i.e. the count
+        reports and the spot stores in the subfolder ``results`` and the
+        spots in the subfolder ``spots``.
+
+        :param folder: The folder containing the input images
+        :return: The counts of all count reports and the spots of all images
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        results = os.path.join(folder, "results")
+        countPaths = sorted(glob.glob(os.path.join(results,
+                                        "*" + COUNTS_SUFFIX + COUNTS_EXTENSION)))
+        storePaths = sorted(glob.glob(os.path.join(results,
+                                        "*" + SPOT_STORE_SUFFIX + COUNTS_EXTENSION)))
+        spotPaths = sorted(glob.glob(os.path.join(folder, "spots",
+                                                  "*" + SPOTS_EXTENSION)))
+        counts = [BinaryReport.readCounts(path) for path in countPaths]
+        counts = [table for table in counts if len(table.dtype) > 1]
+        spots = [BinaryReport.readSpots(path) for path in spotPaths]
+        for path in storePaths:
+            table = BinaryReport.readSpotStore(path)
+            if len(table.dtype) > 1:
+                names = [name for name in table.dtype.names
+                         if name != "image id"]
+                spots.append(repack_fields(table[names]))
+        counts = np.concatenate(counts) if counts else None
+        spots = np.concatenate(spots) if spots else None
+        return counts, spots
@@ -0,0 +1,190 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+
+DEFAULT_MAX_BYTES = 2**30
+
+
+
+class ResultCache:
+    """A cache for the results of operations on images. The results are
+    stored under a key computed from the content of the input array and the
+    parameters of the operation, so that running an operation again on the
+    same image with parameters that have already been used answers the stored
+    result immediately.
+
+    The results are tuples of numpy arrays. The arrays are made read-only
+    when they are stored, so that the results answered by the cache can not
+    be changed by their users. They are kept in memory, the least recently
+    used results being dropped when the size of all results exceeds
+    maxBytes. If a directory is given, the results are also written to
+    npz-files in the directory and read from there if they have been dropped
+    from memory.
+
+    The cache can be shared by operations running in different threads.
+    """
+
+
+    def __init__(self, maxBytes=DEFAULT_MAX_BYTES, directory=None):
+        """Create a new, empty cache.
+
+        :param maxBytes: The maximal size in bytes of the results in memory
+        :param directory: An optional directory for the results on disk
+        """
+        self.maxBytes = maxBytes
+        self.directory = directory
+        if directory is not None and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+        self.nrOfBytes = 0
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def getArrayKey(data):
+        """Answer a hash of the shape, type and content of an array.
+
+        :rtype: str
+        """
+        data = np.ascontiguousarray(data)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((data.shape, data.dtype.str)).encode())
+        digest.update(memoryview(data.reshape(-1)).cast("B"))
+        return digest.hexdigest()
+
+
+    @staticmethod
+    def getKey(arrayKey, operation, parameters):
+        """Answer the key of the result of an operation with the given
+        parameters on the array with the given array key.
+
+        :param arrayKey: The key of the input array, see getArrayKey
+        :param operation: The name of the operation
+        :param parameters: The parameters of the operation, their repr is
+                           part of the key
+        :rtype: str
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((arrayKey, operation, parameters)).encode())
+        return digest.hexdigest()
+
+
+    def get(self, key):
+        """Answer the result stored under the key or None if there is none.
+
+        :rtype: tuple of numpy.ndarray or None
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits = self.hits + 1
+                return self.entries[key]
+            path = self.getPath(key)
+            if path is not None and os.path.exists(path):
+                with np.load(path, allow_pickle=False) as arrays:
+                    result = ResultCache.getReadOnly(
+                                    arrays["arr_{}".format(index)]
+                                    for index in range(len(arrays.files)))
+                self.hits = self.hits + 1
+                self.diskHits = self.diskHits + 1
+                self.putInMemory(key, result)
+                return result
+            self.misses = self.misses + 1
+            return None
+
+
+    def put(self, key, result):
+        """Store the result under the key. The arrays of the result are made
+        read-only, an array that is still needed writable must be copied
+        before it is stored.
+
+        :param result: A tuple of numpy arrays
+        """
+        result = ResultCache.getReadOnly(result)
+        self.putInMemory(key, result)
+        path = self.getPath(key)
+        if path is not None and not os.path.exists(path):
+            tmpPath = "{}.{}.tmp.npz".format(path, threading.get_ident())
+            np.savez(tmpPath, *result)
+            os.replace(tmpPath, path)
+
+
+    @staticmethod
+    def getReadOnly(arrays):
+        """Answer the arrays as a tuple of numpy arrays that can not be
+        written.
+
+        :rtype: tuple of numpy.ndarray
+        """
+        result = tuple(np.asarray(array) for array in arrays)
+        for array in result:
+            array.setflags(write=False)
+        return result
+
+
+    def putInMemory(self, key, result):
+        """Store the result in memory and drop the least recently used
+        results until the size of the results is at most maxBytes. A result
+        bigger than maxBytes is not kept in memory.
+        """
+        size = sum(array.nbytes for array in result)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if size > self.maxBytes:
+                return
+            self.entries[key] = result
+            self.nrOfBytes = self.nrOfBytes + size
+            while self.nrOfBytes > self.maxBytes:
+                self.remove(next(iter(self.entries)))
+
+
+    def remove(self, key):
+        """Remove the result stored under key from memory.
+        """
+        with self.lock:
+            result = self.entries.pop(key)
+            self.nrOfBytes = self.nrOfBytes - sum(array.nbytes
+                                                  for array in result)
+
+
+    def getPath(self, key):
+        """Answer the path of the file of the result on disk or None if the
+        cache has no directory.
+        """
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, key + ".npz")
+
+
+    def clear(self):
+        """Remove all results from memory and reset the statistics. The
+        results on disk are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.nrOfBytes = 0
+            self.hits = 0
+            self.diskHits = 0
+            self.misses = 0
+
+
+    def getStatistics(self):
+        """Answer the number of hits, of hits from disk and of misses, the
+        number of results in memory and their size in bytes.
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {"hits": self.hits,
+                    "disk hits": self.diskHits,
+                    "misses": self.misses,
+                    "entries": len(self.entries),
+                    "bytes": self.nrOfBytes}
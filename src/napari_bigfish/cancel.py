@@ -0,0 +1,72 @@
+import threading
+
+
+
+class OperationCancelled(Exception):
+    """Raised at a checkpoint of an operation that has been cancelled.
+    """
+
+
+
+class CancelToken:
+    """A flag telling a running operation that it should stop. The operation
+    checks the token at checkpoints, for example between the tiles of an
+    image or between the images of a batch, and raises OperationCancelled if
+    it has been cancelled, so that the intermediate results are released
+    while the exception unwinds.
+
+    The token can be cancelled from another thread. Callbacks added to the
+    token are called when it is cancelled, for example to cancel the tasks
+    of a pool that have not yet started.
+    """
+
+
+    def __init__(self):
+        """Create a new token, that is not cancelled.
+        """
+        self.cancelled = threading.Event()
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+
+    def cancel(self):
+        """Cancel the operation and call the callbacks of the token.
+        """
+        with self.lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            callback()
+
+
+    def isCancelled(self):
+        return self.cancelled.is_set()
+
+
+    def check(self):
+        """Raise OperationCancelled if the token has been cancelled.
+
+        :raises OperationCancelled: If the token has been cancelled
+        """
+        if self.cancelled.is_set():
+            raise OperationCancelled()
+
+
+    def addCallback(self, callback):
+        """Add a function without arguments that is called when the token is
+        cancelled. If the token has already been cancelled, the function is
+        called at once.
+        """
+        with self.lock:
+            if not self.cancelled.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+
+    def removeCallback(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
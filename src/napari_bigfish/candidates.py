@@ -0,0 +1,190 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import ndimage
+from napari_bigfish.threshold import StreamingThreshold
+
+
+
+DEFAULT_MAX_ENTRIES = 4
+
+
+
+class SpotCandidates:
+    """The candidate spots of an image, i.e. the local maxima of the
+    LoG-filtered image with their filtered values, from which the spots for
+    any threshold can be selected without filtering the image again.
+
+    Bigfish keeps the local maxima with a value above the threshold. If
+    duplicates are removed, it keeps one spot, the centroid, per connected
+    component of the remaining local maxima. Since the neighbourhood of the
+    local maximum detection contains at least the direct neighbours of a
+    pixel, connected local maxima have the same value. The components
+    therefore do not depend on the threshold and their centroids are computed
+    once. As the threshold can not be negative, only the local maxima with a
+    value above zero are kept.
+
+    The candidates are added chunk by chunk, for example for the tiles of a
+    large image. The statistics of the automatic threshold are accumulated at
+    the same time.
+    """
+
+
+    def __init__(self, ndim):
+        """Create new candidates without local maxima for an image with ndim
+        dimensions.
+        """
+        self.ndim = ndim
+        self.coordinates = []
+        self.values = []
+        self.centroids = []
+        self.centroidValues = []
+        self.streamingThreshold = StreamingThreshold()
+
+
+    def addChunk(self, filtered, localMaxMask, inner=None, offset=None):
+        """Add the local maxima of a chunk of the LoG-filtered image.
+
+        :param filtered: The LoG-filtered values of the chunk
+        :type filtered: numpy.ndarray
+        :param localMaxMask: A mask of the local maxima in the chunk
+        :type localMaxMask: numpy.ndarray of bool
+        :param inner: The slices of the part of the chunk of which the local
+                      maxima and the centroids are kept, if None the whole
+                      chunk is kept
+        :param offset: The position of the chunk in the image, if None the
+                       chunk starts at the origin
+        """
+        if inner is None:
+            inner = tuple(slice(0, size) for size in filtered.shape)
+        if offset is None:
+            offset = (0,) * self.ndim
+        self.streamingThreshold.addChunk(filtered[inner], localMaxMask[inner])
+        mask = localMaxMask & (filtered > 0)
+        coordinates = np.argwhere(mask)
+        values = filtered[mask]
+        labels, nrOfComponents = ndimage.label(mask,
+                                               structure=np.ones((3,) * self.ndim))
+        labelOfCandidate = labels[mask] - 1
+        counts = np.bincount(labelOfCandidate, minlength=nrOfComponents)
+        centroids = np.empty((nrOfComponents, self.ndim), dtype=np.int64)
+        for axis in range(self.ndim):
+            sums = np.bincount(labelOfCandidate, weights=coordinates[:, axis],
+                               minlength=nrOfComponents)
+            centroids[:, axis] = (sums / np.maximum(counts, 1)).astype(np.int64)
+        centroidValues = np.zeros(nrOfComponents, dtype=values.dtype)
+        centroidValues[labelOfCandidate] = values
+        starts = np.array([s.start for s in inner], dtype=np.int64)
+        stops = np.array([s.stop for s in inner], dtype=np.int64)
+        isInner = np.all((coordinates >= starts) & (coordinates < stops), axis=1)
+        self.coordinates.append(coordinates[isInner] + offset)
+        self.values.append(values[isInner])
+        isInner = np.all((centroids >= starts) & (centroids < stops), axis=1)
+        self.centroids.append(centroids[isInner] + offset)
+        self.centroidValues.append(centroidValues[isInner])
+
+
+    def canDetect(self, threshold):
+        """Answer True if the spots for the threshold can be selected from the
+        candidates, which is the case for None and thresholds that are not
+        negative.
+        """
+        return threshold is None or threshold >= 0
+
+
+    def getSpots(self, threshold, removeDuplicates=True):
+        """Answer the spots that bigfish detects with the threshold.
+
+        :param threshold: The threshold of the detection, if None no spots
+                          are detected
+        :param removeDuplicates: If True, only the centroid of connected
+                                 local maxima is a spot
+        :rtype: numpy.ndarray of int64
+        """
+        if threshold is None:
+            return np.zeros((0, self.ndim), dtype=np.int64)
+        if not self.values:
+            return np.zeros((0, self.ndim), dtype=np.int64)
+        self.concatenateChunks()
+        if removeDuplicates:
+            return self.centroids[0][self.centroidValues[0] > threshold]
+        return self.coordinates[0][self.values[0] > threshold]
+
+
+    def concatenateChunks(self):
+        """Join the local maxima and the centroids of the chunks, so that
+        selecting the spots for a threshold does not copy them again.
+        """
+        if len(self.values) < 2:
+            return
+        self.coordinates = [np.concatenate(self.coordinates)]
+        self.values = [np.concatenate(self.values)]
+        self.centroids = [np.concatenate(self.centroids)]
+        self.centroidValues = [np.concatenate(self.centroidValues)]
+
+
+    def getThreshold(self):
+        """Answer the automatic threshold of bigfish, see StreamingThreshold.
+
+        :rtype: float or None
+        """
+        return self.streamingThreshold.getThreshold()
+
+
+    def getNumberOfCandidates(self):
+        """Answer the number of local maxima with a value above zero.
+
+        :rtype: int
+        """
+        return sum(len(values) for values in self.values)
+
+
+
+class CandidateCache:
+    """Keep the spot candidates of the last maxEntries images and spot radii,
+    so that they can be shared by operations running in different threads.
+    The candidates are concatenated before they are stored, so that selecting
+    spots from them does not modify them.
+    """
+
+
+    def __init__(self, maxEntries=DEFAULT_MAX_ENTRIES):
+        """Create a new, empty cache.
+
+        :param maxEntries: The maximal number of candidates in the cache
+        """
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, key):
+        """Answer the candidates stored under the key or None if there are
+        none.
+
+        :rtype: SpotCandidates or None
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+
+    def put(self, key, candidates):
+        """Store the candidates under the key and drop the least recently used
+        candidates if there are more than maxEntries.
+        """
+        candidates.concatenateChunks()
+        with self.lock:
+            self.entries[key] = candidates
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+
+    def clear(self):
+        """Remove all candidates from the cache.
+        """
+        with self.lock:
+            self.entries.clear()
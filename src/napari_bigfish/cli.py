@@ -0,0 +1,167 @@
+"""
+A command-line interface to run the batch-processing without napari and Qt.
+"""
+import sys
+import glob
+import argparse
+from napari_bigfish.bigfishcore import BigfishCore, OUTPUT_FORMATS
+from napari_bigfish.bigfishcore import WORKING_PRECISIONS
+from napari_bigfish.instrumentation import Instrumentation
+
+
+
+def main(argv=None):
+    """Run the batch-processing on the images given on the command-line.
+
+    :param argv: The command-line arguments, if None the arguments of the
+                 process are used
+    :return: The exit status
+    :rtype: int
+    """
+    parser = getArgumentParser()
+    arguments = parser.parse_args(argv)
+    inputImages = expandPatterns(arguments.images)
+    if not inputImages:
+        parser.error("no input images found")
+    cellLabels = expandPatterns(arguments.cell_labels)
+    nucleiMasks = expandPatterns(arguments.nuclei_masks)
+    for name, paths in (("cell label", cellLabels),
+                        ("nuclei mask", nucleiMasks)):
+        if paths and len(paths) != len(inputImages):
+            parser.error("found {} {} images for {} input images".format(
+                                len(paths), name, len(inputImages)))
+    core = BigfishCore()
+    if arguments.parameters:
+        core.loadParameters(arguments.parameters)
+    if arguments.format:
+        core.setOutputFormat(arguments.format)
+    if arguments.precision:
+        core.setWorkingPrecision(arguments.precision)
+    core.setNumberOfWorkers(arguments.workers)
+    core.setPrefetchDepth(arguments.prefetch)
+    core.setPrefetchMaxBytes(arguments.prefetch_memory * 2**20)
+    if not arguments.quiet:
+        core.addProgressCallback(printProgress)
+    if arguments.timing or arguments.trace_allocations:
+        core.setInstrumentation(Instrumentation(arguments.trace_allocations))
+    core.runBatch(tuple(arguments.scale), inputImages,
+                  cellLabels=cellLabels or None,
+                  nucleiMasks=nucleiMasks or None,
+                  subtractBackground=arguments.subtract_background,
+                  decomposeDenseRegions=arguments.decompose_dense_regions,
+                  globalThreshold=arguments.global_threshold,
+                  spotStore=arguments.spot_store,
+                  resumable=arguments.resume)
+    if not arguments.quiet and core.prefetchStatistics:
+        printPrefetchStatistics(core.prefetchStatistics)
+    if not arguments.quiet and core.getInstrumentation() is not None:
+        printTimingSummary(core.getInstrumentation().getSummary())
+    return 0
+
+
+def getArgumentParser():
+    """Answer the parser for the command-line arguments of the batch-
+    processing.
+
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="napari-bigfish-batch",
+        description="Detect and count FISH-spots in a batch of images.")
+    parser.add_argument("images", nargs="+",
+                        help="the input images or glob-patterns of them")
+    parser.add_argument("-s", "--scale", nargs=3, type=float, required=True,
+                        metavar=("Z", "Y", "X"),
+                        help="the voxel size of the images in nm")
+    parser.add_argument("-p", "--parameters",
+                        help="a json-file with the parameters of the processing")
+    parser.add_argument("-c", "--cell-labels", nargs="*", default=[],
+                        help="the cell label images or glob-patterns of them")
+    parser.add_argument("-n", "--nuclei-masks", nargs="*", default=[],
+                        help="the nuclei mask images or glob-patterns of them")
+    parser.add_argument("-b", "--subtract-background", action="store_true",
+                        help="subtract the background before the detection")
+    parser.add_argument("-d", "--decompose-dense-regions", action="store_true",
+                        help="decompose dense regions after the detection")
+    parser.add_argument("-g", "--global-threshold", action="store_true",
+                        help="search one automatic threshold for all images")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS,
+                        help="the format of the spot files and the count "
+                             "report, by default the format of the parameters")
+    parser.add_argument("--precision", choices=WORKING_PRECISIONS,
+                        help="the floating point type of the filters, by "
+                             "default the precision of the parameters")
+    parser.add_argument("--spot-store", action="store_true",
+                        help="write the spots of all images into one file in "
+                             "the results folder")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="record the finished images in a manifest and "
+                             "skip the images finished by a previous run with "
+                             "the same settings")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="the number of images processed in parallel")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="the number of images read ahead in the background")
+    parser.add_argument("--prefetch-memory", type=float, default=0,
+                        metavar="MB",
+                        help="the maximal size of the images read ahead in MB, "
+                             "0 for no limit")
+    parser.add_argument("--timing", action="store_true",
+                        help="measure the time and memory of each stage and "
+                             "write a timing report next to the count report")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="like --timing, but also trace the memory "
+                             "allocated by each stage, which is slower")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="do not report the progress")
+    return parser
+
+
+def expandPatterns(patterns):
+    """Answer the sorted paths matching the glob-patterns. A pattern that does
+    not match any file is kept as it is.
+
+    :param patterns: A list of paths or glob-patterns
+    :rtype: list of str
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            matches = [pattern]
+        paths.extend(matches)
+    return paths
+
+
+def printProgress(progress, maxProgress):
+    """Print the progress of the batch-processing to stderr.
+    """
+    print("processed image {} of {}".format(progress, maxProgress),
+          file=sys.stderr)
+
+
+def printPrefetchStatistics(statistics):
+    """Print the time spent reading the images and the part of it that has
+    been hidden behind the processing to stderr.
+    """
+    print("read images in {:.2f}s, waited {:.2f}s, hidden {:.2f}s".format(
+                statistics["read time"], statistics["wait time"],
+                statistics["hidden read time"]),
+          file=sys.stderr)
+
+
+def printTimingSummary(summary):
+    """Print the total wall and cpu time and the peak memory of each stage to
+    stderr.
+    """
+    for stage, total in summary.items():
+        print("{}: {} times, {:.2f}s wall, {:.2f}s cpu, peak rss {:.1f} MB, "
+              "peak allocations {:.1f} MB".format(
+                    stage, total["count"], total["wall time"],
+                    total["cpu time"], total["peak rss"] / 2**20,
+                    total["peak allocations"] / 2**20),
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import numpy as np
+from scipy import ndimage
+
+
+
+GAUSSIAN_MODE = "nearest"
+GAUSSIAN_TRUNCATE = 4.0
+
+
+
+class Filters:
+    """The gaussian background subtraction and the LoG-filter of bigfish with
+    a configurable floating point type for the intermediate results.
+
+    Bigfish converts 16-bit images to float64 values between zero and one,
+    filters them and converts the result back to 16 bit. With the type
+    float64, the filters answer the same results as bigfish. With float32,
+    the intermediate images need half the memory and the results differ by
+    at most one gray value. Images of type float are filtered in their own
+    type, as in bigfish.
+    """
+
+
+    @staticmethod
+    def toFloat(image, dtype):
+        """Answer an integer image as floating point values between zero and
+        one, as bigfish does, with the given type. 8-bit images are always
+        converted to float32, float images are answered as they are.
+
+        :rtype: numpy.ndarray
+        """
+        if image.dtype == np.uint8:
+            return np.multiply(image, 1.0 / 255, dtype=np.float32)
+        if image.dtype == np.uint16:
+            return np.multiply(image, 1.0 / 65535, dtype=dtype)
+        return image
+
+
+    @staticmethod
+    def toImageType(filtered, imageType):
+        """Answer the filtered floating point values converted back to the
+        type of the image, if it is an integer type.
+
+        :rtype: numpy.ndarray
+        """
+        if imageType not in (np.uint8, np.uint16):
+            return filtered
+        maximum = np.iinfo(imageType).max
+        result = np.multiply(filtered, maximum, dtype=filtered.dtype)
+        np.rint(result, out=result)
+        np.clip(result, 0, maximum, out=result)
+        return result.astype(imageType)
+
+
+    @staticmethod
+    def removeBackgroundGaussian(image, sigma, dtype=np.float64):
+        """Subtract the image filtered by a gaussian from the image, like
+        bigfish.stack.remove_background_gaussian.
+
+        :param image: The image with the shape (z, y, x) or (y, x)
+        :param sigma: The sigma of the gaussian in each dimension
+        :param dtype: The floating point type of the intermediate results
+        :rtype: numpy.ndarray
+        """
+        imageFloat = Filters.toFloat(image, dtype)
+        filtered = ndimage.gaussian_filter(imageFloat, sigma,
+                                           mode=GAUSSIAN_MODE,
+                                           truncate=GAUSSIAN_TRUNCATE)
+        np.clip(filtered, 0, 1, out=filtered)
+        filtered = Filters.toImageType(filtered, image.dtype)
+        result = np.zeros_like(image)
+        np.subtract(image, filtered, out=result, where=(image > filtered),
+                    dtype=image.dtype)
+        return result
+
+
+    @staticmethod
+    def logFilter(image, sigma, dtype=np.float64):
+        """Filter the image with the negative laplacian of gaussian and clip
+        negative values, like bigfish.stack.log_filter.
+
+        :param image: The image with the shape (z, y, x) or (y, x)
+        :param sigma: The sigma of the gaussian in each dimension
+        :param dtype: The floating point type of the intermediate results
+        :rtype: numpy.ndarray
+        """
+        imageFloat = Filters.toFloat(image, dtype)
+        filtered = ndimage.gaussian_laplace(imageFloat, sigma)
+        np.negative(filtered, out=filtered)
+        np.clip(filtered, 0, None, out=filtered)
+        return Filters.toImageType(filtered, image.dtype)
@@ -0,0 +1,137 @@
+import os
+import numpy as np
+import tifffile
+from skimage import io
+
+
+
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+
+
+class ImageReader:
+    """Open the images of the batch-processing without reading them into
+    memory where possible. Uncompressed, contiguous tiff-files are memory-
+    mapped, other tiff-stacks are read lazily plane by plane and all other
+    images are read with skimage.
+    """
+
+
+    @staticmethod
+    def openImage(path):
+        """Open the image at path. The answer is a numpy.memmap if the file
+        can be memory-mapped, a LazyTiffImage if it is a tiff-stack that can
+        not be memory-mapped, or a numpy.ndarray read by skimage.
+
+        :param path: The path to the image
+        :rtype: numpy.ndarray or LazyTiffImage
+        """
+        if not ImageReader.isTiffFile(path):
+            return io.imread(path)
+        try:
+            return tifffile.memmap(path, mode='r')
+        except ValueError:
+            pass
+        image = LazyTiffImage(path)
+        if image.ndim <= len(image.planeShape):
+            return io.imread(path)
+        return image
+
+
+    @staticmethod
+    def readIntoMemory(image):
+        """Answer the memory-mapped or lazily read image as a numpy array in
+        memory. Images that are already in memory and None are answered as
+        they are.
+
+        :param image: An image opened with openImage or None
+        :rtype: numpy.ndarray or None
+        """
+        if image is None:
+            return None
+        if isinstance(image, np.memmap) or not isinstance(image, np.ndarray):
+            return np.array(image)
+        return image
+
+
+    @staticmethod
+    def isTiffFile(path):
+        """Answer True if path is the path of an existing tiff-file.
+        """
+        if not isinstance(path, (str, os.PathLike)):
+            return False
+        return (str(path).lower().endswith(TIFF_EXTENSIONS)
+                and os.path.isfile(path))
+
+
+
+class LazyTiffImage:
+    """A tiff-stack of which only the planes needed by an indexing operation
+    are read. Indexing with integers, slices and arrays of indices is
+    supported. The stack must consist of one series of pages, with one page
+    per plane of the first dimension.
+    """
+
+
+    def __init__(self, path):
+        """Create a lazy image for the tiff-file at path. Only the metadata
+        of the file is read.
+        """
+        self.path = path
+        with tifffile.TiffFile(path) as tiff:
+            series = tiff.series[0]
+            self.shape = tuple(series.shape)
+            self.dtype = np.dtype(series.dtype)
+            self.planeShape = tuple(series.pages[0].shape)
+            nrOfPages = len(series.pages)
+        self.ndim = len(self.shape)
+        if (self.ndim != len(self.planeShape) + 1
+                or self.shape[0] != nrOfPages):
+            self.ndim = len(self.planeShape)
+
+
+    def __len__(self):
+        return self.shape[0]
+
+
+    def __array__(self, dtype=None, copy=None):
+        data = tifffile.imread(self.path)
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+
+    def __getitem__(self, key):
+        """Read the planes selected by the first element of key and answer
+        the result of indexing them with the rest of key.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        planeKey, rest = key[0], key[1:]
+        if isinstance(planeKey, slice):
+            planes = range(*planeKey.indices(self.shape[0]))
+            return self.readPlanes(list(planes))[(slice(None),) + rest]
+        if np.ndim(planeKey) == 0:
+            return self.readPlanes([int(planeKey)])[(0,) + rest]
+        planeKey = np.asarray(planeKey)
+        planes, inverse = np.unique(planeKey, return_inverse=True)
+        inverse = inverse.reshape(planeKey.shape)
+        return self.readPlanes(planes.tolist())[(inverse,) + rest]
+
+
+    def readPlanes(self, planes):
+        """Answer the planes with the given indices as one array, in the order
+        of the indices.
+
+        :param planes: The indices of the planes
+        :type planes: list of int
+        :rtype: numpy.ndarray
+        """
+        result = np.empty((len(planes),) + self.planeShape, dtype=self.dtype)
+        if not planes:
+            return result
+        with tifffile.TiffFile(self.path) as tiff:
+            pages = tiff.series[0].pages
+            for index, plane in enumerate(planes):
+                result[index] = pages[plane].asarray()
+        return result
@@ -0,0 +1,199 @@
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+
+TIMING_COLUMNS = ("image", "stage", "wall time", "cpu time", "peak rss",
+                  "peak allocations")
+TIMING_SUFFIX = "_timing"
+NO_MEASUREMENT = nullcontext()
+
+
+
+class Instrumentation:
+    """Measure the wall time, the cpu time and the memory of the stages of
+    the processing, for example the reading, the background subtraction and
+    the spot detection of each image of a batch.
+
+    A measurement is a dictionary with the keys TIMING_COLUMNS. The times are
+    in seconds. The peak rss is the highest resident set size of the process
+    in bytes at the end of the stage, so that the stage that raised it can be
+    seen, it is zero where the resource module is not available. If
+    traceAllocations is True, the peak of the memory allocated by python and
+    numpy during the stage is measured with tracemalloc, which slows the
+    processing down. Otherwise the peak allocations are zero.
+
+    The listeners are called with each new measurement, in the thread of the
+    stage. With prefetching, the reading of the next image overlaps with the
+    processing of the current one, so that their times and allocations are
+    not separated.
+    """
+
+
+    def __init__(self, traceAllocations=False):
+        """Create a new instrumentation without measurements.
+
+        :param traceAllocations: A boolean telling wether the allocations of
+                                 each stage are traced
+        """
+        self.traceAllocations = traceAllocations
+        self.measurements = []
+        self.listeners = []
+        self.tracingStages = 0
+        self.lock = threading.Lock()
+
+
+    def addListener(self, listener):
+        """Add a function that is called with each new measurement.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+
+    def removeListener(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+
+    @contextmanager
+    def measure(self, stage, image=None):
+        """Measure the block as the given stage of the processing of the
+        image. Nothing is recorded if the block raises an exception.
+
+        :param stage: The name of the stage, for example ``detect spots``
+        :param image: The path of the image or None
+        """
+        if self.traceAllocations:
+            self.startTracing()
+        try:
+            startWall = time.perf_counter()
+            startCPU = time.process_time()
+            yield
+            measurement = {"image": "" if image is None else str(image),
+                           "stage": stage,
+                           "wall time": time.perf_counter() - startWall,
+                           "cpu time": time.process_time() - startCPU,
+                           "peak rss": Instrumentation.getPeakRSS(),
+                           "peak allocations": 0}
+            if self.traceAllocations:
+                measurement["peak allocations"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            if self.traceAllocations:
+                self.stopTracing()
+        self.addMeasurements([measurement])
+
+
+    def startTracing(self):
+        """Start tracing the allocations, if no other stage is traced, and
+        reset the peak of the traced memory.
+        """
+        with self.lock:
+            if self.tracingStages == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.tracingStages = self.tracingStages + 1
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+
+    def stopTracing(self):
+        """Stop tracing the allocations, when the last traced stage ends.
+        """
+        with self.lock:
+            self.tracingStages = self.tracingStages - 1
+            if self.tracingStages == 0:
+                tracemalloc.stop()
+
+
+    def addMeasurements(self, measurements):
+        """Add measurements, for example from another process, and call the
+        listeners with each of them.
+
+        :param measurements: A list of measurements as answered by
+                             getMeasurements
+        """
+        with self.lock:
+            self.measurements.extend(measurements)
+            listeners = list(self.listeners)
+        for measurement in measurements:
+            for listener in listeners:
+                listener(measurement)
+
+
+    def getMeasurements(self):
+        """Answer the measurements in the order in which they have been
+        made.
+
+        :rtype: list of dict
+        """
+        with self.lock:
+            return list(self.measurements)
+
+
+    def clear(self):
+        with self.lock:
+            self.measurements = []
+
+
+    def getSummary(self):
+        """Answer the total wall and cpu time per stage and the highest peak
+        rss and peak allocations of the stage, in the order in which the
+        stages have been measured first.
+
+        :rtype: dict of dict
+        """
+        summary = {}
+        for measurement in self.getMeasurements():
+            total = summary.setdefault(measurement["stage"],
+                                       {"count": 0, "wall time": 0,
+                                        "cpu time": 0, "peak rss": 0,
+                                        "peak allocations": 0})
+            total["count"] = total["count"] + 1
+            for key in ("wall time", "cpu time"):
+                total[key] = total[key] + measurement[key]
+            for key in ("peak rss", "peak allocations"):
+                total[key] = max(total[key], measurement[key])
+        return summary
+
+
+    def writeReport(self, path):
+        """Write the measurements to a json-file, if the path ends with
+        ``.json``, and to a csv-file otherwise.
+
+        :param path: The path of the timing report
+        """
+        measurements = self.getMeasurements()
+        if str(path).endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(measurements, f, indent=4)
+            return
+        with open(path, "w") as f:
+            f.write(",".join(TIMING_COLUMNS))
+            f.write('\n')
+            for measurement in measurements:
+                f.write(",".join(str(measurement[column])
+                                 for column in TIMING_COLUMNS))
+                f.write('\n')
+
+
+    @staticmethod
+    def getPeakRSS():
+        """Answer the highest resident set size of the process so far in
+        bytes or zero if it is not available.
+
+        :rtype: int
+        """
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            return peak
+        return peak * 1024
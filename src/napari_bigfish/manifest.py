@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+
+
+
+HASH_CHUNK_SIZE = 2**20
+
+
+
+class BatchManifest:
+    """The manifest of a batch-processing records for each finished image a
+    fingerprint of the input files, the outputs written for the image and the
+    size of the count report and of the spot store after the image has been
+    reported. Together with the settings of the batch (parameters, scale and
+    options), this allows to resume an interrupted batch: images whose inputs
+    did not change and whose outputs exist are skipped, and the reports are
+    cut back to the size they had after the last finished image. A finished
+    image that would have to be processed again is outdated, its rows would
+    be in the reports twice, so that the batch is not resumed.
+
+    The manifest is a json-file, that is rewritten after each image.
+    """
+
+
+    def __init__(self, path):
+        """Create a new, empty manifest that will be saved to path.
+        """
+        self.path = path
+        self.settings = None
+        self.countReport = None
+        self.countReportSize = 0
+        self.spotStore = None
+        self.spotStoreSize = 0
+        self.images = {}
+
+
+    def load(self):
+        """Read the manifest from its file. Answer False if there is no
+        readable manifest.
+
+        :rtype: bool
+        """
+        try:
+            with open(self.path) as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.settings = content["settings"]
+        self.countReport = content["countReport"]
+        self.countReportSize = content["countReportSize"]
+        self.spotStore = content["spotStore"]
+        self.spotStoreSize = content["spotStoreSize"]
+        self.images = content["images"]
+        return True
+
+
+    def save(self):
+        """Write the manifest to its file. The file is replaced at once, so
+        that an interruption does not leave a partial manifest.
+        """
+        content = {"settings": self.settings,
+                   "countReport": self.countReport,
+                   "countReportSize": self.countReportSize,
+                   "spotStore": self.spotStore,
+                   "spotStoreSize": self.spotStoreSize,
+                   "images": self.images}
+        tmpPath = str(self.path) + ".tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(content, f, indent=1)
+        os.replace(tmpPath, self.path)
+
+
+    def start(self, settings, countReport, spotStore=None):
+        """Start a new batch with the given settings and reports. The images
+        of a previous batch are forgotten.
+        """
+        self.settings = BatchManifest.normalize(settings)
+        self.countReport = countReport
+        self.countReportSize = os.path.getsize(countReport)
+        self.spotStore = spotStore
+        self.spotStoreSize = 0
+        if spotStore is not None:
+            self.spotStoreSize = os.path.getsize(spotStore)
+        self.images = {}
+        self.save()
+
+
+    def canResume(self, settings, spotStore=False):
+        """Answer True if the batch recorded in the manifest has been run with
+        the same settings and its reports still exist.
+
+        :param settings: The settings of the new batch
+        :param spotStore: A boolean telling wether the new batch writes a
+                          spot store
+        """
+        if self.settings != BatchManifest.normalize(settings):
+            return False
+        if self.countReport is None or not os.path.isfile(self.countReport):
+            return False
+        if os.path.getsize(self.countReport) < self.countReportSize:
+            return False
+        if spotStore != (self.spotStore is not None):
+            return False
+        if spotStore and (not os.path.isfile(self.spotStore)
+                          or os.path.getsize(self.spotStore) < self.spotStoreSize):
+            return False
+        return True
+
+
+    def truncateReports(self):
+        """Remove the rows written to the reports after the last finished
+        image, for example by an image that was interrupted while reporting.
+        """
+        with open(self.countReport, "r+b") as f:
+            f.truncate(self.countReportSize)
+        if self.spotStore is not None:
+            with open(self.spotStore, "r+b") as f:
+                f.truncate(self.spotStoreSize)
+
+
+    def isComplete(self, imagePaths):
+        """Answer True if the image has been finished with the same label
+        images, none of the input files has changed since and all outputs of
+        the image exist.
+
+        :param imagePaths: The paths of the input image, the cell labels and
+                           the nuclei mask, the latter two may be None
+        """
+        entry = self.images.get(str(imagePaths[0]))
+        if entry is None:
+            return False
+        inputs = [None if path is None else str(path) for path in imagePaths]
+        if [item["path"] if item else None for item in entry["inputs"]] != inputs:
+            return False
+        for item in entry["inputs"]:
+            if item and not BatchManifest.isUnchanged(item):
+                return False
+        return all(os.path.isfile(path) for path in entry["outputs"])
+
+
+    def isOutdated(self, imagePaths):
+        """Answer True if the image has been finished, but is not complete
+        anymore, for example because one of its inputs changed. The rows of
+        the image are in the reports and would be written again if the image
+        were processed again.
+
+        :param imagePaths: The paths of the input image, the cell labels and
+                           the nuclei mask, the latter two may be None
+        """
+        return (str(imagePaths[0]) in self.images
+                and not self.isComplete(imagePaths))
+
+
+    def addImage(self, imagePaths, outputs, countReportSize, spotStoreSize=0):
+        """Record a finished image and save the manifest.
+
+        :param imagePaths: The paths of the input image, the cell labels and
+                           the nuclei mask, the latter two may be None
+        :param outputs: The paths of the files written for the image
+        :param countReportSize: The size of the count report after the image
+                                has been reported
+        :param spotStoreSize: The size of the spot store after the spots of
+                              the image have been appended
+        """
+        inputs = [None if path is None else BatchManifest.getFingerprint(path)
+                  for path in imagePaths]
+        self.images[str(imagePaths[0])] = {"inputs": inputs,
+                                           "outputs": [str(path)
+                                                       for path in outputs]}
+        self.countReportSize = countReportSize
+        self.spotStoreSize = spotStoreSize
+        self.save()
+
+
+    @staticmethod
+    def getFingerprint(path):
+        """Answer the path, size, modification time and content hash of a
+        file.
+
+        :rtype: dict
+        """
+        stat = os.stat(path)
+        return {"path": str(path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "hash": BatchManifest.getHash(path)}
+
+
+    @staticmethod
+    def isUnchanged(fingerprint):
+        """Answer True if the file still has the recorded fingerprint. The
+        content hash is only computed if the size is the same but the
+        modification time differs.
+        """
+        try:
+            stat = os.stat(fingerprint["path"])
+        except OSError:
+            return False
+        if stat.st_size != fingerprint["size"]:
+            return False
+        if stat.st_mtime_ns == fingerprint["mtime"]:
+            return True
+        return BatchManifest.getHash(fingerprint["path"]) == fingerprint["hash"]
+
+
+    @staticmethod
+    def getHash(path):
+        """Answer the blake2b-hash of the content of a file.
+
+        :rtype: str
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+    @staticmethod
+    def normalize(settings):
+        """Answer the settings as they are after being written to and read
+        from json, so that they can be compared with loaded settings.
+        """
+        return json.loads(json.dumps(settings))
@@ -0,0 +1,239 @@
+"""
+The operations of the spot detection as functions of the data and of a
+frozen parameter object, that can run concurrently in different threads.
+An operation given a cancel token raises OperationCancelled at its next
+checkpoint after the token has been cancelled, see CancelToken. An
+operation given a progress callback calls it with the fraction of the
+operation that is done, see ProgressReporter.
+"""
+import dataclasses
+from napari_bigfish.bigfishcore import BigfishCore, PARAMETER_NAMES
+from napari_bigfish.cache import ResultCache
+
+
+
+@dataclasses.dataclass(frozen=True)
+class Parameters:
+    """An immutable snapshot of the parameters of the processing. The
+    operations of the pipeline only read the parameters, so that changing
+    the parameters of the application while an operation is running does
+    not affect it.
+
+    The fields have the names of the parameters of the BigfishCore, see
+    PARAMETER_NAMES, and the same defaults. In addition they contain the
+    number of threads used for the tiles.
+    """
+    sigmaXY: float = 2.3
+    sigmaZ: float = 0.75
+    threshold: float = 15
+    radiusXY: float = 170
+    radiusZ: float = 1250
+    decomposeRadiusXY: float = 170
+    decomposeRadiusZ: float = 1250
+    alpha: float = 0.5
+    beta: float = 1
+    gamma: float = 5
+    removeDuplicates: bool = True
+    findThreshold: bool = True
+    sparseLabels: bool = False
+    tileSizeXY: int = 0
+    tileSizeZ: int = 0
+    outputFormat: str = "csv"
+    workingPrecision: str = "float64"
+    numberOfThreads: int = 1
+
+
+    @staticmethod
+    def fromCore(core):
+        """Answer the current parameters of a core or application.
+
+        :param core: The core from which the parameters are taken
+        :type core: BigfishCore
+        :rtype: Parameters
+        """
+        return Parameters(numberOfThreads=core.getNumberOfThreads(),
+                          **core.getParameters())
+
+
+    def replace(self, **changes):
+        """Answer a copy of the parameters with the given values changed.
+
+        :rtype: Parameters
+        """
+        return dataclasses.replace(self, **changes)
+
+
+    def asDict(self):
+        """Answer the parameters of the core as a dictionary, see
+        BigfishCore.getParameters.
+
+        :rtype: dict
+        """
+        return {name: getattr(self, name) for name in PARAMETER_NAMES}
+
+
+
+def createCore(parameters, data=None, resultCache=None, candidateCache=None,
+                           cancelToken=None, progressCallback=None,
+                           dataKey=None):
+    """Answer a new core with the parameters and the data, that is used by
+    one operation only.
+
+    :param parameters: The parameters of the processing
+    :type parameters: Parameters
+    :param data: The input image of the operation
+    :param resultCache: An optional result cache shared by the operations
+    :param candidateCache: An optional cache of the spot candidates shared by
+                           the operations
+    :param cancelToken: An optional token to cancel the operation
+    :param progressCallback: An optional function that is called with the
+                             fraction of the operation that is done
+    :param dataKey: The content hash of the data, if it is already known,
+                    see getDataKey
+    :rtype: BigfishCore
+    """
+    core = BigfishCore()
+    core.setParameters(parameters.asDict())
+    core.setNumberOfThreads(parameters.numberOfThreads)
+    core.setResultCache(resultCache)
+    core.setCandidateCache(candidateCache)
+    core.setCancelToken(cancelToken)
+    if progressCallback is not None:
+        core.getProgressReporter().addListener(progressCallback)
+    core.setData(data)
+    core.setDataKey(dataKey)
+    return core
+
+
+def getDataKey(data):
+    """Answer the content hash of the data, under which the results and the
+    spot candidates of the data are cached. A caller that runs several
+    operations on the same data can compute the key once and pass it to the
+    operations, so that the data is not hashed by each operation.
+
+    :rtype: str
+    """
+    return ResultCache.getArrayKey(data)
+
+
+def subtractBackground(parameters, data, resultCache=None, cancelToken=None,
+                       progressCallback=None, dataKey=None):
+    """Answer the data with the background removed by the gaussian background
+    subtraction, see BigfishCore.subtractBackground.
+
+    :param parameters: The parameters of the processing
+    :type parameters: Parameters
+    :param data: The input image
+    :param resultCache: An optional result cache shared by the operations
+    :param cancelToken: An optional token to cancel the operation
+    :param progressCallback: An optional function that is called with the
+                             fraction of the operation that is done
+    :param dataKey: The content hash of the data, if it is already known,
+                    see getDataKey
+    :rtype: numpy.ndarray
+    """
+    core = createCore(parameters, data, resultCache, cancelToken=cancelToken,
+                      progressCallback=progressCallback, dataKey=dataKey)
+    core.subtractBackground()
+    return core.getResult()
+
+
+def detectSpots(parameters, scale, data, resultCache=None,
+                candidateCache=None, cancelToken=None, progressCallback=None,
+                dataKey=None):
+    """Answer the spots detected in the data and the threshold used, which is
+    the automatic threshold if findThreshold is True, see
+    BigfishCore.detectSpots.
+
+    :param parameters: The parameters of the processing
+    :type parameters: Parameters
+    :param scale: The scale (voxel size) of the image in the z, y and x
+                  dimensions in nm.
+    :param data: The input image
+    :param resultCache: An optional result cache shared by the operations
+    :param candidateCache: An optional cache of the spot candidates shared by
+                           the operations
+    :param cancelToken: An optional token to cancel the operation
+    :param progressCallback: An optional function that is called with the
+                             fraction of the operation that is done
+    :param dataKey: The content hash of the data, if it is already known,
+                    see getDataKey
+    :rtype: (numpy.ndarray, float)
+    """
+    core = createCore(parameters, data, resultCache, candidateCache,
+                      cancelToken, progressCallback, dataKey)
+    core.detectSpots(scale)
+    return core.getSpots(), core.getThreshold()
+
+
+def previewSpots(parameters, scale, data, inner=None, candidateCache=None,
+                 dataKey=None):
+    """Answer the spots for the threshold of the parameters, selected from
+    the spot candidates of the data, see BigfishCore.previewSpots.
+
+    :param parameters: The parameters of the processing
+    :type parameters: Parameters
+    :param scale: The scale (voxel size) of the image in the z, y and x
+                  dimensions in nm.
+    :param data: The input image
+    :param inner: If not None, only the spots within these slices of the
+                  data are answered
+    :param candidateCache: An optional cache of the spot candidates shared by
+                           the operations
+    :param dataKey: The content hash of the data, if it is already known,
+                    see getDataKey
+    :rtype: numpy.ndarray
+    """
+    core = createCore(parameters, data, candidateCache=candidateCache,
+                      dataKey=dataKey)
+    return core.previewSpots(scale, inner)
+
+
+def getDetectionHalo(parameters, scale, data):
+    """Answer the number of pixels by which a region of the data must be
+    enlarged in each dimension, so that the spots in the region are detected
+    as in the whole image, see BigfishCore.getDetectionHalo.
+
+    :rtype: list of int
+    """
+    return createCore(parameters, data).getDetectionHalo(scale)
+
+
+def decomposeDenseRegions(parameters, scale, data, spots, cancelToken=None,
+                          progressCallback=None):
+    """Answer the spots after the decomposition of the dense regions, see
+    BigfishCore.decomposeDenseRegions.
+
+    :param parameters: The parameters of the processing
+    :type parameters: Parameters
+    :param scale: The scale (voxel size) of the image in the z, y and x
+                  dimensions in nm.
+    :param data: The input image
+    :param spots: The spots detected in the image
+    :param cancelToken: An optional token to cancel the operation
+    :param progressCallback: An optional function that is called with the
+                             fraction of the operation that is done
+    :rtype: numpy.ndarray
+    """
+    core = createCore(parameters, data, cancelToken=cancelToken,
+                      progressCallback=progressCallback)
+    core.spots = spots
+    core.decomposeDenseRegions(scale)
+    return core.getSpots()
+
+
+def countSpots(parameters, spots, cytoplasmLabels, nucleiLabels):
+    """Answer the spot-count per cell and environment, see
+    BigfishCore.getSpotCountPerCellAndEnvironment.
+
+    :param parameters: The parameters of the processing
+    :type parameters: Parameters
+    :param spots: The spots to count
+    :param cytoplasmLabels: The cell-labels
+    :param nucleiLabels: The nuclei-mask or labels
+    :rtype: numpy.ndarray with the dtype SPOT_COUNT_DTYPE
+    """
+    core = createCore(parameters)
+    core.spots = spots
+    core.countSpotsPerCellAndEnvironment(cytoplasmLabels, nucleiLabels)
+    return core.getSpotCountPerCellAndEnvironment()
@@ -0,0 +1,124 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+
+class Prefetcher:
+    """Read the items of a sequence ahead of their use with a pool of
+    background threads, so that the reading overlaps with the processing of
+    the previous items. Iterating over the prefetcher answers the items with
+    the results of the read-function, in the order of the items.
+
+    At most depth items are read ahead. If maxBytes is bigger than zero, less
+    items are read ahead when their estimated size would exceed maxBytes. The
+    size of an item is estimated by the biggest item read so far.
+
+    The prefetcher measures the time spent reading in the background and the
+    time the consumer had to wait for a result. The difference is the reading
+    time that has been hidden behind the processing.
+    """
+
+
+    def __init__(self, read, items, depth=1, maxBytes=0):
+        """Create a prefetcher that reads the items with the read-function.
+
+        :param read: A function that reads one item
+        :param items: The items to read
+        :param depth: The maximal number of items that are read ahead. If the
+                      depth is zero, the items are read when needed.
+        :param maxBytes: The maximal size of the items read ahead, if zero
+                         the size is not limited
+        """
+        self.read = read
+        self.items = items
+        self.depth = max(0, int(depth))
+        self.maxBytes = max(0, int(maxBytes))
+        self.itemBytes = 0
+        self.readTime = 0
+        self.waitTime = 0
+        self.lock = threading.Lock()
+
+
+    def __iter__(self):
+        if self.depth == 0:
+            for item in self.items:
+                start = time.perf_counter()
+                result = self.timedRead(item)
+                self.waitTime = self.waitTime + time.perf_counter() - start
+                yield item, result
+            return
+        items = iter(self.items)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.depth) as executor:
+            try:
+                exhausted = False
+                while True:
+                    while not exhausted and self.canReadAhead(len(pending)):
+                        item = next(items, StopIteration)
+                        if item is StopIteration:
+                            exhausted = True
+                            break
+                        pending.append((item, executor.submit(self.timedRead,
+                                                              item)))
+                    if not pending:
+                        return
+                    item, future = pending.popleft()
+                    start = time.perf_counter()
+                    result = future.result()
+                    self.waitTime = self.waitTime + time.perf_counter() - start
+                    yield item, result
+            finally:
+                for item, future in pending:
+                    future.cancel()
+
+
+    def canReadAhead(self, nrOfPendingItems):
+        """Answer True if another item can be read ahead, when
+        nrOfPendingItems items are already being read or waiting to be used.
+        One item is always read.
+        """
+        if nrOfPendingItems == 0:
+            return True
+        if nrOfPendingItems >= self.depth:
+            return False
+        if self.maxBytes == 0:
+            return True
+        return (nrOfPendingItems + 1) * self.itemBytes <= self.maxBytes
+
+
+    def timedRead(self, item):
+        """Read the item, add the time needed to the read time and update the
+        estimated size of an item.
+        """
+        start = time.perf_counter()
+        result = self.read(item)
+        duration = time.perf_counter() - start
+        size = self.getSize(result)
+        with self.lock:
+            self.readTime = self.readTime + duration
+            self.itemBytes = max(self.itemBytes, size)
+        return result
+
+
+    @staticmethod
+    def getSize(result):
+        """Answer the size in bytes of a result, which is an array or a tuple
+        of arrays and None values.
+        """
+        if not isinstance(result, tuple):
+            result = (result,)
+        return sum(getattr(part, "nbytes", 0) for part in result)
+
+
+    def getStatistics(self):
+        """Answer the time spent reading, the time spent waiting for the reads
+        and the reading time that has been hidden behind the processing, in
+        seconds.
+
+        :rtype: dict
+        """
+        return {"read time": self.readTime,
+                "wait time": self.waitTime,
+                "hidden read time": max(0, self.readTime - self.waitTime)}
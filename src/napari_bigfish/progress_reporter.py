@@ -0,0 +1,107 @@
+import threading
+from contextlib import contextmanager
+
+
+
+MIN_PROGRESS_STEP = 0.005
+
+
+
+class ProgressReporter:
+    """Report the progress of an operation as the fraction of the operation
+    that is done, a number between zero and one, to listeners.
+
+    An operation is divided into stages, for example the background
+    subtraction and the spot detection of an image or the images of a
+    batch. Each stage covers a part of the range of the enclosing stage, so
+    that the tiles of a stage can report their progress without knowing the
+    stage. The listeners are called in the thread of the operation, only
+    when the progress has grown by at least MIN_PROGRESS_STEP or the
+    operation is done.
+    """
+
+
+    def __init__(self):
+        """Create a new reporter without listeners.
+        """
+        self.listeners = []
+        self.start = 0.0
+        self.end = 1.0
+        self.lastFraction = 0.0
+        self.lock = threading.Lock()
+
+
+    def addListener(self, listener):
+        """Add a function that is called with the fraction of the operation
+        that is done.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+
+    def removeListener(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+
+    @contextmanager
+    def stage(self, start, end):
+        """Map the progress reported within the block to the part from start
+        to end of the current stage. When the block is left, the stage is
+        reported as done.
+
+        :param start: The fraction of the current stage at which the new
+                      stage starts
+        :param end: The fraction of the current stage at which the new stage
+                    ends
+        """
+        outerStart, outerEnd = self.start, self.end
+        width = outerEnd - outerStart
+        self.start = outerStart + start * width
+        self.end = outerStart + end * width
+        try:
+            yield self
+            self.report(1)
+        finally:
+            self.start, self.end = outerStart, outerEnd
+
+
+    @staticmethod
+    def getStageRanges(nrOfStages):
+        """Answer the start and end of nrOfStages stages of equal size.
+
+        :rtype: list of (float, float)
+        """
+        return [(index / nrOfStages, (index + 1) / nrOfStages)
+                for index in range(nrOfStages)]
+
+
+    def reportStep(self, step, nrOfSteps):
+        """Report that step of the nrOfSteps steps of the current stage, for
+        example tiles or images, are done.
+        """
+        if nrOfSteps > 0:
+            self.report(step / nrOfSteps)
+
+
+    def report(self, fraction):
+        """Report the fraction of the current stage that is done.
+        """
+        value = self.start + min(max(fraction, 0), 1) * (self.end - self.start)
+        with self.lock:
+            if value < 1 and value - self.lastFraction < MIN_PROGRESS_STEP:
+                return
+            if value <= self.lastFraction and self.lastFraction > 0:
+                return
+            self.lastFraction = value
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(value)
+
+
+    def reset(self):
+        """Start reporting a new operation from zero.
+        """
+        with self.lock:
+            self.lastFraction = 0.0
@@ -0,0 +1,247 @@
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from napari_bigfish.bigfishcore import BigfishCore
+from napari_bigfish.image_reader import ImageReader
+
+
+
+AUTOMATIC_THRESHOLD = "auto"
+SWEEP_COLUMNS = [("sigma xy", np.float64),
+                 ("sigma z", np.float64),
+                 ("radius xy", np.float64),
+                 ("radius z", np.float64),
+                 ("threshold", np.float64),
+                 ("automatic threshold", bool),
+                 ("spots", np.int64)]
+
+
+
+class ParameterSweep:
+    """Run the spot detection for each combination of a grid of thresholds,
+    spot radii and background sigmas on one or more images and count the
+    spots.
+
+    The grid points share the intermediate results they have in common. For
+    each image and background sigma, the background is subtracted once. For
+    each spot radius, the spot candidates are computed once, see
+    SpotCandidates, and the spots for all thresholds are selected from them.
+    The images and background sigmas are processed in parallel by
+    numberOfWorkers processes.
+
+    A threshold of None stands for the automatic threshold. If no background
+    sigmas are given, the background is not subtracted.
+    """
+
+
+    def __init__(self, thresholds=(None,), radiiXY=(170,), radiiZ=(1250,),
+                       sigmasXY=(), sigmasZ=()):
+        """Create a new sweep over the grid of the given values.
+
+        :param thresholds: The thresholds, None for the automatic threshold
+        :param radiiXY: The spot radii in xy in nm
+        :param radiiZ: The spot radii in z in nm
+        :param sigmasXY: The sigmas of the background subtraction in xy
+        :param sigmasZ: The sigmas of the background subtraction in z
+        """
+        self.thresholds = list(thresholds)
+        self.radiiXY = list(radiiXY)
+        self.radiiZ = list(radiiZ)
+        self.sigmasXY = list(sigmasXY)
+        self.sigmasZ = list(sigmasZ)
+
+
+    def getRadii(self):
+        """Answer the combinations of the spot radii in xy and z.
+
+        :rtype: list of (float, float)
+        """
+        return list(itertools.product(self.radiiXY, self.radiiZ))
+
+
+    def getSigmas(self):
+        """Answer the combinations of the background sigmas in xy and z or
+        [None] if the background is not subtracted.
+
+        :rtype: list of (float, float) or [None]
+        """
+        if not self.sigmasXY or not self.sigmasZ:
+            return [None]
+        return list(itertools.product(self.sigmasXY, self.sigmasZ))
+
+
+    def getNumberOfPoints(self):
+        """Answer the number of grid points per image.
+
+        :rtype: int
+        """
+        return len(self.thresholds) * len(self.getRadii()) * len(self.getSigmas())
+
+
+    def run(self, core, scale, inputImages):
+        """Run the sweep on the images. The other parameters of the detection,
+        the number of workers and the progress callbacks are taken from the
+        core. The progress is the number of finished pairs of image and
+        background sigma. The sweep checks the cancel token of the core
+        after each pair, see BigfishCore.checkCancelled.
+
+        :param core: The core with the base parameters
+        :type core: BigfishCore
+        :param scale: A tupel with the scales (voxel-sizes) of the images in
+                      nm for the z, y and x dimensions
+        :param inputImages: A list of paths to images or of image arrays
+        :return: One row per image and grid point, with the columns ``image``
+                 and SWEEP_COLUMNS
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        tasks = [(image, sigma) for image in inputImages
+                                for sigma in self.getSigmas()]
+        core.setProgressMax(len(tasks))
+        reporter = core.getProgressReporter()
+        reporter.reset()
+        parameters = core.getParameters()
+        radii, thresholds = self.getRadii(), self.thresholds
+        rowsOfTask = {}
+        nrOfWorkers = min(core.getNumberOfWorkers(), len(tasks))
+        if nrOfWorkers <= 1:
+            for index, (image, sigma) in enumerate(tasks):
+                core.checkCancelled()
+                rowsOfTask[index] = sweepImageWithParameters(
+                                        parameters, scale, image, sigma,
+                                        radii, thresholds)
+                core.setProgress(index + 1)
+                reporter.reportStep(index + 1, len(tasks))
+            return self.createTable(rowsOfTask, tasks)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=nrOfWorkers,
+                                 mp_context=context) as executor:
+            futures = {}
+            for index, (image, sigma) in enumerate(tasks):
+                future = executor.submit(sweepImageWithParameters,
+                                         parameters, scale, image, sigma,
+                                         radii, thresholds)
+                futures[future] = index
+            def cancelPending():
+                for future in futures:
+                    future.cancel()
+            cancelToken = core.getCancelToken()
+            if cancelToken is not None:
+                cancelToken.addCallback(cancelPending)
+            try:
+                for finished, future in enumerate(as_completed(futures),
+                                                  start=1):
+                    core.checkCancelled()
+                    rowsOfTask[futures[future]] = future.result()
+                    core.setProgress(finished)
+                    reporter.reportStep(finished, len(tasks))
+            finally:
+                if cancelToken is not None:
+                    cancelToken.removeCallback(cancelPending)
+        return self.createTable(rowsOfTask, tasks)
+
+
+    def createTable(self, rowsOfTask, tasks):
+        """Answer the rows of the tasks as one table, in the order of the
+        tasks. The images are named by their path or, for arrays, by their
+        index in the sweep.
+
+        :rtype: numpy.ndarray with a structured dtype
+        """
+        names = []
+        rows = []
+        nrOfSigmas = len(self.getSigmas())
+        for index, (image, sigma) in enumerate(tasks):
+            name = ParameterSweep.getImageName(image, index // nrOfSigmas)
+            names.extend([name] * len(rowsOfTask[index]))
+            rows.extend(rowsOfTask[index])
+        width = max([1] + [len(name) for name in names])
+        table = np.empty(len(rows), dtype=[("image", "U{}".format(width))]
+                                           + SWEEP_COLUMNS)
+        table["image"] = names
+        for column, (name, _) in enumerate(SWEEP_COLUMNS):
+            table[name] = [row[column] for row in rows]
+        return table
+
+
+    @staticmethod
+    def getImageName(image, index):
+        """Answer the path of the image or ``image <index>`` for an array.
+        """
+        if isinstance(image, np.ndarray):
+            return "image {}".format(index)
+        return str(image)
+
+
+    @staticmethod
+    def parseValues(text, allowAutomatic=False):
+        """Answer the numbers in a comma separated text. If allowAutomatic is
+        True, the word AUTOMATIC_THRESHOLD is answered as None.
+
+        :raises ValueError: If an entry is not a number
+        :rtype: list
+        """
+        values = []
+        for entry in text.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if allowAutomatic and entry.lower() == AUTOMATIC_THRESHOLD:
+                values.append(None)
+                continue
+            values.append(float(entry))
+        return values
+
+
+
+def sweepImageWithParameters(parameters, scale, image, sigma, radii,
+                             thresholds):
+    """Detect and count the spots of one image for all spot radii and
+    thresholds of a sweep, after subtracting the background with the given
+    sigma. The function is used as the task of the worker processes of the
+    parallel sweep.
+
+    :param parameters: The base parameters of the detection
+    :param scale: A tupel with the scales (voxel-sizes) of the image in nm
+                  for the z, y and x dimensions
+    :param image: The path to the image or the image
+    :param sigma: The sigmas in xy and z of the background subtraction or
+                  None
+    :param radii: The spot radii in xy and z
+    :param thresholds: The thresholds, None for the automatic threshold
+    :return: One row per radius and threshold with the values of the
+             columns SWEEP_COLUMNS
+    :rtype: list of tuple
+    """
+    core = BigfishCore()
+    core.setParameters(parameters)
+    core.setKeepCandidates(True)
+    if not isinstance(image, np.ndarray):
+        image = ImageReader.readIntoMemory(ImageReader.openImage(image))
+    core.setData(image)
+    sigmaXY, sigmaZ = np.nan, np.nan
+    if sigma is not None:
+        sigmaXY, sigmaZ = sigma
+        core.setSigmaXY(sigmaXY)
+        core.setSigmaZ(sigmaZ)
+        core.subtractBackground()
+        core.setData(core.getResult())
+    core.deactivateFindThreshold()
+    rows = []
+    for radiusXY, radiusZ in radii:
+        core.setRadiusXY(radiusXY)
+        core.setRadiusZ(radiusZ)
+        for threshold in thresholds:
+            automatic = threshold is None
+            if automatic:
+                threshold = core.getSpotCandidates(scale).getThreshold()
+            nrOfSpots = 0
+            if threshold is not None:
+                core.setThreshold(threshold)
+                core.detectSpots(scale)
+                nrOfSpots = len(core.getSpots())
+            else:
+                threshold = np.nan
+            rows.append((sigmaXY, sigmaZ, radiusXY, radiusZ, float(threshold),
+                         automatic, nrOfSpots))
+    return rows
@@ -0,0 +1,137 @@
+import numpy as np
+from bigfish import stack, detection
+
+
+
+HISTOGRAM_BINS = 2**16
+THRESHOLD_PERCENTILE = 99.9999
+
+
+
+class StreamingThreshold:
+    """Compute the automatic threshold of the bigfish spot detection from
+    statistics that are accumulated chunk by chunk, for example for the tiles
+    of a large image or for the images of a batch.
+
+    As in bigfish, the candidate thresholds range from zero to the
+    99.9999-percentile of the LoG-filtered pixel values and the threshold is
+    the breaking point of the logarithm of the number of local maxima above
+    each candidate threshold. Instead of keeping all filtered pixel values, a
+    histogram of them is accumulated. Only the values of the local maxima
+    are kept.
+    """
+
+
+    def __init__(self):
+        """Create a new threshold without statistics.
+        """
+        self.histogram = None
+        self.isInteger = True
+        self.upperBound = 0
+        self.nrOfValues = 0
+        self.localMaxValues = []
+
+
+    def addChunk(self, filtered, localMaxMask):
+        """Add the statistics of a chunk of a LoG-filtered image.
+
+        :param filtered: The LoG-filtered image values of the chunk
+        :type filtered: numpy.ndarray
+        :param localMaxMask: A mask of the local maxima in the chunk
+        :type localMaxMask: numpy.ndarray of bool
+        """
+        values = filtered.ravel()
+        if values.size == 0:
+            return
+        self.addToHistogram(values)
+        localMaxValues = filtered[localMaxMask]
+        self.localMaxValues.append(localMaxValues[localMaxValues > 0])
+
+
+    def addToHistogram(self, values):
+        """Add the filtered pixel values to the histogram. Integer values are
+        counted exactly. Float values are counted in HISTOGRAM_BINS bins
+        between zero and an upper bound, that is doubled when a bigger value
+        arrives.
+        """
+        if self.histogram is None:
+            self.isInteger = np.issubdtype(values.dtype, np.integer)
+            self.histogram = np.zeros(0 if self.isInteger else HISTOGRAM_BINS,
+                                      dtype=np.int64)
+        self.nrOfValues = self.nrOfValues + values.size
+        if self.isInteger:
+            counts = np.bincount(values)
+            if len(counts) > len(self.histogram):
+                counts[:len(self.histogram)] += self.histogram
+                self.histogram = counts
+            else:
+                self.histogram[:len(counts)] += counts
+            return
+        maxValue = float(np.max(values))
+        if self.upperBound == 0:
+            self.upperBound = max(maxValue, np.finfo(np.float64).tiny)
+        while maxValue > self.upperBound:
+            merged = self.histogram.reshape(-1, 2).sum(axis=1)
+            self.histogram = np.concatenate((merged, np.zeros_like(merged)))
+            self.upperBound = 2 * self.upperBound
+        counts, _ = np.histogram(values, bins=HISTOGRAM_BINS,
+                                 range=(0, self.upperBound))
+        self.histogram += counts
+
+
+    def getPercentile(self, percentile):
+        """Answer the percentile of the accumulated filtered pixel values,
+        interpolated linearly between the values as numpy.percentile does.
+        Float values are represented by the upper edges of their bins.
+
+        :rtype: float
+        """
+        position = (self.nrOfValues - 1) * percentile / 100
+        lower = int(np.floor(position))
+        upper = int(np.ceil(position))
+        cumulative = np.cumsum(self.histogram)
+        lowerBin, upperBin = np.searchsorted(cumulative, [lower, upper],
+                                             side='right')
+        binWidth = 1
+        if not self.isInteger:
+            binWidth = self.upperBound / HISTOGRAM_BINS
+            lowerBin, upperBin = lowerBin + 1, upperBin + 1
+        lowerValue = lowerBin * binWidth
+        upperValue = upperBin * binWidth
+        return lowerValue + (upperValue - lowerValue) * (position - lower)
+
+
+    def getCandidateThresholds(self):
+        """Answer the thresholds that are tested, in the same way as bigfish
+        chooses them.
+
+        :rtype: numpy.ndarray
+        """
+        endRange = int(self.getPercentile(THRESHOLD_PERCENTILE))
+        if endRange < 100:
+            return np.linspace(0, endRange, num=100)
+        return np.arange(0, endRange + 1)
+
+
+    def getThreshold(self):
+        """Answer the threshold at the breaking point of the spot counts or
+        None if no spots have been found.
+
+        :rtype: float or None
+        """
+        if self.nrOfValues == 0:
+            return None
+        thresholds = self.getCandidateThresholds()
+        localMaxValues = np.sort(np.concatenate(self.localMaxValues))
+        counts = len(localMaxValues) - np.searchsorted(localMaxValues,
+                                                       thresholds,
+                                                       side='right')
+        with np.errstate(divide='ignore'):
+            countSpots = np.log(counts)
+        countSpots = stack.centered_moving_average(countSpots, n=5)
+        countSpots = countSpots[countSpots > 2]
+        thresholds = thresholds[:countSpots.size]
+        if countSpots.size == 0:
+            return None
+        threshold, _, _ = detection.get_breaking_point(thresholds, countSpots)
+        return threshold